@@ -1,88 +1,3226 @@
 import tkinter as tk
 from tkinter import ttk
 from tkinter import messagebox, filedialog
+from tkinter import font as tkfont
 import time
-from datetime import datetime
+from datetime import datetime, timedelta
 import threading
 import tkcalendar
 import json
 import os
 import uuid
+import sys
+import sqlite3
+import bisect
+import heapq
+import argparse
+import queue
+import re
+import functools
+import gc
+import itertools
+import traceback
+import csv
+import gzip
+from array import array
+from collections import deque
+
+try:
+    import numpy as np
+except ImportError:  # Los reportes se calculan en Python puro
+    np = None
+
+TIEMPO_BEBIDAS = {
+    "Café Americano": 180,
+    "Cappuccino": 300,
+    "Latte": 240,
+    "Té": 120
+}
+
+PRECIO_BEBIDAS = {
+    "Café Americano": 25,
+    "Cappuccino": 35,
+    "Latte": 30,
+    "Té": 20
+}
+
+TIEMPO_EXTRA = {
+    "Leche extra": 60,
+    "Shot extra de café": 120,
+    "Sirope de sabor": 30
+}
+
+PRECIO_EXTRA = {
+    "Leche extra": 10,
+    "Shot extra de café": 15,
+    "Sirope de sabor": 8
+}
+
+DATOS_ESTABLECIMIENTO = {
+    "establecimiento": "Cafetería FIEE - UV",
+    "direccion": "Bv. Adolfo Ruiz Cortines,\nMar de Cortes y Costa Dorada",
+    "ciudad": "Boca del Río, Veracruz, México",
+    "telefono": "229 136 0054",
+    "redes_sociales": {
+        "Facebook": "CafeteriaFIEE.UV",
+        "Instagram": "@cafeteria_fiee",
+        "Twitter": "@cafeteria_fiee"
+    }
+}
+
+class _TramoNulo:
+    """Contexto vacío que se devuelve cuando la instrumentación está apagada"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+class _Tramo:
+    __slots__ = ('instrumentacion', 'nombre', 'inicio')
+
+    def __init__(self, instrumentacion, nombre):
+        self.instrumentacion = instrumentacion
+        self.nombre = nombre
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.instrumentacion.registrar(self.nombre, time.perf_counter() - self.inicio)
+        return False
+
+class Instrumentacion:
+    """Tramos de tiempo y contadores de las rutas críticas.
+
+    Cada tramo conserva sus últimas MAX_MUESTRAS duraciones para calcular
+    p50/p95/p99. Apagada, medir() devuelve un contexto vacío compartido y
+    contar() regresa de inmediato.
+    """
+    MAX_MUESTRAS = 4096
+    _NULO = _TramoNulo()
+
+    def __init__(self, activa=False):
+        self.activa = activa
+        self.lock = threading.Lock()
+        self.reiniciar()
+
+    def reiniciar(self):
+        with self.lock:
+            self.muestras = {}  # nombre -> deque de segundos
+            self.totales = {}   # nombre -> [cantidad, segundos, máximo]
+            self.contadores = {}
+
+    def medir(self, nombre):
+        if not self.activa:
+            return self._NULO
+        return _Tramo(self, nombre)
+
+    def registrar(self, nombre, segundos):
+        with self.lock:
+            if nombre not in self.muestras:
+                self.muestras[nombre] = deque(maxlen=self.MAX_MUESTRAS)
+                self.totales[nombre] = [0, 0.0, 0.0]
+            self.muestras[nombre].append(segundos)
+            total = self.totales[nombre]
+            total[0] += 1
+            total[1] += segundos
+            total[2] = max(total[2], segundos)
+
+    def contar(self, nombre, cantidad=1):
+        if not self.activa:
+            return
+        with self.lock:
+            self.contadores[nombre] = self.contadores.get(nombre, 0) + cantidad
+
+    def resumen(self):
+        """Percentiles por tramo (en ms) y contadores"""
+        with self.lock:
+            muestras = {nombre: list(valores) for nombre, valores in self.muestras.items()}
+            totales = {nombre: list(total) for nombre, total in self.totales.items()}
+            contadores = dict(self.contadores)
+        tramos = {}
+        for nombre, valores in sorted(muestras.items()):
+            cantidad, segundos, maximo = totales[nombre]
+            tramos[nombre] = {
+                'n': cantidad,
+                'total_ms': segundos * 1000,
+                'p50_ms': percentil(valores, 50) * 1000,
+                'p95_ms': percentil(valores, 95) * 1000,
+                'p99_ms': percentil(valores, 99) * 1000,
+                'max_ms': maximo * 1000
+            }
+        return {'tramos': tramos, 'contadores': dict(sorted(contadores.items()))}
+
+    def volcar(self, ruta):
+        tmp = ruta + ".tmp"
+        with open(tmp, 'w') as f:
+            json.dump({'fecha': datetime.now().isoformat(timespec='seconds'),
+                       **self.resumen()}, f, indent=4)
+        os.replace(tmp, ruta)
+
+def medido(nombre):
+    """Decorador: mide cada llamada como un tramo de METRICAS"""
+    def decorador(funcion):
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            if not METRICAS.activa:
+                return funcion(*args, **kwargs)
+            with _Tramo(METRICAS, nombre):
+                return funcion(*args, **kwargs)
+        return envoltura
+    return decorador
+
+# Código de la envoltura de medido: el monitor la salta al nombrar manejadores
+CODIGO_ENVOLTURA = medido("")(lambda: None).__code__
+
+# Se activa con CAFETERIA_METRICAS=1 o desde Ayuda > Diagnóstico
+METRICAS = Instrumentacion(activa=os.environ.get("CAFETERIA_METRICAS", "") not in ("", "0"))
+
+class MonitorLatencia:
+    """Mide cuánto se retrasa un latido after() en el ciclo principal de Tk.
+
+    Un hilo vigía revisa el latido esperado; si el ciclo lleva más de UMBRAL
+    segundos sin atenderlo, toma muestras de la pila del hilo de Tk con
+    sys._current_frames() para saber qué manejador lo tiene bloqueado. Cada
+    bloqueo se agrega (desde el vigía) como una línea JSON al registro.
+    """
+    INTERVALO = 0.1
+    UMBRAL = 0.25
+    MAX_MUESTRAS = 20  # muestras de pila por bloqueo
+    MAX_BLOQUEOS = 100
+
+    def __init__(self, window, ruta_registro=None):
+        self.window = window
+        self.ruta_registro = ruta_registro
+        self.hilo_tk = threading.get_ident()
+        self.archivo = os.path.abspath(__file__)
+        self.lock = threading.Lock()
+        self.retrasos = deque(maxlen=Instrumentacion.MAX_MUESTRAS)
+        self.bloqueos = deque(maxlen=self.MAX_BLOQUEOS)
+        self.por_escribir = []
+        self.muestras = []  # pilas del bloqueo en curso
+        self.esperado = None
+        self.activo = False
+
+    def iniciar(self):
+        self.activo = True
+        self.programar(time.monotonic())
+        threading.Thread(target=self._vigilar, daemon=True).start()
+
+    def detener(self):
+        self.activo = False
+
+    def programar(self, ahora):
+        with self.lock:
+            self.esperado = ahora + self.INTERVALO
+        self.window.after(int(self.INTERVALO * 1000), self.latido)
+
+    def latido(self):
+        ahora = time.monotonic()
+        with self.lock:
+            retraso = max(0.0, ahora - self.esperado)
+            self.retrasos.append(retraso)
+            muestras, self.muestras = self.muestras, []
+            if retraso >= self.UMBRAL:
+                bloqueo = self._resumir_bloqueo(retraso, muestras)
+                self.bloqueos.append(bloqueo)
+                self.por_escribir.append(bloqueo)
+        if METRICAS.activa:
+            METRICAS.registrar("tk.retraso_latido", retraso)
+        if self.activo:
+            self.programar(ahora)
+
+    def _resumir_bloqueo(self, retraso, muestras):
+        """Manejador más frecuente en las muestras tomadas durante el bloqueo"""
+        conteo = {}
+        for pila in muestras:
+            clave = (pila['manejador'], pila['en'])
+            conteo[clave] = conteo.get(clave, 0) + 1
+        bloqueo = {
+            'fecha': datetime.now().isoformat(timespec='milliseconds'),
+            'duracion_ms': round(retraso * 1000, 1),
+            'muestras': len(muestras),
+            'manejador': None,
+            'en': None,
+            'pila': []
+        }
+        if conteo:
+            manejador, en = max(conteo, key=conteo.get)
+            bloqueo['manejador'] = manejador
+            bloqueo['en'] = en
+            bloqueo['pila'] = next(p['pila'] for p in muestras
+                                   if (p['manejador'], p['en']) == (manejador, en))
+        return bloqueo
+
+    def _muestrear(self):
+        marco = sys._current_frames().get(self.hilo_tk)
+        if marco is None:
+            return None
+        pila = traceback.extract_stack(marco)
+        codigos = [f.f_code for f, _ in traceback.walk_stack(marco)][::-1]
+        # El último tramo continuo de marcos de este archivo empieza en el
+        # manejador que Tk llamó (los de más afuera son run y mainloop)
+        propios = [os.path.abspath(f.filename) == self.archivo for f in pila]
+        if not any(propios):
+            return {'manejador': None, 'en': None,
+                    'pila': traceback.format_list(pila[-15:])}
+        fin = len(propios) - 1 - propios[::-1].index(True)
+        inicio = fin
+        while inicio > 0 and propios[inicio - 1]:
+            inicio -= 1
+        # Con @medido el primer marco es la envoltura, no el manejador
+        while inicio < fin and codigos[inicio] is CODIGO_ENVOLTURA:
+            inicio += 1
+        return {
+            'manejador': f"{pila[inicio].name} (línea {pila[inicio].lineno})",
+            'en': f"{pila[fin].name} (línea {pila[fin].lineno})",
+            'pila': traceback.format_list(pila[-15:])
+        }
+
+    def _vigilar(self):
+        while True:
+            time.sleep(self.INTERVALO / 2)
+            with self.lock:
+                esperado = self.esperado
+                tomar = len(self.muestras) < self.MAX_MUESTRAS
+                por_escribir, self.por_escribir = self.por_escribir, []
+            if time.monotonic() - esperado >= self.UMBRAL and tomar:
+                muestra = self._muestrear()
+                with self.lock:
+                    # Descartar si el latido llegó mientras se tomaba la muestra
+                    if muestra and self.esperado == esperado:
+                        self.muestras.append(muestra)
+            if por_escribir and self.ruta_registro:
+                try:
+                    with open(self.ruta_registro, 'a') as f:
+                        for bloqueo in por_escribir:
+                            f.write(json.dumps(bloqueo) + "\n")
+                except OSError as e:
+                    print(f"Error al guardar bloqueos: {e}")
+            if not self.activo:
+                break
+
+    def resumen(self):
+        with self.lock:
+            retrasos = list(self.retrasos)
+            bloqueos = list(self.bloqueos)
+        return {
+            'p50_ms': percentil(retrasos, 50) * 1000,
+            'p95_ms': percentil(retrasos, 95) * 1000,
+            'p99_ms': percentil(retrasos, 99) * 1000,
+            'max_ms': max(retrasos, default=0) * 1000,
+            'bloqueos': bloqueos
+        }
+
+class PerfilEstablecimiento:
+    """Datos del establecimiento impresos en los tickets; el ID es su versión"""
+    __slots__ = ('perfil_id', 'establecimiento', 'direccion', 'ciudad',
+                 'telefono', 'redes_sociales')
+
+    def __init__(self, perfil_id, establecimiento, direccion, ciudad, telefono,
+                 redes_sociales):
+        self.perfil_id = perfil_id
+        self.establecimiento = establecimiento
+        self.direccion = direccion
+        self.ciudad = ciudad
+        self.telefono = telefono
+        self.redes_sociales = redes_sociales
+
+    def clave(self):
+        return (self.establecimiento, self.direccion, self.ciudad, self.telefono,
+                tuple(sorted(self.redes_sociales.items())))
+
+    def to_dict(self):
+        return {
+            'perfil_id': self.perfil_id,
+            'establecimiento': self.establecimiento,
+            'direccion': self.direccion,
+            'ciudad': self.ciudad,
+            'telefono': self.telefono,
+            'redes_sociales': self.redes_sociales
+        }
+
+class RegistroPerfiles:
+    """Perfiles del establecimiento; cada ticket guarda solo el ID del suyo"""
+    def __init__(self):
+        self.por_id = {}
+        self.por_clave = {}
+        self.minimo_id = 0  # IDs ya usados por perfiles que se perdieron
+        self.lock = threading.Lock()
+
+    def _incorporar(self, perfil):
+        self.por_id[perfil.perfil_id] = perfil
+        self.por_clave.setdefault(perfil.clave(), perfil)
+
+    def cargar(self, registros):
+        with self.lock:
+            for registro in registros:
+                self._incorporar(PerfilEstablecimiento(**registro))
+
+    def registrar(self, establecimiento, direccion, ciudad, telefono, redes_sociales):
+        """Devuelve el perfil con esos datos, creando una versión nueva si no existe"""
+        perfil = PerfilEstablecimiento(0, establecimiento, direccion, ciudad,
+                                       telefono, redes_sociales)
+        with self.lock:
+            existente = self.por_clave.get(perfil.clave())
+            if existente:
+                return existente
+            perfil.perfil_id = max(max(self.por_id, default=0), self.minimo_id) + 1
+            self._incorporar(perfil)
+            return perfil
+
+    def reservar_hasta(self, perfil_id):
+        """Los perfiles nuevos tendrán un ID mayor que perfil_id"""
+        with self.lock:
+            self.minimo_id = max(self.minimo_id, perfil_id)
+
+    def obtener(self, perfil_id):
+        return self.por_id.get(perfil_id)
+
+    def actual(self):
+        return self.registrar(**DATOS_ESTABLECIMIENTO)
+
+    def todos(self):
+        with self.lock:
+            return [p.to_dict() for p in sorted(self.por_id.values(),
+                                                key=lambda p: p.perfil_id)]
+
+PERFILES = RegistroPerfiles()
+
+class GeneradorIds:
+    """IDs de ticket ordenables por tiempo, en base32 de Crockford.
+
+    16 caracteres: 10 de milisegundos desde 1970, 2 de la caja y 4 de una
+    secuencia. Dentro de un mismo milisegundo (o si el reloj retrocede) se
+    reutiliza el último instante y se incrementa la secuencia, así que los
+    IDs de una caja nunca se repiten y crecen en orden de creación; los de
+    cajas distintas difieren en el campo de la caja.
+    """
+    ALFABETO = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+    LARGO = 16
+    BITS_CAJA = 10
+    BITS_SECUENCIA = 20
+    # Lo que se teclea por error: minúsculas, I/L por 1, O por 0, guiones
+    NORMALIZAR = str.maketrans("ILO", "110", "- ")
+
+    def __init__(self, caja=0):
+        self.caja = caja % (1 << self.BITS_CAJA)
+        self.ultimo_ms = -1
+        self.secuencia = 0
+        self.lock = threading.Lock()
+
+    def nuevo(self, instante=None):
+        ms = int((instante or datetime.now()).timestamp() * 1000)
+        with self.lock:
+            if ms <= self.ultimo_ms:
+                ms = self.ultimo_ms
+                self.secuencia += 1
+                if self.secuencia >> self.BITS_SECUENCIA:
+                    ms += 1  # Secuencia agotada: se toma prestado el siguiente milisegundo
+                    self.secuencia = 0
+            else:
+                # Arranque al azar en la mitad baja: deja margen para incrementar
+                self.secuencia = int.from_bytes(os.urandom(4), "big") >> (33 - self.BITS_SECUENCIA)
+            self.ultimo_ms = ms
+            valor = ((ms << self.BITS_CAJA | self.caja) << self.BITS_SECUENCIA) | self.secuencia
+        return self.codificar(valor)
+
+    @classmethod
+    def codificar(cls, valor):
+        caracteres = []
+        for _ in range(cls.LARGO):
+            caracteres.append(cls.ALFABETO[valor & 31])
+            valor >>= 5
+        return "".join(reversed(caracteres))
+
+    @classmethod
+    def normalizar(cls, texto):
+        """Forma canónica de un ID tecleado; los IDs antiguos de 8 caracteres
+        hexadecimales no cambian"""
+        return texto.strip().upper().translate(cls.NORMALIZAR)
+
+    @classmethod
+    def instante(cls, ticket_id):
+        """Momento codificado en un ID nuevo; None para IDs antiguos"""
+        if len(ticket_id) != cls.LARGO:
+            return None
+        valor = 0
+        for caracter in ticket_id:
+            digito = cls.ALFABETO.find(caracter)
+            if digito < 0:
+                return None
+            valor = valor << 5 | digito
+        ms = valor >> (cls.BITS_CAJA + cls.BITS_SECUENCIA)
+        try:
+            return datetime.fromtimestamp(ms / 1000)
+        except (OverflowError, OSError, ValueError):
+            return None
+
+    @classmethod
+    def minimo(cls, instante):
+        """El menor ID posible para un instante: cota para recorrer rangos por ID"""
+        ms = int(instante.timestamp() * 1000)
+        return cls.codificar(ms << (cls.BITS_CAJA + cls.BITS_SECUENCIA))
+
+def caja_por_defecto():
+    """Número de caja de CAFETERIA_CAJA o, si no está o no es un número,
+    derivado del equipo"""
+    caja = os.environ.get("CAFETERIA_CAJA")
+    if not caja:
+        return uuid.getnode()
+    try:
+        return int(caja)
+    except ValueError:
+        print(f"CAFETERIA_CAJA inválida ({caja!r}); se usa la MAC del equipo")
+        return uuid.getnode()
+
+GENERADOR_IDS = GeneradorIds(caja_por_defecto())
 
 class Ticket:
-    def __init__(self, orden_id, bebidas, total, timestamp=None):
-        self.ticket_id = str(uuid.uuid4())[:8].upper()
+    __slots__ = ('ticket_id', 'orden_id', 'bebidas', 'total', 'timestamp', 'perfil')
+
+    def __init__(self, orden_id, bebidas, total, timestamp=None, ticket_id=None,
+                 perfil=None):
+        self.timestamp = timestamp or datetime.now()
+        self.ticket_id = ticket_id or GENERADOR_IDS.nuevo(self.timestamp)
         self.orden_id = orden_id
         self.bebidas = bebidas
         self.total = total
-        self.timestamp = timestamp or datetime.now()
-        self.establecimiento = "Cafetería FIEE - UV"
-        self.direccion = "Bv. Adolfo Ruiz Cortines,\nMar de Cortes y Costa Dorada"
-        self.ciudad = "Boca del Río, Veracruz, México"
-        self.telefono = "229 136 0054"
-        self.redes_sociales = {
-            "Facebook": "CafeteriaFIEE.UV",
-            "Instagram": "@cafeteria_fiee",
-            "Twitter": "@cafeteria_fiee"
+        self.perfil = perfil or PERFILES.actual()
+
+    @property
+    def establecimiento(self):
+        return self.perfil.establecimiento
+
+    @property
+    def direccion(self):
+        return self.perfil.direccion
+
+    @property
+    def ciudad(self):
+        return self.perfil.ciudad
+
+    @property
+    def telefono(self):
+        return self.perfil.telefono
+
+    @property
+    def redes_sociales(self):
+        return self.perfil.redes_sociales
+
+    def to_dict(self, completo=False):
+        """Registro del ticket; completo incluye los datos del establecimiento
+        en lugar de solo la referencia a su perfil (para exportar)."""
+        data = {
+            'ticket_id': self.ticket_id,
+            'orden_id': self.orden_id,
+            'bebidas': [(b.tipo, b.cantidad, b.extras) for b in self.bebidas],
+            'total': self.total,
+            'timestamp': self.timestamp.isoformat(),
+            'perfil': self.perfil.perfil_id
+        }
+        if completo:
+            data.update(self.perfil.to_dict())
+            del data['perfil_id']
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        if 'establecimiento' in data:
+            # Registro antiguo o exportado: trae los datos completos
+            perfil = PERFILES.registrar(
+                data['establecimiento'],
+                data.get('direccion', DATOS_ESTABLECIMIENTO['direccion']),
+                data.get('ciudad', DATOS_ESTABLECIMIENTO['ciudad']),
+                data.get('telefono', DATOS_ESTABLECIMIENTO['telefono']),
+                data.get('redes_sociales', DATOS_ESTABLECIMIENTO['redes_sociales']))
+        else:
+            perfil = PERFILES.obtener(data.get('perfil'))
+        return cls(
+            data['orden_id'],
+            [BebidaPersonalizada(tipo, cantidad, extras) 
+             for tipo, cantidad, extras in data['bebidas']],
+            data['total'],
+            datetime.fromisoformat(data['timestamp']),
+            ticket_id=data['ticket_id'],
+            perfil=perfil
+        )
+
+class BebidaPersonalizada:
+    __slots__ = ('tipo', 'cantidad', 'extras')
+
+    def __init__(self, tipo, cantidad=1, extras=None):
+        # Los nombres se internan: todas las bebidas comparten la misma cadena
+        self.tipo = sys.intern(tipo)
+        self.cantidad = cantidad
+        self.extras = tuple(sys.intern(e) for e in extras) if extras else ()
+    
+    def calcular_subtotal(self, precios_bebidas, precios_extras):
+        subtotal = precios_bebidas[self.tipo] * self.cantidad
+        for extra in self.extras:
+            subtotal += precios_extras[extra] * self.cantidad
+        return subtotal
+    
+    def calcular_tiempo(self, tiempo_bebidas, tiempo_extras):
+        tiempo_total = tiempo_bebidas[self.tipo]
+        for extra in self.extras:
+            tiempo_total += tiempo_extras[extra]
+        return tiempo_total * self.cantidad
+    
+    def __str__(self):
+        texto = f"{self.cantidad}x {self.tipo}"
+        if self.extras:
+            texto += f" con {', '.join(self.extras)}"
+        return texto
+
+class CatalogoMenu:
+    """Menú de bebidas y extras compilado en una tabla de búsqueda.
+
+    El catálogo se lee de un archivo JSON:
+    {"version": 1, "bebidas": {nombre: {"precio", "tiempo"}}, "extras": {...}}.
+    El precio y el tiempo por unidad de cada combinación (bebida, extras) se
+    calculan una sola vez y se guardan por la clave (bebida, frozenset(extras)).
+    Sin archivo se usan las tablas incluidas (versión 0); recargar() lee el
+    archivo cuando cambió y la versión sube en cada recarga.
+    """
+    def __init__(self, ruta=None):
+        self.ruta = ruta
+        self.version = 0
+        self.mtime = None
+        self.compilar({
+            'bebidas': {nombre: {'precio': PRECIO_BEBIDAS[nombre], 'tiempo': tiempo}
+                        for nombre, tiempo in TIEMPO_BEBIDAS.items()},
+            'extras': {nombre: {'precio': PRECIO_EXTRA[nombre], 'tiempo': tiempo}
+                       for nombre, tiempo in TIEMPO_EXTRA.items()}
+        })
+        self.version = 0
+
+    def compilar(self, datos):
+        """Valida el catálogo y reemplaza las tablas; limpia la memoria de combinaciones.
+
+        Cualquier problema del archivo se informa con ValueError y deja el
+        catálogo anterior intacto.
+        """
+        if not isinstance(datos, dict):
+            raise ValueError("Catálogo inválido: se esperaba un objeto JSON")
+        version = datos.get('version', 0)
+        if not isinstance(version, int) or isinstance(version, bool):
+            raise ValueError("Catálogo inválido: 'version' debe ser un entero")
+        tablas = {}
+        for seccion in ('bebidas', 'extras'):
+            productos = datos.get(seccion)
+            if not isinstance(productos, dict) or (seccion == 'bebidas' and not productos):
+                raise ValueError(f"Catálogo inválido: falta la sección '{seccion}'")
+            precios, tiempos = {}, {}
+            for nombre, producto in productos.items():
+                if not isinstance(producto, dict):
+                    raise ValueError(f"Catálogo inválido: '{nombre}' no es un objeto")
+                precio, tiempo = producto.get('precio'), producto.get('tiempo')
+                if (not isinstance(precio, (int, float)) or isinstance(precio, bool)
+                        or precio < 0):
+                    raise ValueError(f"Catálogo inválido: precio de '{nombre}'")
+                if not isinstance(tiempo, int) or isinstance(tiempo, bool) or tiempo < 0:
+                    raise ValueError(f"Catálogo inválido: tiempo de '{nombre}'")
+                nombre = sys.intern(nombre)
+                precios[nombre] = precio
+                tiempos[nombre] = tiempo
+            tablas[seccion] = (precios, tiempos)
+        self.precio_bebidas, self.tiempo_bebidas = tablas['bebidas']
+        self.precio_extra, self.tiempo_extra = tablas['extras']
+        self.unitarios = {}
+        self.version = max(self.version + 1, version)
+
+    def recargar(self):
+        """Relee el archivo si cambió; devuelve True si se compiló una versión nueva"""
+        if not self.ruta:
+            return False
+        try:
+            mtime = os.path.getmtime(self.ruta)
+        except OSError:
+            return False
+        if mtime == self.mtime:
+            return False
+        # Un archivo inválido no se vuelve a intentar hasta que cambie
+        self.mtime = mtime
+        with open(self.ruta, 'r', encoding='utf-8') as f:
+            datos = json.load(f)
+        self.compilar(datos)
+        return True
+
+    def unitario(self, tipo, extras=()):
+        """(precio, tiempo) de una unidad de la bebida con esos extras"""
+        clave = (tipo, frozenset(extras))
+        valor = self.unitarios.get(clave)
+        if valor is None:
+            try:
+                valor = (self.precio_bebidas[tipo] + sum(self.precio_extra[e] for e in clave[1]),
+                         self.tiempo_bebidas[tipo] + sum(self.tiempo_extra[e] for e in clave[1]))
+            except KeyError as e:
+                raise ValueError(f"Producto fuera del menú: {e.args[0]}")
+            self.unitarios[clave] = valor
+        return valor
+
+    def subtotal(self, bebida):
+        return self.unitario(bebida.tipo, bebida.extras)[0] * bebida.cantidad
+
+    def tiempo(self, bebida):
+        return self.unitario(bebida.tipo, bebida.extras)[1] * bebida.cantidad
+
+    def duraciones(self, bebidas):
+        """Una duración por unidad de bebida, para repartirlas entre estaciones"""
+        duraciones = []
+        for bebida in bebidas:
+            duraciones.extend([self.unitario(bebida.tipo, bebida.extras)[1]] * bebida.cantidad)
+        return duraciones
+
+    def disponible(self, bebida):
+        return (bebida.tipo in self.precio_bebidas
+                and all(e in self.precio_extra for e in bebida.extras))
+
+class DiarioTickets:
+    """Diario de tickets en formato JSON Lines (un ticket por línea).
+
+    Cada ticket nuevo se agrega al final del archivo, por lo que guardar una
+    venta cuesta lo mismo sin importar cuántos tickets existan.
+    """
+    def __init__(self, ruta, ruta_legado=None):
+        self.ruta = ruta
+        self.ruta_legado = ruta_legado
+        self.lineas_invalidas = 0
+        self.duplicados = 0
+
+    def migrar_legado(self):
+        """Convierte una sola vez el antiguo tickets.json al diario"""
+        if (not self.ruta_legado or os.path.exists(self.ruta)
+                or not os.path.exists(self.ruta_legado)):
+            return False
+        with open(self.ruta_legado, 'r') as f:
+            data = json.load(f)
+        tmp = self.ruta + ".tmp"
+        with open(tmp, 'w') as f:
+            for registro in data:
+                ticket = Ticket.from_dict(registro)
+                f.write(json.dumps(ticket.to_dict(), separators=(",", ":")) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.ruta)
+        # Conservar el archivo original como respaldo
+        os.replace(self.ruta_legado, self.ruta_legado + ".migrado")
+        return True
+
+    def cargar(self, desde_byte=0, hasta_byte=None):
+        """Lee el diario; con desde_byte, solo lo escrito a partir de esa posición
+        y con hasta_byte, solo lo escrito antes de esa otra"""
+        tickets = []
+        vistos = set()
+        self.lineas_invalidas = 0
+        self.duplicados = 0
+        if not os.path.exists(self.ruta):
+            return tickets
+        with open(self.ruta, 'rb') as f:
+            f.seek(desde_byte)
+            lineas = f if hasta_byte is None else f.read(hasta_byte - desde_byte).splitlines()
+            for linea in lineas:
+                linea = linea.strip()
+                if not linea:
+                    continue
+                ticket = self._leer_registro(linea)
+                if ticket is None:
+                    continue
+                if ticket.ticket_id in vistos:
+                    self.duplicados += 1
+                    continue
+                vistos.add(ticket.ticket_id)
+                tickets.append(ticket)
+        return tickets
+
+    def _leer_registro(self, linea):
+        try:
+            return Ticket.from_dict(json.loads(linea))
+        except (ValueError, KeyError, TypeError):
+            # Línea truncada por un cierre inesperado
+            self.lineas_invalidas += 1
+            return None
+
+    def agregar(self, ticket):
+        return self.agregar_lote([ticket])
+
+    def agregar_lote(self, tickets, sincronizar=False):
+        """Agrega varios tickets con una sola escritura; devuelve el tamaño final"""
+        datos = "".join(json.dumps(t.to_dict(), separators=(",", ":")) + "\n"
+                        for t in tickets)
+        if self._termina_sin_salto():
+            # Se mira el archivo y no lo que vio una lectura: el día pudo
+            # leerlo otra instancia, como la de DiarioPorDia.leer
+            datos = "\n" + datos
+        with open(self.ruta, 'a') as f:
+            f.write(datos)
+            f.flush()
+            if sincronizar:
+                os.fsync(f.fileno())
+            tam = os.fstat(f.fileno()).st_size
+        return tam
+
+    def _termina_sin_salto(self):
+        """Indica si el archivo termina en una línea cortada, sin salto final"""
+        try:
+            with open(self.ruta, 'rb') as f:
+                f.seek(0, os.SEEK_END)
+                if f.tell() == 0:
+                    return False
+                f.seek(-1, os.SEEK_END)
+                return f.read(1) != b"\n"
+        except FileNotFoundError:
+            return False
+
+    def necesita_compactar(self):
+        return self.lineas_invalidas > 0 or self.duplicados > 0
+
+    def compactar(self, tickets):
+        """Reescribe el diario de forma atómica sin líneas inválidas ni duplicadas"""
+        tmp = self.ruta + ".tmp"
+        with open(tmp, 'w') as f:
+            for ticket in tickets:
+                f.write(json.dumps(ticket.to_dict(), separators=(",", ":")) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.ruta)
+        self.lineas_invalidas = 0
+        self.duplicados = 0
+
+class DiarioPorDia:
+    """Tickets repartidos en un diario JSON Lines por día (AAAA-MM-DD.jsonl).
+
+    El manifiesto (manifest.json) guarda por día el número de tickets, la
+    suma de sus totales y el tamaño del archivo ya escrito. Al abrir se
+    reprocesa solo lo que quedó después de ese tamaño; un día que se
+    achicó se vuelve a contar completo.
+
+    fragmentos refleja todos los tickets aceptados (incluidos los que aún
+    esperan en EscritorDiferido); persistido, solo los que ya están en disco,
+    y es lo que se guarda en el manifiesto.
+    """
+    PATRON = re.compile(r"^(\d{4}-\d{2}-\d{2})\.jsonl$")
+
+    def __init__(self, directorio):
+        self.directorio = directorio
+        self.ruta_manifiesto = os.path.join(directorio, "manifest.json")
+        self.fragmentos = {}  # día -> {'tickets', 'total', 'bytes'}
+        self.persistido = {}
+        self.diarios = {}
+        self.danados = set()  # Días con líneas inválidas o repetidas vistos por leer
+        self.modificado = False
+        self.lock = threading.Lock()
+
+    def ruta(self, dia):
+        return os.path.join(self.directorio, f"{dia}.jsonl")
+
+    def diario(self, dia):
+        with self.lock:
+            if dia not in self.diarios:
+                self.diarios[dia] = DiarioTickets(self.ruta(dia))
+            return self.diarios[dia]
+
+    def abrir(self):
+        if os.path.exists(self.ruta_manifiesto):
+            try:
+                with open(self.ruta_manifiesto, 'r') as f:
+                    self.fragmentos = dict(json.load(f)['fragmentos'])
+            except (ValueError, KeyError, TypeError) as e:
+                # El manifiesto solo resume los archivos: se rehace desde ellos
+                print(f"Error al leer el manifiesto, se reconstruye: {e}")
+                self.fragmentos = {}
+                self.modificado = True
+        self.reconciliar()
+
+    def reconciliar(self):
+        """Ajusta el manifiesto a los archivos que realmente existen"""
+        encontrados = {}
+        for nombre in os.listdir(self.directorio):
+            coincidencia = self.PATRON.match(nombre)
+            if coincidencia:
+                encontrados[coincidencia.group(1)] = os.path.getsize(
+                    os.path.join(self.directorio, nombre))
+        for dia in list(self.fragmentos):
+            if dia not in encontrados:
+                del self.fragmentos[dia]
+                self.modificado = True
+        for dia, tam in encontrados.items():
+            entrada = self.fragmentos.get(dia)
+            if entrada is not None and entrada['bytes'] < tam:
+                # Escrito después del último manifiesto: reprocesar solo la cola
+                nuevos = DiarioTickets(self.ruta(dia)).cargar(desde_byte=entrada['bytes'])
+                entrada['tickets'] += len(nuevos)
+                entrada['total'] += sum(t.total for t in nuevos)
+                entrada['bytes'] = tam
+                self.modificado = True
+            elif entrada is None or entrada['bytes'] != tam:
+                self.corregir(dia, self.leer(dia))
+        self.persistido = {dia: dict(entrada) for dia, entrada in self.fragmentos.items()}
+
+    def migrar(self, ruta_diario):
+        """Reparte un diario único (tickets.jsonl) en archivos por día"""
+        por_dia = {}
+        for ticket in DiarioTickets(ruta_diario).cargar():
+            por_dia.setdefault(ticket.timestamp.date().isoformat(), []).append(ticket)
+        for dia, tickets in por_dia.items():
+            if dia in self.fragmentos:
+                # Un día que ya tenía archivo: unir sin repetir IDs
+                unicos = {t.ticket_id: t for t in self.leer(dia) + tickets}
+                tickets = list(unicos.values())
+            tickets.sort(key=lambda t: t.timestamp)
+            self.diario(dia).compactar(tickets)
+            self.corregir(dia, tickets)
+        os.replace(ruta_diario, ruta_diario + ".migrado")
+        self.guardar_manifiesto()
+
+    def dias(self):
+        # Se llama desde hilos de fondo mientras la interfaz registra tickets
+        with self.lock:
+            return sorted(self.fragmentos)
+
+    def leer(self, dia, hasta_byte=None):
+        """Lee un día completo (o sus primeros hasta_byte); seguro desde un
+        hilo de fondo.
+
+        Si el día tiene líneas inválidas o repetidas queda en danados para
+        que el almacén lo reescriba al compactar.
+        """
+        diario = DiarioTickets(self.ruta(dia))
+        tickets = diario.cargar(hasta_byte=hasta_byte)
+        if diario.necesita_compactar():
+            with self.lock:
+                self.danados.add(dia)
+        return tickets
+
+    def corregir(self, dia, tickets):
+        """Actualiza la entrada del manifiesto con el contenido leído de un día"""
+        entrada = {
+            'tickets': len(tickets),
+            'total': sum(t.total for t in tickets),
+            'bytes': os.path.getsize(self.ruta(dia)) if os.path.exists(self.ruta(dia)) else 0
+        }
+        with self.lock:
+            self.fragmentos[dia] = entrada
+            self.persistido[dia] = dict(entrada)
+            self.modificado = True
+
+    def registrar(self, ticket):
+        """Cuenta un ticket aceptado; el archivo lo escribe EscritorDiferido"""
+        with self.lock:
+            entrada = self.fragmentos.setdefault(ticket.timestamp.date().isoformat(),
+                                                 {'tickets': 0, 'total': 0, 'bytes': 0})
+        entrada['tickets'] += 1
+        entrada['total'] += ticket.total
+
+    def escribir_grupo(self, tickets, sincronizar=False, al_escribir=None):
+        """Escribe un grupo de tickets, una escritura por día.
+
+        al_escribir(tickets_del_dia) se llama después de cada día escrito, para
+        que quien reintenta sepa qué parte del grupo ya quedó en disco.
+        """
+        por_dia = {}
+        for ticket in tickets:
+            por_dia.setdefault(ticket.timestamp.date().isoformat(), []).append(ticket)
+        for dia, del_dia in por_dia.items():
+            tam = self.diario(dia).agregar_lote(del_dia, sincronizar)
+            with self.lock:
+                entrada = self.persistido.setdefault(dia, {'tickets': 0, 'total': 0, 'bytes': 0})
+                entrada['tickets'] += len(del_dia)
+                entrada['total'] += sum(t.total for t in del_dia)
+                entrada['bytes'] = tam
+                self.modificado = True
+            if al_escribir:
+                al_escribir(del_dia)
+
+    def agregar(self, ticket):
+        self.registrar(ticket)
+        self.escribir_grupo([ticket])
+
+    def total_tickets(self):
+        return sum(entrada['tickets'] for entrada in self.fragmentos.values())
+
+    def buscar_id(self, ticket_id, excluir=()):
+        """Día cuyo archivo contiene el ID, buscando los bytes sin decodificar"""
+        patrones = [f'"ticket_id":"{ticket_id}"'.encode(),
+                    f'"ticket_id": "{ticket_id}"'.encode()]
+        for dia in reversed(self.dias()):
+            if dia in excluir:
+                continue
+            with open(self.ruta(dia), 'rb') as f:
+                contenido = f.read()
+            if any(patron in contenido for patron in patrones):
+                return dia
+        return None
+
+    def guardar_manifiesto(self):
+        with self.lock:
+            if not self.modificado:
+                return
+            fragmentos = {dia: dict(entrada) for dia, entrada in self.persistido.items()}
+            self.modificado = False
+        tmp = self.ruta_manifiesto + ".tmp"
+        try:
+            with open(tmp, 'w') as f:
+                json.dump({'version': 1, 'fragmentos': fragmentos}, f, indent=1)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.ruta_manifiesto)
+        except OSError:
+            with self.lock:
+                self.modificado = True  # Se reintenta en el próximo guardado
+            raise
+
+class EscritorDiferido:
+    """Hilo que escribe los tickets en disco fuera del hilo de la interfaz.
+
+    Los tickets se confirman en grupo: al juntar TAM_GRUPO o al pasar
+    ESPERA_GRUPO segundos desde el primero. Política de fsync:
+    "siempre" (cada grupo), "intervalo" (a lo más cada INTERVALO_FSYNC
+    segundos) o "nunca" (lo decide el sistema operativo).
+    """
+    TAM_GRUPO = 64
+    ESPERA_GRUPO = 0.05
+    INTERVALO_FSYNC = 1.0
+    INTERVALO_MANIFIESTO = 5.0
+    POLITICAS_FSYNC = ("siempre", "intervalo", "nunca")
+    DESPERTAR = object()  # Marca en la cola: solo hay estados por escribir
+
+    def __init__(self, diario, politica_fsync="intervalo"):
+        if politica_fsync not in self.POLITICAS_FSYNC:
+            raise ValueError(f"Política de fsync desconocida: {politica_fsync}")
+        self.diario = diario
+        self.politica_fsync = politica_fsync
+        self.cola = queue.Queue()
+        self.pendientes = []  # Tickets de un grupo fallido que aún no están en disco
+        self.estados = {}  # ruta -> último contenido JSON por escribir
+        self.lock = threading.Lock()
+        self.hilo = None
+        self.grupos = 0
+        self.escritos = 0
+        self.errores = 0
+        self.ultimo_fsync = time.monotonic()
+        self.ultimo_manifiesto = time.monotonic()
+
+    def iniciar(self):
+        if self.hilo is not None:
+            return
+        self.hilo = threading.Thread(target=self._ejecutar, daemon=True)
+        self.hilo.start()
+
+    def encolar(self, ticket):
+        self.cola.put(ticket)
+
+    def guardar_estado(self, ruta, datos):
+        """Escribe un archivo JSON después del próximo grupo; solo vale el último"""
+        with self.lock:
+            self.estados[ruta] = datos
+        self.cola.put(self.DESPERTAR)
+
+    def detener(self):
+        """Escribe lo pendiente y termina el hilo"""
+        if self.hilo is None:
+            return
+        self.cola.put(None)
+        self.hilo.join()
+        self.hilo = None
+
+    def _ejecutar(self):
+        terminar = False
+        while not terminar:
+            primero = self.cola.get()
+            if primero is None:
+                break
+            grupo = [] if primero is self.DESPERTAR else [primero]
+            limite = time.monotonic() + self.ESPERA_GRUPO
+            while len(grupo) < self.TAM_GRUPO:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    ticket = self.cola.get(timeout=restante)
+                except queue.Empty:
+                    break
+                if ticket is None:
+                    terminar = True
+                    break
+                if ticket is not self.DESPERTAR:
+                    grupo.append(ticket)
+            self._confirmar(grupo, forzar=terminar)
+        # Al cerrar: lo que quede de un grupo fallido y el manifiesto final
+        self._confirmar([], forzar=True)
+
+    def _confirmar(self, grupo, forzar=False):
+        self.pendientes.extend(grupo)
+        ahora = time.monotonic()
+        sincronizar = self.politica_fsync == "siempre" or (
+            self.politica_fsync == "intervalo"
+            and (forzar or ahora - self.ultimo_fsync >= self.INTERVALO_FSYNC))
+        if self.pendientes:
+            try:
+                with METRICAS.medir("escritor.grupo"):
+                    self.diario.escribir_grupo(list(self.pendientes), sincronizar,
+                                               al_escribir=self._quitar_escritos)
+                self.grupos += 1
+            except Exception as e:
+                # Quedan pendientes solo los días que no se escribieron;
+                # el diario tolera una línea cortada
+                self.errores += 1
+                print(f"Error al escribir tickets: {e}")
+                return
+        if sincronizar:
+            self.ultimo_fsync = ahora
+        # Los estados van después de los tickets: nunca adelantan al diario.
+        # Ni ellos ni el manifiesto devuelven tickets a pendientes si fallan.
+        try:
+            self._escribir_estados()
+        except Exception as e:
+            self.errores += 1
+            print(f"Error al guardar estados: {e}")
+        if forzar or ahora - self.ultimo_manifiesto >= self.INTERVALO_MANIFIESTO:
+            try:
+                self.diario.guardar_manifiesto()
+                self.ultimo_manifiesto = ahora
+            except Exception as e:
+                self.errores += 1
+                print(f"Error al guardar el manifiesto: {e}")
+
+    def _quitar_escritos(self, tickets):
+        """Saca de pendientes los tickets de un día que ya quedó en disco"""
+        escritos = set(map(id, tickets))
+        self.pendientes = [t for t in self.pendientes if id(t) not in escritos]
+        self.escritos += len(tickets)
+        METRICAS.contar("escritor.tickets", len(tickets))
+
+    def _escribir_estados(self):
+        with self.lock:
+            estados, self.estados = self.estados, {}
+        for ruta, datos in estados.items():
+            try:
+                tmp = ruta + ".tmp"
+                with open(tmp, 'w') as f:
+                    json.dump(datos, f, indent=1)
+                os.replace(tmp, ruta)
+            except OSError:
+                with self.lock:
+                    self.estados.setdefault(ruta, datos)
+                raise
+
+def mismo_ticket(a, b):
+    """Dos registros con el mismo ticket_id describen la misma venta"""
+    return (a.timestamp == b.timestamp and a.orden_id == b.orden_id and
+            abs(a.total - b.total) < 0.005 and
+            [(x.tipo, x.cantidad, list(x.extras)) for x in a.bebidas] ==
+            [(x.tipo, x.cantidad, list(x.extras)) for x in b.bebidas])
+
+def coincide_busqueda(ticket, busqueda):
+    """Criterio de búsqueda del historial (busqueda ya en minúsculas)"""
+    return (not busqueda or
+            busqueda in ticket.ticket_id.lower() or
+            busqueda in str(ticket.total).lower() or
+            any(busqueda in str(b).lower() for b in ticket.bebidas))
+
+class IndiceTickets:
+    """Índices en memoria: diccionario por ticket_id y arreglo ordenado por fecha.
+
+    Las búsquedas por ID son O(1) y las consultas por día o rango de fechas
+    usan bisect sobre el arreglo ordenado, O(log n + resultados).
+    """
+    def __init__(self, tickets=()):
+        self.por_id = {}
+        self.marcas = []
+        self.ordenados = []
+        for ticket in sorted(tickets, key=lambda t: t.timestamp):
+            self.por_id[ticket.ticket_id] = ticket
+            self.marcas.append(ticket.timestamp)
+            self.ordenados.append(ticket)
+
+    def __len__(self):
+        return len(self.ordenados)
+
+    def agregar(self, ticket):
+        self.por_id[ticket.ticket_id] = ticket
+        # Caso común: los tickets nuevos llegan en orden cronológico
+        if not self.marcas or ticket.timestamp >= self.marcas[-1]:
+            self.marcas.append(ticket.timestamp)
+            self.ordenados.append(ticket)
+        else:
+            i = bisect.bisect_right(self.marcas, ticket.timestamp)
+            self.marcas.insert(i, ticket.timestamp)
+            self.ordenados.insert(i, ticket)
+
+    def fusionar(self, tickets):
+        """Agrega un lote; si es cronológico y cabe en un hueco, en bloque.
+
+        Un lote que se intercala con los existentes se mezcla en una sola
+        pasada, O(n + k log n), en vez de insertar ticket por ticket.
+        Devuelve cuántos tickets se agregaron (los IDs repetidos se omiten).
+        """
+        tickets = [t for t in tickets if t.ticket_id not in self.por_id]
+        if not tickets:
+            return 0
+        marcas = [t.timestamp for t in tickets]
+        if any(a > b for a, b in zip(marcas, marcas[1:])):
+            tickets.sort(key=lambda t: t.timestamp)
+            marcas.sort()
+        for ticket in tickets:
+            self.por_id[ticket.ticket_id] = ticket
+        pos = bisect.bisect_right(self.marcas, marcas[0])
+        if pos == len(self.marcas) or marcas[-1] <= self.marcas[pos]:
+            self.marcas[pos:pos] = marcas
+            self.ordenados[pos:pos] = tickets
+            return len(tickets)
+        ordenados = []
+        nuevas = []
+        previo = 0
+        for ticket, marca in zip(tickets, marcas):
+            pos = bisect.bisect_right(self.marcas, marca, previo)
+            ordenados += self.ordenados[previo:pos]
+            nuevas += self.marcas[previo:pos]
+            ordenados.append(ticket)
+            nuevas.append(marca)
+            previo = pos
+        ordenados += self.ordenados[previo:]
+        nuevas += self.marcas[previo:]
+        self.ordenados = ordenados
+        self.marcas = nuevas
+        return len(tickets)
+
+    def obtener(self, ticket_id):
+        return self.por_id.get(ticket_id)
+
+    def rango(self, desde, hasta):
+        """Tickets con desde <= timestamp < hasta, en orden cronológico"""
+        inicio = bisect.bisect_left(self.marcas, desde)
+        fin = bisect.bisect_left(self.marcas, hasta, inicio)
+        return self.ordenados[inicio:fin]
+
+    def del_dia(self, fecha):
+        inicio = datetime.combine(fecha, datetime.min.time())
+        return self.rango(inicio, inicio + timedelta(days=1))
+
+class IndiceTexto:
+    """Índice invertido de trigramas para la búsqueda del historial.
+
+    Indexa el ID, el total y cada bebida (tipo y extras) de cada ticket. Una
+    búsqueda intersecta las listas de sus trigramas y solo verifica la
+    subcadena sobre los candidatos resultantes.
+    """
+    N = 3
+
+    def __init__(self, tickets=()):
+        self.postings = {}
+        self.textos = {}
+        self.agregar_varios(tickets)
+
+    def gramas_de(self, texto):
+        return {texto[i:i + self.N] for i in range(len(texto) - self.N + 1)}
+
+    @staticmethod
+    def textos_de(ticket):
+        return ((ticket.ticket_id.lower(), str(ticket.total).lower()) +
+                tuple(str(b).lower() for b in ticket.bebidas))
+
+    def agregar(self, ticket):
+        textos = self.textos_de(ticket)
+        self.textos[ticket.ticket_id] = textos
+        gramas = set()
+        for texto in textos:
+            gramas.update(texto[i:i + self.N] for i in range(len(texto) - self.N + 1))
+        for grama in gramas:
+            self.postings.setdefault(grama, set()).add(ticket.ticket_id)
+
+    def agregar_varios(self, tickets):
+        """Indexa un lote agrupando los tickets por texto de bebida.
+
+        Los textos de bebidas se repiten mucho ("2x latte con leche extra"):
+        los trigramas de cada texto distinto se recorren una sola vez.
+        """
+        por_texto = {}
+        for ticket in tickets:
+            ticket_id = ticket.ticket_id
+            textos = self.textos_de(ticket)
+            self.textos[ticket_id] = textos
+            for grama in self.gramas_de(textos[0]) | self.gramas_de(textos[1]):
+                self.postings.setdefault(grama, set()).add(ticket_id)
+            for texto in textos[2:]:
+                ids = por_texto.get(texto)
+                if ids is None:
+                    por_texto[texto] = ids = set()
+                ids.add(ticket_id)
+        for texto, ids in por_texto.items():
+            for grama in self.gramas_de(texto):
+                lista = self.postings.get(grama)
+                if lista is None:
+                    self.postings[grama] = set(ids)
+                else:
+                    lista |= ids
+
+    def fusionar(self, otro):
+        """Incorpora un índice parcial construido en otro hilo"""
+        for ticket_id, textos in otro.textos.items():
+            self.textos.setdefault(ticket_id, textos)
+        for grama, ids in otro.postings.items():
+            lista = self.postings.get(grama)
+            if lista is None:
+                self.postings[grama] = ids
+            else:
+                lista |= ids
+
+    def listas(self, busqueda):
+        """Listas de IDs de cada trigrama de la búsqueda, de menor a mayor.
+
+        Devuelve None si la búsqueda es demasiado corta para el índice y una
+        lista vacía si algún trigrama no aparece en ningún ticket.
+        """
+        if len(busqueda) < self.N:
+            return None
+        listas = []
+        for i in range(len(busqueda) - self.N + 1):
+            lista = self.postings.get(busqueda[i:i + self.N])
+            if not lista:
+                return []
+            listas.append(lista)
+        listas.sort(key=len)
+        return listas
+
+    def coincide(self, ticket_id, busqueda):
+        return any(busqueda in texto for texto in self.textos.get(ticket_id, ()))
+
+def recientes_de(tickets, desplazamiento, limite):
+    """Rebanada más-reciente-primero de una lista en orden cronológico"""
+    fin = max(0, len(tickets) - desplazamiento)
+    return tickets[max(0, fin - limite):fin][::-1]
+
+class AlmacenTicketsJSON:
+    """Almacén de tickets en memoria respaldado por diarios JSON Lines por día.
+
+    Solo se cargan los días que se necesitan: al abrir, los posteriores a
+    desde; el resto, bajo demanda (filtro de fecha, búsqueda por ID) o en
+    segundo plano con cargar_historial.
+    """
+    def __init__(self, directorio, politica_fsync=None):
+        self.directorio = directorio
+        self.diario = DiarioPorDia(directorio)
+        self.escritor = EscritorDiferido(
+            self.diario, politica_fsync or os.environ.get("CAFETERIA_FSYNC", "intervalo"))
+        self.ruta_perfiles = os.path.join(directorio, "perfiles.json")
+        self.ruta_acumulados = os.path.join(directorio, "acumulados.json")
+        self.perfiles_guardados = 0
+        self.indice = IndiceTickets()
+        self.indice_texto = IndiceTexto()
+        self.cargados = set()
+        self.historial_completo = True
+
+    def abrir(self, desde=None):
+        """Carga el historial; con desde, solo los días a partir de esa fecha.
+
+        El escritor arranca antes de leer nada: aunque la carga falle, las
+        ventas nuevas se siguen guardando. Un perfiles.json dañado no detiene
+        la carga; el error se lanza al final, con el diario ya abierto.
+        """
+        self.escritor.iniciar()
+        # Los perfiles van antes de las migraciones: los tickets los referencian
+        danado = self.cargar_perfiles()
+        # Migraciones: tickets.json -> tickets.jsonl -> un archivo por día
+        ruta_unica = os.path.join(self.directorio, "tickets.jsonl")
+        legado = DiarioTickets(ruta_unica,
+                               ruta_legado=os.path.join(self.directorio, "tickets.json"))
+        if legado.migrar_legado():
+            print("Tickets migrados de tickets.json a tickets.jsonl")
+        self.diario.abrir()
+        if os.path.exists(ruta_unica):
+            self.diario.migrar(ruta_unica)
+            print("Tickets repartidos en archivos por día")
+        
+        dias = self.diario.dias()
+        if desde is not None:
+            dias = [d for d in dias if d >= desde.date().isoformat()]
+        tickets = []
+        for dia in dias:
+            tickets.extend(self.diario.diario(dia).cargar())
+        self.cargados = set(dias)
+        self.historial_completo = len(self.cargados) == len(self.diario.fragmentos)
+        self.indice = IndiceTickets(tickets)
+        self.indice_texto = IndiceTexto(tickets)
+        self.guardar_perfiles()
+        self.diario.guardar_manifiesto()
+        if danado is not None:
+            raise ValueError(f"perfiles.json dañado ({danado}); se apartó como "
+                             f"perfiles.json.danado") from danado
+
+    def cargar_perfiles(self):
+        """Carga perfiles.json; si está dañado lo aparta y devuelve el error.
+
+        No se sobrescribe: los tickets guardados apuntan a esos perfiles. Los
+        que se creen después toman IDs mayores que cualquiera de los diarios.
+        """
+        if not os.path.exists(self.ruta_perfiles):
+            return None
+        try:
+            with open(self.ruta_perfiles, 'r') as f:
+                registros = json.load(f)
+            PERFILES.cargar(registros)
+        except (ValueError, TypeError) as e:
+            os.replace(self.ruta_perfiles, self.ruta_perfiles + ".danado")
+            PERFILES.reservar_hasta(self.mayor_perfil_usado())
+            return e
+        self.perfiles_guardados = len(registros)
+        return None
+
+    def mayor_perfil_usado(self):
+        """Mayor ID de perfil en los diarios, buscando los bytes sin decodificar"""
+        patron = re.compile(rb'"perfil": ?(\d+)')
+        mayor = 0
+        for nombre in os.listdir(self.directorio):
+            if nombre.endswith(".jsonl"):
+                with open(os.path.join(self.directorio, nombre), 'rb') as f:
+                    for coincidencia in patron.finditer(f.read()):
+                        mayor = max(mayor, int(coincidencia.group(1)))
+        return mayor
+
+    def guardar_perfiles(self):
+        """Guarda el registro de perfiles si apareció alguna versión nueva"""
+        if len(PERFILES.por_id) <= self.perfiles_guardados:
+            return
+        registros = PERFILES.todos()
+        tmp = self.ruta_perfiles + ".tmp"
+        with open(tmp, 'w') as f:
+            json.dump(registros, f, indent=4)
+        os.replace(tmp, self.ruta_perfiles)
+        self.perfiles_guardados = len(registros)
+
+    def cargar_historial(self):
+        """Generador para un hilo de fondo: un lote por cada día no cargado.
+
+        Los días van del más reciente al más antiguo y cada lote lleva su
+        índice de texto ya construido; se incorpora con fusionar desde el
+        hilo de la interfaz.
+        """
+        for dia in reversed(self.diario.dias()):
+            if dia not in self.cargados:
+                tickets = self.diario.leer(dia)
+                yield dia, tickets, IndiceTexto(tickets)
+
+    def fusionar(self, lote):
+        dia, tickets, indice_texto = lote
+        if dia in self.cargados:
+            return 0  # Ya se cargó bajo demanda
+        agregados = self.indice.fusionar(tickets)
+        self.indice_texto.fusionar(indice_texto)
+        self.cargados.add(dia)
+        self.diario.corregir(dia, tickets)
+        return agregados
+
+    def terminar_carga(self):
+        self.historial_completo = len(self.cargados) >= len(self.diario.fragmentos)
+        self.guardar_perfiles()
+        self.diario.guardar_manifiesto()
+
+    def asegurar_dia(self, dia):
+        """Carga un día en los índices si aún no está; cuesta O(un día)"""
+        if dia in self.cargados:
+            return
+        if dia in self.diario.fragmentos:
+            tickets = self.diario.diario(dia).cargar()
+            self.fusionar((dia, tickets, IndiceTexto(tickets)))
+        else:
+            self.cargados.add(dia)
+
+    def agregar(self, ticket):
+        self.guardar_perfiles()
+        self.asegurar_dia(ticket.timestamp.date().isoformat())
+        self.indice.agregar(ticket)
+        self.indice_texto.agregar(ticket)
+        self.diario.registrar(ticket)
+        self.escritor.encolar(ticket)
+
+    def preparar_combinar(self, tickets):
+        """Para el hilo lector de una importación: el índice de texto del lote"""
+        return IndiceTexto(tickets)
+
+    def combinar(self, tickets, preparado=None):
+        """Agrega un lote importado; devuelve (insertados, omitidos, conflictos).
+
+        preparado es lo que devolvió preparar_combinar para el lote; si entra
+        completo, su índice de texto se incorpora sin volver a calcularlo.
+        Un ID ya presente se omite si el ticket es idéntico y es conflicto si
+        difiere; conflictos es la lista de esos IDs. El índice por ID debe
+        cubrir todo el historial: la interfaz espera a que termine la carga de
+        fondo; sin ella (o si un día no se pudo cargar) aquí se cargan los
+        días que falten.
+        """
+        if not self.historial_completo:
+            for dia in self.diario.dias():
+                self.asegurar_dia(dia)
+            self.terminar_carga()
+        insertados, omitidos, conflictos = [], 0, []
+        nuevos = {}
+        for ticket in tickets:
+            existente = self.indice.obtener(ticket.ticket_id) or nuevos.get(ticket.ticket_id)
+            if existente is None:
+                nuevos[ticket.ticket_id] = ticket
+            elif mismo_ticket(existente, ticket):
+                omitidos += 1
+            else:
+                conflictos.append(ticket.ticket_id)
+        insertados = list(nuevos.values())
+        if insertados:
+            self.guardar_perfiles()
+            self.indice.fusionar(insertados)
+            if preparado is not None and len(insertados) == len(tickets):
+                self.indice_texto.fusionar(preparado)
+            else:
+                self.indice_texto.agregar_varios(insertados)
+            for ticket in insertados:
+                self.diario.registrar(ticket)
+                self.escritor.encolar(ticket)
+        return insertados, omitidos, conflictos
+
+    def obtener(self, ticket_id):
+        ticket = self.indice.obtener(ticket_id)
+        if ticket is None and not self.historial_completo:
+            # Los IDs nuevos traen su fecha: se prueba primero ese día
+            instante = GeneradorIds.instante(ticket_id)
+            if instante is not None:
+                self.asegurar_dia(instante.date().isoformat())
+                ticket = self.indice.obtener(ticket_id)
+                if ticket is not None:
+                    return ticket
+            dia = self.diario.buscar_id(ticket_id, excluir=self.cargados)
+            if dia:
+                self.asegurar_dia(dia)
+                ticket = self.indice.obtener(ticket_id)
+        return ticket
+
+    def rango(self, desde, hasta):
+        for dia in self.diario.dias():
+            if desde.date().isoformat() <= dia <= hasta.date().isoformat():
+                self.asegurar_dia(dia)
+        return self.indice.rango(desde, hasta)
+
+    def filtrar(self, fecha, busqueda=""):
+        self.asegurar_dia(fecha.isoformat())
+        del_dia = self.indice.del_dia(fecha)
+        if not busqueda:
+            return del_dia
+        listas = self.indice_texto.listas(busqueda)
+        if listas is None:
+            # Búsqueda muy corta para el índice: se revisa solo el día
+            encontrados = del_dia
+        elif not listas:
+            return []
+        elif len(del_dia) <= len(listas[0]):
+            # El día es más chico que cualquier lista: probar pertenencia
+            encontrados = [t for t in del_dia
+                           if all(t.ticket_id in lista for lista in listas)]
+        else:
+            candidatos = set.intersection(*listas)
+            encontrados = [self.indice.obtener(tid) for tid in candidatos]
+            encontrados = [t for t in encontrados if t.timestamp.date() == fecha]
+            encontrados.sort(key=lambda t: t.timestamp)
+        return [t for t in encontrados
+                if self.indice_texto.coincide(t.ticket_id, busqueda)]
+
+    def contar(self):
+        if self.historial_completo:
+            return len(self.indice)
+        return self.diario.total_tickets()
+
+    def recientes(self, desplazamiento, limite):
+        if self.historial_completo:
+            return recientes_de(self.indice.ordenados, desplazamiento, limite)
+        # Recorrer los días del más reciente usando los conteos del manifiesto
+        resultado = []
+        for dia in reversed(self.diario.dias()):
+            cantidad = self.diario.fragmentos[dia]['tickets']
+            if desplazamiento >= cantidad:
+                desplazamiento -= cantidad
+                continue
+            self.asegurar_dia(dia)
+            del_dia = self.indice.del_dia(datetime.strptime(dia, "%Y-%m-%d").date())
+            resultado.extend(recientes_de(del_dia, desplazamiento, limite - len(resultado)))
+            desplazamiento = 0
+            if len(resultado) >= limite:
+                break
+        return resultado
+
+    def todos(self):
+        return list(self.iterar())
+
+    def iterar(self, desde=None, hasta=None):
+        """Recorre los tickets por día sin cargar en los índices los que faltan.
+
+        desde/hasta (hasta excluido) limitan el recorrido a los días del rango.
+        Se llama en el hilo de la interfaz y fija ahí lo que se recorre: copia
+        la lista ordenada del índice y anota el tamaño de cada día sin cargar.
+        El generador puede consumirse en un hilo de fondo; no ve lo que se
+        agregue, importe o fusione después.
+        """
+        en_indice = self.indice.rango(desde or datetime.min, hasta or datetime.max)
+        sin_cargar = []
+        for dia in self.diario.dias():
+            if dia in self.cargados or (desde and dia < desde.date().isoformat()):
+                continue
+            if hasta and dia > hasta.date().isoformat():
+                break
+            # Un día sin cargar no tiene ventas en cola: su tamaño es definitivo
+            ruta = self.diario.ruta(dia)
+            sin_cargar.append((dia, os.path.getsize(ruta) if os.path.exists(ruta) else 0))
+        return self._recorrer(en_indice, sin_cargar, desde, hasta)
+
+    def _recorrer(self, en_indice, sin_cargar, desde, hasta):
+        """Intercala los tickets copiados del índice con los días leídos de disco"""
+        i = 0
+        for dia, tam in sin_cargar:
+            comienzo = datetime.strptime(dia, "%Y-%m-%d")
+            while i < len(en_indice) and en_indice[i].timestamp < comienzo:
+                yield en_indice[i]
+                i += 1
+            tickets = self.diario.leer(dia, hasta_byte=tam)
+            if desde or hasta:
+                tickets = [t for t in tickets
+                           if (not desde or t.timestamp >= desde)
+                           and (not hasta or t.timestamp < hasta)]
+            yield from tickets
+        yield from itertools.islice(en_indice, i, None)
+
+    def contar_rango(self, desde, hasta):
+        """Tickets de los días completos entre desde y hasta, según el manifiesto"""
+        primero = desde.date().isoformat()
+        ultimo = (hasta - timedelta(microseconds=1)).date().isoformat()
+        return sum(fragmento['tickets'] for dia, fragmento in self.diario.fragmentos.items()
+                   if primero <= dia <= ultimo)
+
+    def compactar(self):
+        """Reescribe los días dañados con el escritor en pausa.
+
+        Incluye los que solo se leyeron desde un hilo de fondo, estén o no
+        cargados en los índices.
+        """
+        activo = self.escritor.hilo is not None
+        self.escritor.detener()
+        with self.diario.lock:
+            danados, self.diario.danados = self.diario.danados, set()
+        for dia in sorted(self.cargados | danados):
+            diario = self.diario.diarios.get(dia)
+            if dia not in danados and not (diario and diario.necesita_compactar()):
+                continue
+            diario = self.diario.diario(dia)
+            if dia in self.cargados:
+                tickets = self.indice.del_dia(datetime.strptime(dia, "%Y-%m-%d").date())
+            else:
+                tickets = diario.cargar()
+            diario.compactar(tickets)
+            self.diario.corregir(dia, tickets)
+        self.diario.guardar_manifiesto()
+        if activo:
+            self.escritor.iniciar()
+
+    def contar_dia(self, fecha):
+        self.asegurar_dia(fecha.isoformat())
+        return len(self.indice.del_dia(fecha))
+
+    def cargar_acumulados(self):
+        if not os.path.exists(self.ruta_acumulados):
+            return None
+        with open(self.ruta_acumulados, 'r') as f:
+            return json.load(f)
+
+    def guardar_acumulados(self, datos):
+        """Los escribe el escritor de fondo, después de los tickets que resumen"""
+        self.escritor.guardar_estado(self.ruta_acumulados, datos)
+
+    def cerrar(self):
+        self.compactar()
+        self.escritor.detener()
+
+class AlmacenTicketsSQLite:
+    """Almacén de tickets en SQLite (modo WAL) con índices por fecha, ID y orden"""
+    ESQUEMA = """
+        CREATE TABLE IF NOT EXISTS tickets (
+            ticket_id TEXT NOT NULL,
+            orden_id INTEGER,
+            total REAL NOT NULL,
+            timestamp TEXT NOT NULL,
+            establecimiento TEXT,
+            direccion TEXT,
+            ciudad TEXT,
+            telefono TEXT,
+            redes_sociales TEXT
+        );
+        CREATE TABLE IF NOT EXISTS perfiles (
+            perfil_id INTEGER PRIMARY KEY,
+            datos TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS bebidas (
+            ticket_id TEXT NOT NULL,
+            posicion INTEGER NOT NULL,
+            tipo TEXT NOT NULL,
+            cantidad INTEGER NOT NULL,
+            extras TEXT NOT NULL,
+            texto TEXT NOT NULL,
+            PRIMARY KEY (ticket_id, posicion)
+        );
+        CREATE TABLE IF NOT EXISTS acumulados (
+            clave TEXT PRIMARY KEY,
+            datos TEXT NOT NULL
+        );
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_tickets_ticket_id ON tickets(ticket_id);
+        CREATE INDEX IF NOT EXISTS idx_tickets_timestamp ON tickets(timestamp);
+        CREATE INDEX IF NOT EXISTS idx_tickets_orden_id ON tickets(orden_id);
+    """
+    # Las columnas del establecimiento solo se llenan en filas anteriores a
+    # los perfiles; las filas nuevas guardan perfil_id
+    COLUMNAS = ("ticket_id, orden_id, total, timestamp, perfil_id, establecimiento, "
+                "direccion, ciudad, telefono, redes_sociales")
+
+    def __init__(self, directorio):
+        self.directorio = directorio
+        self.ruta = os.path.join(directorio, "tickets.db")
+        self.conexion = None
+        self.perfiles_guardados = set()
+        # La conexión se comparte entre hilos, protegida por este candado
+        self.lock = threading.Lock()
+
+    def abrir(self, desde=None):
+        # Las consultas van directo a la base; no hay historial que precargar
+        self.conexion = sqlite3.connect(self.ruta, check_same_thread=False)
+        self.conexion.execute("PRAGMA journal_mode=WAL")
+        self.conexion.execute("PRAGMA synchronous=NORMAL")
+        self.conexion.executescript(self.ESQUEMA)
+        columnas = [fila[1] for fila in self.conexion.execute("PRAGMA table_info(tickets)")]
+        if "perfil_id" not in columnas:
+            self.conexion.execute("ALTER TABLE tickets ADD COLUMN perfil_id INTEGER")
+        registros = [json.loads(datos) for (datos,) in
+                     self.conexion.execute("SELECT datos FROM perfiles")]
+        PERFILES.cargar(registros)
+        self.perfiles_guardados = {r['perfil_id'] for r in registros}
+        # Primera apertura: importar el historial existente
+        if self.contar() == 0:
+            diario = DiarioPorDia(self.directorio)
+            diario.abrir()
+            if diario.dias():
+                importados = self.importar_tickets(
+                    t for dia in diario.dias() for t in diario.leer(dia))
+                print(f"Importados {importados} tickets de los archivos por día")
+                return
+            for nombre in ("tickets.jsonl", "tickets.json"):
+                ruta = os.path.join(self.directorio, nombre)
+                if os.path.exists(ruta):
+                    print(f"Importados {self.importar_json(ruta)} tickets de {nombre}")
+                    break
+
+    def contar(self):
+        with self.lock:
+            return self.conexion.execute("SELECT COUNT(*) FROM tickets").fetchone()[0]
+
+    def cargar_historial(self):
+        return iter(())
+
+    def fusionar(self, lote):
+        return 0
+
+    def terminar_carga(self):
+        pass
+
+    def importar_json(self, ruta):
+        """Importa un archivo de tickets (arreglo JSON o JSON Lines)"""
+        return self.importar_tickets(Ticket.from_dict(r) for r in leer_registros(ruta)
+                                     if r is not None)
+
+    def importar_tickets(self, tickets):
+        importados = 0
+        with self.lock, self.conexion:
+            for ticket in tickets:
+                self._insertar(ticket)
+                importados += 1
+        return importados
+
+    def _insertar(self, ticket):
+        perfil = ticket.perfil
+        if perfil.perfil_id not in self.perfiles_guardados:
+            self.conexion.execute(
+                "INSERT OR REPLACE INTO perfiles (perfil_id, datos) VALUES (?, ?)",
+                (perfil.perfil_id, json.dumps(perfil.to_dict())))
+            self.perfiles_guardados.add(perfil.perfil_id)
+        cursor = self.conexion.execute(
+            "INSERT OR IGNORE INTO tickets (ticket_id, orden_id, total, timestamp, "
+            "perfil_id) VALUES (?,?,?,?,?)",
+            (ticket.ticket_id, ticket.orden_id, ticket.total,
+             ticket.timestamp.isoformat(), ticket.perfil.perfil_id))
+        if cursor.rowcount == 0:
+            return
+        self.conexion.executemany(
+            "INSERT INTO bebidas (ticket_id, posicion, tipo, cantidad, extras, texto) "
+            "VALUES (?,?,?,?,?,?)",
+            [(ticket.ticket_id, i, b.tipo, b.cantidad, json.dumps(b.extras),
+              str(b).lower()) for i, b in enumerate(ticket.bebidas)])
+
+    def _insertar_lote(self, tickets):
+        """Como _insertar, con una sola sentencia por tabla para todo el lote"""
+        for ticket in tickets:
+            perfil = ticket.perfil
+            if perfil.perfil_id not in self.perfiles_guardados:
+                self.conexion.execute(
+                    "INSERT OR REPLACE INTO perfiles (perfil_id, datos) VALUES (?, ?)",
+                    (perfil.perfil_id, json.dumps(perfil.to_dict())))
+                self.perfiles_guardados.add(perfil.perfil_id)
+        self.conexion.executemany(
+            "INSERT OR IGNORE INTO tickets (ticket_id, orden_id, total, timestamp, "
+            "perfil_id) VALUES (?,?,?,?,?)",
+            [(t.ticket_id, t.orden_id, t.total, t.timestamp.isoformat(), t.perfil.perfil_id)
+             for t in tickets])
+        # Las combinaciones de bebida se repiten: se serializan una vez
+        columnas = {}
+        filas = []
+        for ticket in tickets:
+            for i, bebida in enumerate(ticket.bebidas):
+                clave = (bebida.tipo, bebida.cantidad, tuple(bebida.extras))
+                valores = columnas.get(clave)
+                if valores is None:
+                    valores = columnas[clave] = (bebida.tipo, bebida.cantidad,
+                                                 json.dumps(bebida.extras), str(bebida).lower())
+                filas.append((ticket.ticket_id, i) + valores)
+        self.conexion.executemany(
+            "INSERT OR IGNORE INTO bebidas (ticket_id, posicion, tipo, cantidad, extras, texto) "
+            "VALUES (?,?,?,?,?,?)", filas)
+
+    def agregar(self, ticket):
+        with self.lock, self.conexion:
+            self._insertar(ticket)
+
+    def preparar_combinar(self, tickets):
+        # La búsqueda de texto es de la base: no hay nada que preparar
+        return None
+
+    def combinar(self, tickets, preparado=None):
+        """Agrega un lote importado; devuelve (insertados, omitidos, conflictos).
+
+        Los IDs repetidos se buscan con el índice único de ticket_id, solo
+        para los IDs del lote.
+        """
+        nuevos = {}
+        repetidos = []
+        for ticket in tickets:
+            if ticket.ticket_id in nuevos:
+                repetidos.append(ticket)
+            else:
+                nuevos[ticket.ticket_id] = ticket
+        presentes = []
+        ids = list(nuevos)
+        with self.lock:
+            for i in range(0, len(ids), 500):
+                lote = ids[i:i + 500]
+                marcas = ",".join("?" * len(lote))
+                presentes += [fila[0] for fila in self.conexion.execute(
+                    f"SELECT ticket_id FROM tickets WHERE ticket_id IN ({marcas})", lote)]
+        # Solo los repetidos se leen completos para compararlos
+        existentes = {}
+        for i in range(0, len(presentes), 500):
+            lote = presentes[i:i + 500]
+            marcas = ",".join("?" * len(lote))
+            for ticket in self._consultar(f"WHERE ticket_id IN ({marcas})", lote):
+                existentes[ticket.ticket_id] = ticket
+        omitidos, conflictos = 0, []
+        for ticket in repetidos:
+            anterior = existentes.get(ticket.ticket_id) or nuevos[ticket.ticket_id]
+            if mismo_ticket(anterior, ticket):
+                omitidos += 1
+            else:
+                conflictos.append(ticket.ticket_id)
+        insertados = []
+        for ticket_id, ticket in nuevos.items():
+            existente = existentes.get(ticket_id)
+            if existente is None:
+                insertados.append(ticket)
+            elif mismo_ticket(existente, ticket):
+                omitidos += 1
+            else:
+                conflictos.append(ticket_id)
+        with self.lock, self.conexion:
+            self._insertar_lote(insertados)
+        return insertados, omitidos, conflictos
+
+    def contar_dia(self, fecha):
+        inicio = datetime.combine(fecha, datetime.min.time())
+        with self.lock:
+            return self.conexion.execute(
+                "SELECT COUNT(*) FROM tickets WHERE timestamp >= ? AND timestamp < ?",
+                (inicio.isoformat(), (inicio + timedelta(days=1)).isoformat())).fetchone()[0]
+
+    def cargar_acumulados(self):
+        with self.lock:
+            fila = self.conexion.execute(
+                "SELECT datos FROM acumulados WHERE clave = 'ventas'").fetchone()
+        return json.loads(fila[0]) if fila else None
+
+    def guardar_acumulados(self, datos):
+        with self.lock, self.conexion:
+            self.conexion.execute(
+                "INSERT OR REPLACE INTO acumulados (clave, datos) VALUES ('ventas', ?)",
+                (json.dumps(datos),))
+
+    def _consultar(self, condicion="", parametros=(), orden="ORDER BY timestamp"):
+        with self.lock:
+            filas = self.conexion.execute(
+                f"SELECT {self.COLUMNAS} FROM tickets {condicion} {orden}",
+                parametros).fetchall()
+            bebidas = {}
+            ids = [fila[0] for fila in filas]
+            for i in range(0, len(ids), 500):
+                lote = ids[i:i + 500]
+                marcas = ",".join("?" * len(lote))
+                for ticket_id, tipo, cantidad, extras in self.conexion.execute(
+                        "SELECT ticket_id, tipo, cantidad, extras FROM bebidas "
+                        f"WHERE ticket_id IN ({marcas}) ORDER BY ticket_id, posicion",
+                        lote):
+                    bebidas.setdefault(ticket_id, []).append(
+                        BebidaPersonalizada(tipo, cantidad, json.loads(extras)))
+        tickets = []
+        for (ticket_id, orden_id, total, timestamp, perfil_id, establecimiento,
+             direccion, ciudad, telefono, redes) in filas:
+            if perfil_id is not None:
+                perfil = PERFILES.obtener(perfil_id)
+            else:
+                perfil = PERFILES.registrar(establecimiento, direccion, ciudad,
+                                            telefono, json.loads(redes))
+            tickets.append(Ticket(orden_id, bebidas.get(ticket_id, []), total,
+                                  datetime.fromisoformat(timestamp),
+                                  ticket_id=ticket_id, perfil=perfil))
+        return tickets
+
+    def obtener(self, ticket_id):
+        tickets = self._consultar("WHERE ticket_id = ?", (ticket_id,))
+        return tickets[0] if tickets else None
+
+    def rango(self, desde, hasta):
+        return self._consultar("WHERE timestamp >= ? AND timestamp < ?",
+                               (desde.isoformat(), hasta.isoformat()))
+
+    def filtrar(self, fecha, busqueda=""):
+        inicio = datetime.combine(fecha, datetime.min.time())
+        condicion = "WHERE timestamp >= :inicio AND timestamp < :fin"
+        parametros = {"inicio": inicio.isoformat(),
+                      "fin": (inicio + timedelta(days=1)).isoformat()}
+        if busqueda:
+            escapado = (busqueda.replace("\\", "\\\\")
+                        .replace("%", "\\%").replace("_", "\\_"))
+            parametros["patron"] = f"%{escapado}%"
+            condicion += (
+                " AND (lower(ticket_id) LIKE :patron ESCAPE '\\'"
+                " OR CAST(total AS TEXT) LIKE :patron ESCAPE '\\'"
+                " OR EXISTS (SELECT 1 FROM bebidas b"
+                " WHERE b.ticket_id = tickets.ticket_id"
+                " AND b.texto LIKE :patron ESCAPE '\\'))")
+        return self._consultar(condicion, parametros)
+
+    def recientes(self, desplazamiento, limite):
+        return self._consultar(orden="ORDER BY timestamp DESC LIMIT ? OFFSET ?",
+                               parametros=(limite, desplazamiento))
+
+    def todos(self):
+        return self._consultar()
+
+    def iterar(self, desde=None, hasta=None, lote=1000):
+        """Recorre los tickets en lotes ordenados por (timestamp, ticket_id),
+        sin traer la tabla completa a memoria.
+
+        Lo recorrido se fija al llamar: solo entran las filas ya insertadas
+        (rowid hasta el mayor actual), aunque el generador se consuma en un
+        hilo de fondo mientras la interfaz sigue agregando tickets.
+        """
+        with self.lock:
+            ultima_fila = self.conexion.execute(
+                "SELECT COALESCE(MAX(rowid), 0) FROM tickets").fetchone()[0]
+        return self._recorrer(desde, hasta, lote, ultima_fila)
+
+    def _recorrer(self, desde, hasta, lote, ultima_fila):
+        condiciones = ["rowid <= ?"]
+        parametros = [ultima_fila]
+        if desde:
+            condiciones.append("timestamp >= ?")
+            parametros.append(desde.isoformat())
+        if hasta:
+            condiciones.append("timestamp < ?")
+            parametros.append(hasta.isoformat())
+        ultimo = None
+        while True:
+            actuales = list(condiciones)
+            valores = list(parametros)
+            if ultimo:
+                actuales.append("(timestamp, ticket_id) > (?, ?)")
+                valores.extend(ultimo)
+            tickets = self._consultar("WHERE " + " AND ".join(actuales), valores + [lote],
+                                      orden="ORDER BY timestamp, ticket_id LIMIT ?")
+            yield from tickets
+            if len(tickets) < lote:
+                return
+            ultimo = (tickets[-1].timestamp.isoformat(), tickets[-1].ticket_id)
+
+    def contar_rango(self, desde, hasta):
+        with self.lock:
+            return self.conexion.execute(
+                "SELECT COUNT(*) FROM tickets WHERE timestamp >= ? AND timestamp < ?",
+                (desde.isoformat(), hasta.isoformat())).fetchone()[0]
+
+    def compactar(self):
+        with self.lock:
+            self.conexion.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def cerrar(self):
+        if self.conexion:
+            self.compactar()
+            self.conexion.close()
+            self.conexion = None
+
+ALMACENES_TICKETS = {
+    "json": AlmacenTicketsJSON,
+    "sqlite": AlmacenTicketsSQLite,
+}
+
+FORMATOS_EXPORTACION = {
+    "jsonl": "JSON Lines",
+    "csv": "CSV",
+    "json": "JSON",
+}
+COLUMNAS_CSV = ("ticket_id", "orden_id", "timestamp", "total", "bebidas",
+                "establecimiento", "ciudad")
+
+def formato_exportacion(ruta):
+    """Formato según la extensión (sin contar .gz); JSON Lines por defecto"""
+    base = ruta[:-3] if ruta.lower().endswith(".gz") else ruta
+    extension = os.path.splitext(base)[1].lstrip(".").lower()
+    return extension if extension in FORMATOS_EXPORTACION else "jsonl"
+
+def exportar_flujo(tickets, ruta, formato=None, cancelar=None, progreso=None, lote=500):
+    """Escribe los tickets de un iterable en lotes; devuelve cuántos escribió.
+
+    La memoria no depende del tamaño de la exportación: cada lote se
+    serializa, se escribe y se descarta. Se escribe a un temporal que
+    reemplaza a ruta al terminar; si cancelar (threading.Event) se activa,
+    el temporal se borra y se devuelve None. Con ruta .gz se comprime.
+    """
+    formato = formato or formato_exportacion(ruta)
+    temporal = ruta + ".parcial"
+    if ruta.lower().endswith(".gz"):
+        archivo = gzip.open(temporal, 'wt', compresslevel=6, encoding='utf-8', newline='')
+    else:
+        archivo = open(temporal, 'w', encoding='utf-8', newline='')
+    escritos = 0
+    try:
+        with archivo as f:
+            escritor_csv = csv.writer(f) if formato == "csv" else None
+            if escritor_csv:
+                escritor_csv.writerow(COLUMNAS_CSV)
+            elif formato == "json":
+                f.write("[")
+            pendientes = []
+            
+            def vaciar():
+                if escritor_csv:
+                    escritor_csv.writerows(pendientes)
+                elif formato == "json":
+                    f.write(("\n" if escritos == len(pendientes) else ",\n")
+                            + ",\n".join(pendientes))
+                else:
+                    f.write("\n".join(pendientes) + "\n")
+                pendientes.clear()
+            
+            for ticket in tickets:
+                if escritor_csv:
+                    pendientes.append((ticket.ticket_id, ticket.orden_id,
+                                       ticket.timestamp.isoformat(), f"{ticket.total:.2f}",
+                                       "; ".join(str(b) for b in ticket.bebidas),
+                                       ticket.establecimiento, ticket.ciudad))
+                else:
+                    pendientes.append(json.dumps(ticket.to_dict(completo=True),
+                                                 ensure_ascii=False))
+                escritos += 1
+                if len(pendientes) >= lote:
+                    vaciar()
+                    if cancelar is not None and cancelar.is_set():
+                        break
+                    if progreso:
+                        progreso(escritos)
+            if cancelar is not None and cancelar.is_set():
+                escritos = None
+            else:
+                if pendientes:
+                    vaciar()
+                if formato == "json":
+                    f.write("\n]\n")
+    except BaseException:
+        os.remove(temporal)
+        raise
+    if escritos is None:
+        os.remove(temporal)
+        return None
+    os.replace(temporal, ruta)
+    if progreso:
+        progreso(escritos)
+    return escritos
+
+def leer_registros(ruta, tam_bloque=1 << 16):
+    """Registros de un archivo exportado (arreglo JSON o JSON Lines, con o
+    sin gzip), leídos por bloques sin cargar el archivo completo.
+
+    Las líneas de JSON Lines que no se pueden decodificar dan None.
+    """
+    abrir = gzip.open if ruta.lower().endswith(".gz") else open
+    with abrir(ruta, 'rt', encoding='utf-8') as f:
+        inicio = f.read(1)
+        while inicio.isspace():
+            inicio = f.read(1)
+        if inicio != "[":
+            for linea in itertools.chain([inicio + f.readline()], f):
+                if linea.strip():
+                    try:
+                        yield json.loads(linea)
+                    except ValueError:
+                        yield None
+            return
+        decodificador = json.JSONDecoder()
+        buffer = ""
+        while True:
+            bloque = f.read(tam_bloque)
+            buffer += bloque
+            pos = 0
+            while True:
+                while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                    pos += 1
+                if buffer[pos:pos + 1] == "]":
+                    return
+                try:
+                    registro, pos_fin = decodificador.raw_decode(buffer, pos)
+                except ValueError:
+                    break  # Registro incompleto: falta leer el resto
+                yield registro
+                pos = pos_fin
+            buffer = buffer[pos:]
+            if not bloque:
+                raise ValueError(f"Arreglo JSON incompleto en {ruta}")
+
+def lotes_importacion(rutas, lote=5000):
+    """Generador para un hilo de fondo: lotes de (tickets válidos, inválidos).
+
+    Cada registro se valida con Ticket.from_dict; los que fallan solo se
+    cuentan. La memoria depende del tamaño del lote, no de los archivos.
+    """
+    tickets, invalidos = [], 0
+    for ruta in rutas:
+        for registro in leer_registros(ruta):
+            try:
+                tickets.append(Ticket.from_dict(registro))
+            except (KeyError, ValueError, TypeError):
+                invalidos += 1
+            if len(tickets) >= lote:
+                yield tickets, invalidos
+                tickets, invalidos = [], 0
+    if tickets or invalidos:
+        yield tickets, invalidos
+
+MAX_IDS_CONFLICTO = 50
+
+def sumar_informe(informe, insertados, omitidos, conflictos, invalidos):
+    """Acumula el resultado de un lote en el informe de importación"""
+    informe['insertados'] += len(insertados)
+    informe['omitidos'] += omitidos
+    informe['conflictos'] += len(conflictos)
+    informe['invalidos'] += invalidos
+    faltan = MAX_IDS_CONFLICTO - len(informe['ids_conflicto'])
+    informe['ids_conflicto'].extend(conflictos[:max(0, faltan)])
+
+def percentil(valores, p):
+    """Percentil p (0-100) por el método del rango más cercano"""
+    if not valores:
+        return 0
+    ordenados = sorted(valores)
+    k = max(0, min(len(ordenados) - 1, -(-len(ordenados) * p // 100) - 1))
+    return ordenados[int(k)]
+
+class PlanificadorCocina:
+    """Reparte las bebidas de las órdenes entre varias estaciones de preparación.
+
+    Cada unidad de bebida es un trabajo no interrumpible. Cuando una estación
+    se libera toma el siguiente trabajo de la cola según la política:
+    "fifo" (orden de llegada), "sjf" (la orden con menos trabajo total) o
+    "edf" (la orden con hora prometida más temprana). Los trabajos que ya
+    empezaron se respetan al replanificar.
+    """
+    POLITICAS = ("fifo", "sjf", "edf")
+
+    def __init__(self, estaciones=1, politica="fifo"):
+        if politica not in self.POLITICAS:
+            raise ValueError(f"Política desconocida: {politica}")
+        self.estaciones = max(1, int(estaciones))
+        self.politica = politica
+        self.ordenes = {}
+        self.asignaciones = {}  # (orden_id, indice) -> (inicio, fin, estación)
+        self._secuencia = 0
+        # Estado del último plan para planificar_orden: hasta cuándo está
+        # ocupada cada estación y las bebidas aún en cola, por clave
+        self.vigente = False
+        self.libres = []
+        self.en_cola = []  # (clave, indice, orden_id) ordenado
+        self.llegada_maxima = None
+
+    def agregar_orden(self, orden_id, duraciones, llegada, prometido=None):
+        self._secuencia += 1
+        if self.llegada_maxima is not None and llegada < self.llegada_maxima:
+            self.vigente = False  # Llega antes que otra ya planificada
+        self.llegada_maxima = max(llegada, self.llegada_maxima or llegada)
+        total = sum(duraciones)
+        self.ordenes[orden_id] = {
+            'duraciones': list(duraciones),
+            'llegada': llegada,
+            'prometido': prometido if prometido is not None else llegada + total,
+            'total': total,
+            'secuencia': self._secuencia,
+        }
+
+    def retirar_orden(self, orden_id, terminada=False):
+        """Quita una orden; si no estaba terminada, el plan debe rehacerse"""
+        orden = self.ordenes.pop(orden_id, None)
+        if orden:
+            for indice in range(len(orden['duraciones'])):
+                self.asignaciones.pop((orden_id, indice), None)
+            if not terminada:
+                self.vigente = False
+
+    def configurar(self, estaciones=None, politica=None):
+        if politica is not None:
+            if politica not in self.POLITICAS:
+                raise ValueError(f"Política desconocida: {politica}")
+            self.politica = politica
+        if estaciones is not None:
+            self.estaciones = max(1, int(estaciones))
+        self.vigente = False
+
+    def _clave(self, orden):
+        if self.politica == "sjf":
+            return (orden['total'], orden['llegada'], orden['secuencia'])
+        if self.politica == "edf":
+            return (orden['prometido'], orden['llegada'], orden['secuencia'])
+        return (orden['llegada'], orden['secuencia'])
+
+    def planificar(self, ahora):
+        """Recalcula el plan desde ahora y devuelve {orden_id: (inicio, fin)}"""
+        libre = [ahora] * self.estaciones
+        pendientes = []
+        for (orden_id, indice), (inicio, fin, estacion) in list(self.asignaciones.items()):
+            if inicio <= ahora and estacion < self.estaciones:
+                # Ya en preparación: ocupa su estación hasta terminar
+                libre[estacion] = max(libre[estacion], fin)
+            else:
+                del self.asignaciones[(orden_id, indice)]
+        for orden_id, orden in self.ordenes.items():
+            for indice, duracion in enumerate(orden['duraciones']):
+                if (orden_id, indice) not in self.asignaciones:
+                    pendientes.append((orden['llegada'], orden['secuencia'], indice,
+                                       orden_id, duracion))
+        pendientes.sort()
+        
+        estaciones = [(t, e) for e, t in enumerate(libre)]
+        heapq.heapify(estaciones)
+        disponibles = []
+        self.en_cola = []
+        i = 0
+        while i < len(pendientes) or disponibles:
+            t, estacion = heapq.heappop(estaciones)
+            if not disponibles and pendientes[i][0] > t:
+                t = pendientes[i][0]  # La estación espera la siguiente llegada
+            while i < len(pendientes) and pendientes[i][0] <= t:
+                llegada, secuencia, indice, orden_id, duracion = pendientes[i]
+                heapq.heappush(disponibles, (self._clave(self.ordenes[orden_id]),
+                                             indice, orden_id, duracion))
+                i += 1
+            clave, indice, orden_id, duracion = heapq.heappop(disponibles)
+            self.asignaciones[(orden_id, indice)] = (t, t + duracion, estacion)
+            heapq.heappush(estaciones, (t + duracion, estacion))
+            if t > ahora:
+                self.en_cola.append((clave, indice, orden_id))
+        self.en_cola.sort()
+        self.libres = libre
+        for t, estacion in estaciones:
+            self.libres[estacion] = t
+        self.vigente = True
+        return self.plan()
+
+    def planificar_orden(self, orden_id, ahora):
+        """Planifica una orden recién agregada tocando solo lo que ella cambia.
+
+        Con todo lo planificado ya llegado, el plan completo asigna las
+        bebidas en orden de clave, así que las de menor clave que la nueva no
+        se mueven. Solo se reasignan la orden y las bebidas en cola que ella
+        adelanta (ninguna en fifo). Devuelve {orden_id: (inicio, fin)} de las
+        órdenes replanificadas.
+        """
+        orden = self.ordenes[orden_id]
+        if not self.vigente or orden['llegada'] > ahora:
+            return self.planificar(ahora)
+        clave = self._clave(orden)
+        # Lo que ya empezó sale del frente: la cola empieza en orden de clave
+        empezadas = 0
+        for _, indice, otra in self.en_cola:
+            asignacion = self.asignaciones.get((otra, indice))
+            if asignacion is not None and asignacion[0] > ahora:
+                break
+            empezadas += 1
+        del self.en_cola[:empezadas]
+        
+        corte = bisect.bisect_left(self.en_cola, (clave,))
+        nuevas = [(clave, indice, orden_id) for indice in range(len(orden['duraciones']))]
+        adelantadas = []
+        for clave_otra, indice, otra in self.en_cola[corte:]:
+            asignacion = self.asignaciones.pop((otra, indice), None)
+            if asignacion is None:
+                continue  # De una orden ya retirada
+            inicio, _, estacion = asignacion
+            # La cola no deja huecos: la estación queda libre donde empezaba
+            self.libres[estacion] = min(self.libres[estacion], inicio)
+            adelantadas.append((clave_otra, indice, otra))
+        self.en_cola[corte:] = nuevas + adelantadas
+        
+        estaciones = [(max(t, ahora), e) for e, t in enumerate(self.libres)]
+        heapq.heapify(estaciones)
+        for _, indice, otra in nuevas + adelantadas:
+            duracion = self.ordenes[otra]['duraciones'][indice]
+            t, estacion = heapq.heappop(estaciones)
+            self.asignaciones[(otra, indice)] = (t, t + duracion, estacion)
+            self.libres[estacion] = t + duracion
+            heapq.heappush(estaciones, (t + duracion, estacion))
+        return {otra: self.rango_de(otra) for otra in {orden_id} | {o for _, _, o in adelantadas}}
+
+    def rango_de(self, orden_id):
+        """(inicio, fin) de una orden según sus bebidas asignadas"""
+        orden = self.ordenes[orden_id]
+        asignadas = [self.asignaciones[(orden_id, i)]
+                     for i in range(len(orden['duraciones']))]
+        if not asignadas:
+            return (orden['llegada'], orden['llegada'])
+        return (min(a[0] for a in asignadas), max(a[1] for a in asignadas))
+
+    def plan(self):
+        resultado = {}
+        for (orden_id, _), (inicio, fin, _) in self.asignaciones.items():
+            if orden_id in resultado:
+                anterior = resultado[orden_id]
+                resultado[orden_id] = (min(anterior[0], inicio), max(anterior[1], fin))
+            else:
+                resultado[orden_id] = (inicio, fin)
+        for orden_id, orden in self.ordenes.items():
+            if orden_id not in resultado:
+                # Orden sin bebidas: lista al llegar
+                resultado[orden_id] = (orden['llegada'], orden['llegada'])
+        return resultado
+
+    @classmethod
+    def simular(cls, pedidos, estaciones=1, politica="fifo"):
+        """Simulación sin interfaz de un flujo de pedidos.
+
+        pedidos es una secuencia de (llegada, duraciones) o
+        (llegada, duraciones, prometido), con tiempos en segundos. Devuelve
+        el rendimiento en pedidos por hora y la espera en cola y el tiempo
+        total (llegada a entrega) promedio y p95.
+        """
+        planificador = cls(estaciones, politica)
+        for orden_id, pedido in enumerate(pedidos):
+            llegada, duraciones = pedido[0], pedido[1]
+            prometido = pedido[2] if len(pedido) > 2 else None
+            planificador.agregar_orden(orden_id, duraciones, llegada, prometido)
+        if not planificador.ordenes:
+            return {'pedidos': 0}
+        inicio_sim = min(o['llegada'] for o in planificador.ordenes.values())
+        plan = planificador.planificar(inicio_sim)
+        esperas = [plan[o][0] - orden['llegada'] for o, orden in planificador.ordenes.items()]
+        totales = [plan[o][1] - orden['llegada'] for o, orden in planificador.ordenes.items()]
+        atrasados = sum(1 for o, orden in planificador.ordenes.items()
+                        if plan[o][1] > orden['prometido'])
+        duracion = max(fin for _, fin in plan.values()) - inicio_sim
+        return {
+            'pedidos': len(plan),
+            'estaciones': planificador.estaciones,
+            'politica': politica,
+            'duracion': duracion,
+            'rendimiento_por_hora': len(plan) * 3600 / duracion if duracion else 0,
+            'espera_promedio': sum(esperas) / len(esperas),
+            'espera_p95': percentil(esperas, 95),
+            'tiempo_total_promedio': sum(totales) / len(totales),
+            'tiempo_total_p95': percentil(totales, 95),
+            'atrasados': atrasados,
+        }
+
+def simular_archivo(ruta, estaciones, politicas, catalogo=None):
+    """Simula un flujo de pedidos guardado en JSON con los tiempos del menú.
+
+    Cada pedido es {"llegada": segundos, "bebidas": [[tipo, cantidad, extras]],
+    "prometido": segundos (opcional)}. Sin catalogo se usa el mismo menú que
+    la aplicación (CAFETERIA_MENU o menu.json).
+    """
+    if catalogo is None:
+        catalogo = CatalogoMenu(os.environ.get("CAFETERIA_MENU", "menu.json"))
+        catalogo.recargar()
+    with open(ruta, 'r') as f:
+        pedidos = json.load(f)
+    flujo = []
+    for pedido in pedidos:
+        bebidas = [BebidaPersonalizada(tipo, cantidad, extras)
+                   for tipo, cantidad, extras in pedido['bebidas']]
+        flujo.append((pedido['llegada'], catalogo.duraciones(bebidas),
+                      pedido.get('prometido')))
+    return [PlanificadorCocina.simular(flujo, estaciones, politica)
+            for politica in politicas]
+
+class InstantaneaVentas:
+    """Columnas de ventas para los reportes: una fila por ticket y una por bebida.
+
+    Las columnas son array.array (se agregan filas sin copiar todo). Con NumPy
+    los reportes son operaciones vectorizadas sobre vistas de esas columnas;
+    sin NumPy se recorren en Python.
+    """
+    MAX_EXTRAS = 62  # bits de la máscara de extras
+
+    def __init__(self):
+        # Por ticket
+        self.dia = array('i')      # ordinal de la fecha
+        self.hora = array('b')
+        self.total = array('d')
+        # Por bebida
+        self.linea_ticket = array('i')
+        self.linea_bebida = array('h')
+        self.linea_cantidad = array('h')
+        self.linea_extras = array('q')
+        self.bebidas = {}  # nombre -> código
+        self.extras = {}   # nombre -> bit
+
+    def __len__(self):
+        return len(self.total)
+
+    def agregar(self, ticket):
+        fila = len(self.total)
+        self.dia.append(ticket.timestamp.toordinal())
+        self.hora.append(ticket.timestamp.hour)
+        self.total.append(ticket.total)
+        for bebida in ticket.bebidas:
+            codigo = self.bebidas.setdefault(bebida.tipo, len(self.bebidas))
+            mascara = 0
+            for extra in bebida.extras:
+                bit = self.extras.setdefault(extra, len(self.extras))
+                if bit < self.MAX_EXTRAS:
+                    mascara |= 1 << bit
+            self.linea_ticket.append(fila)
+            self.linea_bebida.append(codigo)
+            self.linea_cantidad.append(bebida.cantidad)
+            self.linea_extras.append(mascara)
+
+    def extender(self, tickets):
+        for ticket in tickets:
+            self.agregar(ticket)
+
+    def reporte(self, desde=None, hasta=None):
+        """Ingresos por hora, unidades por bebida, tasa de cada extra y ticket promedio.
+
+        desde y hasta son fechas (date) inclusivas; None no limita.
+        """
+        d0 = desde.toordinal() if desde else None
+        d1 = hasta.toordinal() if hasta else None
+        if np is not None:
+            resultado = self._reporte_numpy(d0, d1)
+        else:
+            resultado = self._reporte_python(d0, d1)
+        cantidad = resultado['tickets']
+        resultado['promedio'] = resultado['ingresos'] / cantidad if cantidad else 0
+        nombres_bebidas = sorted(self.bebidas, key=self.bebidas.get)
+        resultado['por_bebida'] = {nombre: unidades for nombre, unidades
+                                   in zip(nombres_bebidas, resultado['por_bebida']) if unidades}
+        unidades = sum(resultado['por_bebida'].values())
+        resultado['extras'] = {nombre: (resultado['extras'][bit] / unidades if unidades else 0)
+                               for nombre, bit in self.extras.items() if bit < self.MAX_EXTRAS}
+        return resultado
+
+    def _reporte_numpy(self, d0, d1):
+        dia = np.frombuffer(self.dia, dtype=np.int32) if self.dia else np.zeros(0, np.int32)
+        seleccion = np.ones(dia.size, dtype=bool)
+        if d0 is not None:
+            seleccion &= dia >= d0
+        if d1 is not None:
+            seleccion &= dia <= d1
+        total = (np.frombuffer(self.total, dtype=np.float64) if self.total
+                 else np.zeros(0))[seleccion]
+        hora = (np.frombuffer(self.hora, dtype=np.int8) if self.hora
+                else np.zeros(0, np.int8))[seleccion]
+        
+        if self.linea_ticket:
+            lineas = seleccion[np.frombuffer(self.linea_ticket, dtype=np.int32)]
+            bebida = np.frombuffer(self.linea_bebida, dtype=np.int16)[lineas]
+            cantidad = np.frombuffer(self.linea_cantidad, dtype=np.int16)[lineas].astype(np.int64)
+            extras = np.frombuffer(self.linea_extras, dtype=np.int64)[lineas]
+        else:
+            bebida = cantidad = extras = np.zeros(0, np.int64)
+        tasas = [int(cantidad[(extras >> bit) & 1 == 1].sum())
+                 for bit in range(min(len(self.extras), self.MAX_EXTRAS))]
+        return {
+            'tickets': int(total.size),
+            'ingresos': float(total.sum()),
+            'minimo': float(total.min()) if total.size else 0,
+            'maximo': float(total.max()) if total.size else 0,
+            'por_hora': np.bincount(hora, weights=total, minlength=24).tolist(),
+            'por_bebida': np.bincount(bebida, weights=cantidad,
+                                      minlength=len(self.bebidas)).astype(np.int64).tolist(),
+            'extras': tasas
+        }
+
+    def _reporte_python(self, d0, d1):
+        d0 = d0 if d0 is not None else -1
+        d1 = d1 if d1 is not None else float('inf')
+        seleccion = [d0 <= dia <= d1 for dia in self.dia]
+        por_hora = [0.0] * 24
+        ingresos, cantidad = 0.0, 0
+        minimo, maximo = None, None
+        for elegido, hora, total in zip(seleccion, self.hora, self.total):
+            if elegido:
+                por_hora[hora] += total
+                ingresos += total
+                cantidad += 1
+                minimo = total if minimo is None else min(minimo, total)
+                maximo = total if maximo is None else max(maximo, total)
+        por_bebida = [0] * len(self.bebidas)
+        tasas = [0] * min(len(self.extras), self.MAX_EXTRAS)
+        for fila, bebida, unidades, mascara in zip(self.linea_ticket, self.linea_bebida,
+                                                   self.linea_cantidad, self.linea_extras):
+            if seleccion[fila]:
+                por_bebida[bebida] += unidades
+                for bit in range(len(tasas)):
+                    if mascara >> bit & 1:
+                        tasas[bit] += unidades
+        return {'tickets': cantidad, 'ingresos': ingresos, 'minimo': minimo or 0,
+                'maximo': maximo or 0, 'por_hora': por_hora, 'por_bebida': por_bebida,
+                'extras': tasas}
+
+class AcumuladoVentas:
+    """Totales corrientes de un periodo (día o turno).
+
+    Agregar un ticket cuesta O(bebidas del ticket), sin recorrer el
+    historial. Un periodo con cierre queda congelado.
+    """
+    __slots__ = ('inicio', 'cierre', 'ordenes', 'ingresos', 'minimo', 'maximo',
+                 'por_bebida', 'por_extra')
+
+    def __init__(self, inicio):
+        self.inicio = inicio
+        self.cierre = None
+        self.ordenes = 0
+        self.ingresos = 0
+        self.minimo = None
+        self.maximo = None
+        self.por_bebida = {}  # tipo -> unidades
+        self.por_extra = {}   # extra -> unidades
+
+    @property
+    def promedio(self):
+        return self.ingresos / self.ordenes if self.ordenes else 0
+
+    def agregar(self, ticket):
+        if self.cierre is not None:
+            return
+        self.ordenes += 1
+        self.ingresos += ticket.total
+        self.minimo = ticket.total if self.minimo is None else min(self.minimo, ticket.total)
+        self.maximo = ticket.total if self.maximo is None else max(self.maximo, ticket.total)
+        for bebida in ticket.bebidas:
+            self.por_bebida[bebida.tipo] = self.por_bebida.get(bebida.tipo, 0) + bebida.cantidad
+            for extra in bebida.extras:
+                self.por_extra[extra] = self.por_extra.get(extra, 0) + bebida.cantidad
+
+    def to_dict(self):
+        return {
+            'inicio': self.inicio.isoformat(),
+            'cierre': self.cierre.isoformat() if self.cierre else None,
+            'ordenes': self.ordenes,
+            'ingresos': self.ingresos,
+            'minimo': self.minimo,
+            'maximo': self.maximo,
+            'por_bebida': dict(self.por_bebida),
+            'por_extra': dict(self.por_extra)
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        acumulado = cls(datetime.fromisoformat(data['inicio']))
+        if data.get('cierre'):
+            acumulado.cierre = datetime.fromisoformat(data['cierre'])
+        acumulado.ordenes = data['ordenes']
+        acumulado.ingresos = data['ingresos']
+        acumulado.minimo = data['minimo']
+        acumulado.maximo = data['maximo']
+        acumulado.por_bebida = data['por_bebida']
+        acumulado.por_extra = data['por_extra']
+        return acumulado
+
+class ResumenVentas:
+    """Acumulados del día y del turno en curso, más los últimos turnos cerrados"""
+    MAX_TURNOS_CERRADOS = 30
+
+    def __init__(self, ahora=None):
+        ahora = ahora or datetime.now()
+        self.dia = AcumuladoVentas(datetime.combine(ahora.date(), datetime.min.time()))
+        self.turno = AcumuladoVentas(ahora)
+        self.cerrados = []
+
+    def al_dia(self, ahora):
+        """Empieza un día nuevo si cambió la fecha; el turno sigue abierto"""
+        if ahora.date() > self.dia.inicio.date():
+            self.dia = AcumuladoVentas(datetime.combine(ahora.date(), datetime.min.time()))
+
+    def registrar(self, ticket):
+        self.al_dia(ticket.timestamp)
+        if ticket.timestamp.date() == self.dia.inicio.date():
+            self.dia.agregar(ticket)
+        if ticket.timestamp >= self.turno.inicio:
+            self.turno.agregar(ticket)
+
+    def cerrar_turno(self, ahora=None):
+        """Congela el turno actual y abre otro; devuelve el turno cerrado"""
+        ahora = ahora or datetime.now()
+        cerrado = self.turno
+        cerrado.cierre = ahora
+        self.cerrados = (self.cerrados + [cerrado])[-self.MAX_TURNOS_CERRADOS:]
+        self.turno = AcumuladoVentas(ahora)
+        return cerrado
+
+    def reconstruir(self, tickets):
+        """Vuelve a sumar día y turno desde los tickets (tras un cierre inesperado)"""
+        self.dia = AcumuladoVentas(self.dia.inicio)
+        self.turno = AcumuladoVentas(self.turno.inicio)
+        for ticket in tickets:
+            self.registrar(ticket)
+
+    def to_dict(self):
+        return {
+            'version': 1,
+            'dia': self.dia.to_dict(),
+            'turno': self.turno.to_dict(),
+            'cerrados': [turno.to_dict() for turno in self.cerrados]
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        resumen = cls()
+        resumen.dia = AcumuladoVentas.from_dict(data['dia'])
+        resumen.turno = AcumuladoVentas.from_dict(data['turno'])
+        resumen.cerrados = [AcumuladoVentas.from_dict(t) for t in data.get('cerrados', [])]
+        return resumen
+
+class MotorPedidos:
+    """Núcleo sin interfaz: carrito, precios, tiempos, tickets y órdenes activas.
+
+    SistemaPedidosCafeteria es una vista sobre este motor; también se puede
+    usar directamente (pruebas de carga, herramientas) sin abrir ventanas.
+    Con almacen=None los tickets no se guardan.
+    """
+    def __init__(self, almacen=None, estaciones=1, politica="fifo", catalogo=None):
+        self.almacen = almacen
+        self.catalogo = catalogo or CatalogoMenu()
+        
+        self.contador_orden = 1
+        self.carrito = []
+        # número de orden -> {'inicio', 'fin', 'bebidas', 'estado', 'ticket_id'}
+        self.ordenes_activas = {}
+        self.plazos_ordenes = []  # montículo de (fin, número de orden)
+        self.cocina = PlanificadorCocina(estaciones=estaciones, politica=politica)
+        self.acumulados = self.restaurar_acumulados()
+
+    # Acumulados de venta
+    def restaurar_acumulados(self, ahora=None):
+        """Acumulados guardados con el almacén; se recalculan solo si no cuadran"""
+        ahora = ahora or datetime.now()
+        if self.almacen is None:
+            return ResumenVentas(ahora)
+        try:
+            datos = self.almacen.cargar_acumulados()
+            resumen = ResumenVentas.from_dict(datos) if datos else ResumenVentas(ahora)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Error al cargar acumulados: {e}")
+            resumen = ResumenVentas(ahora)
+        resumen.al_dia(ahora)
+        if resumen.dia.ordenes != self.almacen.contar_dia(ahora.date()):
+            # Tickets guardados después del último resumen: sumar de nuevo
+            desde = min(resumen.dia.inicio, resumen.turno.inicio)
+            resumen.reconstruir(self.almacen.rango(desde, datetime.max))
+            self.almacen.guardar_acumulados(resumen.to_dict())
+        return resumen
+
+    def cerrar_turno(self, ahora=None):
+        cerrado = self.acumulados.cerrar_turno(ahora)
+        if self.almacen is not None:
+            self.almacen.guardar_acumulados(self.acumulados.to_dict())
+        return cerrado
+
+    # Menú
+    @property
+    def precio_bebidas(self):
+        return self.catalogo.precio_bebidas
+
+    @property
+    def tiempo_bebidas(self):
+        return self.catalogo.tiempo_bebidas
+
+    @property
+    def precio_extra(self):
+        return self.catalogo.precio_extra
+
+    @property
+    def tiempo_extra(self):
+        return self.catalogo.tiempo_extra
+
+    def recargar_catalogo(self):
+        """Recarga el menú si cambió; quita del carrito lo que ya no está.
+
+        Devuelve (recargado, bebidas quitadas del carrito).
+        """
+        if not self.catalogo.recargar():
+            return False, []
+        quitadas = [b for b in self.carrito if not self.catalogo.disponible(b)]
+        if quitadas:
+            self.carrito = [b for b in self.carrito if self.catalogo.disponible(b)]
+        return True, quitadas
+
+    # Carrito
+    def crear_bebida(self, tipo, cantidad=1, extras=()):
+        if tipo not in self.precio_bebidas:
+            raise ValueError(f"Bebida desconocida: {tipo}")
+        desconocidos = [e for e in extras if e not in self.precio_extra]
+        if desconocidos:
+            raise ValueError(f"Extras desconocidos: {', '.join(desconocidos)}")
+        if cantidad < 1:
+            raise ValueError("La cantidad debe ser al menos 1")
+        return BebidaPersonalizada(tipo, cantidad, extras)
+
+    def agregar_al_carrito(self, tipo, cantidad=1, extras=()):
+        bebida = self.crear_bebida(tipo, cantidad, extras)
+        self.carrito.append(bebida)
+        return bebida
+
+    def vaciar_carrito(self):
+        self.carrito = []
+
+    def subtotal(self, bebida):
+        return self.catalogo.subtotal(bebida)
+
+    def total_de(self, bebidas):
+        return sum(self.subtotal(bebida) for bebida in bebidas)
+
+    def total_carrito(self):
+        return self.total_de(self.carrito)
+
+    # Órdenes
+    def confirmar(self, ahora=None):
+        """Convierte el carrito en una orden; devuelve su ticket"""
+        if not self.carrito:
+            raise ValueError("El carrito está vacío")
+        ticket = self.crear_orden(self.carrito, ahora)
+        self.carrito = []
+        return ticket
+
+    @medido("motor.crear_orden")
+    def crear_orden(self, bebidas, ahora=None, planificar=True):
+        """Genera el ticket, lo guarda y manda la orden a la cocina"""
+        ahora = time.time() if ahora is None else ahora
+        bebidas = list(bebidas)
+        order_number = self.contador_orden
+        self.contador_orden += 1
+        
+        ticket = Ticket(order_number, bebidas, self.total_de(bebidas),
+                        timestamp=datetime.fromtimestamp(ahora))
+        self.acumulados.registrar(ticket)
+        if self.almacen is not None:
+            try:
+                with METRICAS.medir("almacen.agregar"):
+                    self.almacen.agregar(ticket)
+                    self.almacen.guardar_acumulados(self.acumulados.to_dict())
+            except Exception as e:
+                print(f"Error al guardar ticket: {e}")
+        METRICAS.contar("ordenes.creadas")
+        
+        self.cocina.agregar_orden(
+            order_number,
+            self.catalogo.duraciones(bebidas),
+            ahora)
+        # inicio y fin los fija el planificador
+        self.ordenes_activas[order_number] = {
+            'inicio': ahora,
+            'fin': None,
+            'bebidas': bebidas,
+            'estado': 'preparando',
+            'ticket_id': ticket.ticket_id
         }
+        if planificar:
+            self.replanificar(ahora, nueva=order_number)
+        return ticket
+
+    # Importación
+    @medido("motor.importar_lote")
+    def importar_lote(self, tickets, preparado=None):
+        """Combina un lote de tickets importados con el almacén.
+
+        preparado viene de almacen.preparar_combinar, que puede correr en el
+        hilo lector. Devuelve (insertados, omitidos, conflictos); los
+        insertados se suman a los acumulados del día y del turno que les
+        correspondan.
+        """
+        if self.almacen is None:
+            return list(tickets), 0, []
+        insertados, omitidos, conflictos = self.almacen.combinar(tickets, preparado)
+        if insertados:
+            for ticket in insertados:
+                self.acumulados.registrar(ticket)
+            self.almacen.guardar_acumulados(self.acumulados.to_dict())
+        METRICAS.contar("importacion.insertados", len(insertados))
+        return insertados, omitidos, conflictos
+
+    def importar_archivos(self, rutas, lote=5000):
+        """Importa archivos exportados (de esta u otras cajas) sin interfaz"""
+        informe = {'insertados': 0, 'omitidos': 0, 'conflictos': 0, 'invalidos': 0,
+                   'ids_conflicto': []}
+        for tickets, invalidos in lotes_importacion(rutas, lote):
+            insertados, omitidos, conflictos = self.importar_lote(tickets)
+            sumar_informe(informe, insertados, omitidos, conflictos, invalidos)
+        return informe
+
+    def enviar_pedidos(self, pedidos, ahora=None):
+        """Crea varias órdenes de una vez y replanifica la cocina una sola vez.
+
+        Cada pedido es una lista de BebidaPersonalizada o de tuplas
+        (tipo, cantidad, extras).
+        """
+        ahora = time.time() if ahora is None else ahora
+        tickets = []
+        for pedido in pedidos:
+            bebidas = [b if isinstance(b, BebidaPersonalizada) else self.crear_bebida(*b)
+                       for b in pedido]
+            tickets.append(self.crear_orden(bebidas, ahora, planificar=False))
+        self.replanificar(ahora)
+        return tickets
+
+    @medido("motor.replanificar")
+    def replanificar(self, ahora=None, nueva=None):
+        """Recalcula las ETAs de las órdenes en preparación.
+
+        Con nueva (el número de una orden recién creada) el planificador
+        puede asignar solo sus bebidas. Cada ETA que cambia se agrega al
+        montículo de plazos; las entradas viejas se descartan en vencidas.
+        Devuelve los números que cambiaron.
+        """
+        ahora = time.time() if ahora is None else ahora
+        plan = (self.cocina.planificar(ahora) if nueva is None
+                else self.cocina.planificar_orden(nueva, ahora))
+        cambiadas = []
+        for order_number, (inicio, fin) in plan.items():
+            orden = self.ordenes_activas.get(order_number)
+            if not orden or orden['estado'] != 'preparando':
+                continue
+            orden['inicio'] = inicio
+            if orden['fin'] != fin:
+                orden['fin'] = fin
+                heapq.heappush(self.plazos_ordenes, (fin, order_number))
+                cambiadas.append(order_number)
+        return cambiadas
+
+    def configurar_cocina(self, estaciones=None, politica=None):
+        self.cocina.configurar(estaciones=estaciones, politica=politica)
+        self.replanificar()
+
+    def proximo_plazo(self):
+        return self.plazos_ordenes[0][0] if self.plazos_ordenes else None
+
+    def vencidas(self, ahora=None):
+        """Saca del montículo las órdenes cuyo plazo ya venció"""
+        ahora = time.time() if ahora is None else ahora
+        resultado = []
+        while self.plazos_ordenes and self.plazos_ordenes[0][0] <= ahora:
+            _, order_number = heapq.heappop(self.plazos_ordenes)
+            orden = self.ordenes_activas.get(order_number)
+            # Se ignoran plazos viejos de órdenes que fueron replanificadas
+            if orden and orden['estado'] == 'preparando' and orden['fin'] <= ahora:
+                resultado.append(order_number)
+        return resultado
+
+    def avanzar(self, ahora=None):
+        """Completa las órdenes vencidas; devuelve sus números"""
+        completadas = self.vencidas(ahora)
+        for order_number in completadas:
+            self.completar(order_number)
+        return completadas
+
+    def progreso(self, order_number, ahora=None):
+        """(transcurrido, restante, duración, en_cola) de una orden en preparación"""
+        ahora = time.time() if ahora is None else ahora
+        orden = self.ordenes_activas[order_number]
+        return (max(0, ahora - orden['inicio']),
+                max(0, orden['fin'] - ahora),
+                orden['fin'] - orden['inicio'],
+                ahora < orden['inicio'])
+
+    def en_preparacion(self):
+        return [n for n, orden in self.ordenes_activas.items()
+                if orden['estado'] == 'preparando']
+
+    def completar(self, order_number):
+        self.cocina.retirar_orden(order_number, terminada=True)
+        orden = self.ordenes_activas.get(order_number)
+        if orden:
+            orden['estado'] = 'listo'
+            METRICAS.contar("ordenes.completadas")
+        return orden
+
+    def remover(self, order_number):
+        self.cocina.retirar_orden(order_number)
+        return self.ordenes_activas.pop(order_number, None)
+
+class TarjetaOrden:
+    """Tarjeta de una orden en el tablero de pedidos activos.
+
+    Se crea una vez y se reconfigura para cada orden que muestra: en
+    preparación lleva barra y tiempo restante; lista, el aviso y el botón
+    Eliminar. Las etiquetas de bebidas que sobran se ocultan, no se destruyen.
+    """
+    def __init__(self, pool):
+        self.pool = pool
+        self.frame = ttk.LabelFrame(pool.padre)
+        self.frame.grid_columnconfigure(0, weight=1)
+        self.contenido = ttk.Frame(self.frame)
+        self.contenido.grid(row=0, column=0, sticky="ew", padx=10, pady=5)
+        self.contenido.grid_columnconfigure(0, weight=1)
+        self.etiquetas_bebidas = []
+        self.progress = ttk.Progressbar(self.contenido, length=200, mode='determinate')
+        self.time_label = ttk.Label(self.contenido)
+        self.boton = ttk.Button(self.contenido, text="Eliminar")
+
+    def mostrar(self, order_number, bebidas, listo=False, al_eliminar=None):
+        self.frame.config(text=f"Pedido #{order_number}")
+        for i, bebida in enumerate(bebidas):
+            if i == len(self.etiquetas_bebidas):
+                self.etiquetas_bebidas.append(ttk.Label(self.contenido))
+            etiqueta = self.etiquetas_bebidas[i]
+            etiqueta.config(text=str(bebida))
+            etiqueta.grid(row=i, column=0, pady=2, sticky="w" if listo else "ew")
+        for etiqueta in self.etiquetas_bebidas[len(bebidas):]:
+            etiqueta.grid_remove()
+        
+        fila = len(bebidas)
+        if listo:
+            self.progress.grid_remove()
+            self.time_label.config(text="¡Pedido Completado!", style="Header.TLabel")
+            self.time_label.grid(row=fila, column=0, sticky="ew", pady=5)
+            self.boton.config(command=al_eliminar)
+            self.boton.grid(row=fila + 1, column=0, pady=5)
+        else:
+            self.progress['value'] = 0
+            self.progress.grid(row=fila, column=0, pady=5, sticky="ew")
+            self.time_label.config(text="Tiempo restante: --:--", style="TLabel")
+            self.time_label.grid(row=fila + 1, column=0, pady=2)
+            self.boton.grid_remove()
+        # Al final del panel, como una tarjeta nueva
+        self.frame.pack(fill="x", padx=5, pady=5)
+
+    def soltar(self):
+        self.pool.soltar(self)
+
+class PoolTarjetas:
+    """Tarjetas de un panel del tablero; las que se sueltan se reutilizan.
+
+    Un widget de Tk no puede cambiar de padre y cada panel recorta a sus
+    hijos dentro de su canvas, así que Preparación y Listos tienen un pool
+    cada uno: mover una orden suelta su tarjeta en un panel y toma una libre
+    en el otro.
+    """
+    MAX_LIBRES = 50
+
+    def __init__(self, padre):
+        self.padre = padre
+        self.libres = []
+
+    def tomar(self):
+        if self.libres:
+            METRICAS.contar("tarjetas.recicladas")
+            return self.libres.pop()
+        METRICAS.contar("tarjetas.creadas")
+        return TarjetaOrden(self)
+
+    def soltar(self, tarjeta):
+        if len(self.libres) >= self.MAX_LIBRES:
+            tarjeta.frame.destroy()
+            return
+        tarjeta.frame.pack_forget()
+        self.libres.append(tarjeta)
+
+class CoordinadorLayout:
+    """Agrupa las actualizaciones de scrollregion y ancho de los canvas.
 
-    def to_dict(self):
-        return {
-            'ticket_id': self.ticket_id,
-            'orden_id': self.orden_id,
-            'bebidas': [(b.tipo, b.cantidad, b.extras) for b in self.bebidas],
-            'total': self.total,
-            'timestamp': self.timestamp.isoformat(),
-            'establecimiento': self.establecimiento,
-            'direccion': self.direccion,
-            'ciudad': self.ciudad,
-            'telefono': self.telefono,
-            'redes_sociales': self.redes_sociales
-        }
+    Quien cambia el contenido de un canvas solo lo marca como pendiente; a lo
+    sumo una vez por cuadro se recalculan los pendientes que estén a la
+    vista. Los de una pestaña oculta esperan a que se muestre. En METRICAS,
+    layout.solicitudes.<origen> cuenta las marcas de cada evento y
+    layout.pasadas.<origen> las pasadas que realmente provocó; con
+    inmediato=True cada marca hace su pasada en el acto, como antes, para
+    comparar.
+    """
+    INTERVALO_MS = 16  # Un cuadro a ~60 Hz
 
-    @classmethod
-    def from_dict(cls, data):
-        ticket = cls(
-            data['orden_id'],
-            [BebidaPersonalizada(tipo, cantidad, extras) 
-             for tipo, cantidad, extras in data['bebidas']],
-            data['total'],
-            datetime.fromisoformat(data['timestamp'])
-        )
-        ticket.ticket_id = data['ticket_id']
-        ticket.establecimiento = data['establecimiento']
-        ticket.direccion = data.get('direccion', ticket.direccion)
-        ticket.ciudad = data.get('ciudad', ticket.ciudad)
-        ticket.telefono = data.get('telefono', ticket.telefono)
-        ticket.redes_sociales = data.get('redes_sociales', ticket.redes_sociales)
-        return ticket
+    def __init__(self, window, inmediato=False):
+        self.window = window
+        self.inmediato = inmediato
+        self.ventanas = {}    # canvas -> etiqueta de su ventana interior
+        self.pendientes = {}  # canvas -> orígenes que lo marcaron
+        self.programado = None
+
+    def registrar(self, canvas, etiqueta):
+        self.ventanas[canvas] = etiqueta
+        canvas.bind("<Configure>", lambda e: self.marcar(canvas, "configure"), add="+")
+
+    def marcar(self, canvas, origen):
+        METRICAS.contar(f"layout.solicitudes.{origen}")
+        self.pendientes.setdefault(canvas, set()).add(origen)
+        if self.inmediato:
+            self.aplicar(forzar=True)
+        elif self.programado is None:
+            self.programado = self.window.after(self.INTERVALO_MS, self.aplicar)
+
+    def marcar_todos(self, origen):
+        for canvas in self.ventanas:
+            self.marcar(canvas, origen)
+
+    @medido("layout.aplicar")
+    def aplicar(self, forzar=False):
+        self.programado = None
+        for canvas, origenes in list(self.pendientes.items()):
+            try:
+                if not forzar and not canvas.winfo_viewable():
+                    METRICAS.contar("layout.omitidas")
+                    continue  # Pestaña oculta: queda pendiente
+                canvas.configure(scrollregion=canvas.bbox("all"))
+                canvas.itemconfig(self.ventanas[canvas], width=canvas.winfo_width())
+            except tk.TclError:
+                pass  # El canvas fue destruido
+            del self.pendientes[canvas]
+            METRICAS.contar("layout.pasadas")
+            for origen in origenes:
+                METRICAS.contar(f"layout.pasadas.{origen}")
+        if forzar:
+            self.window.update_idletasks()
+
+class PanelCanvas:
+    """Panel del tablero dibujado directamente sobre un Canvas.
+
+    Alternativa a las tarjetas de widgets para cientos de órdenes: cada
+    tarjeta son unos pocos elementos del canvas (marco, textos, barra y
+    botón) y solo existen los de las tarjetas a la vista. Al desplazarse se
+    dibujan las que entran y se borran las que salen; en cada tick solo se
+    tocan los elementos cuyo valor cambió. estado(orden) da (porcentaje,
+    texto) de una orden en preparación; con al_eliminar, el panel es de
+    órdenes listas y cada tarjeta lleva el botón Eliminar.
+    """
+    MARGEN = 5
+    RELLENO = 10
+    ALTO_BARRA = 12
+    ALTO_BOTON = 24
+    ANCHO_BOTON = 80
+    COLOR_FONDO = "white"
+    COLOR_BORDE = "#c8ccd4"
+    COLOR_TEXTO = "#2c3e50"
+    COLOR_BARRA = "#4a90e2"
+    COLOR_VACIO = "#e6e8ee"
+    COLOR_BOTON = "#f5f6fa"
+
+    def __init__(self, canvas, scrollbar, estado=None, al_eliminar=None):
+        self.canvas = canvas
+        self.estado = estado
+        self.al_eliminar = al_eliminar
+        self.fuente = tkfont.Font(family='Segoe UI', size=9)
+        self.fuente_titulo = tkfont.Font(family='Segoe UI', size=10, weight='bold')
+        self.alto_linea = self.fuente.metrics("linespace")
+        self.alto_titulo = self.fuente_titulo.metrics("linespace")
+        self.ordenes = []    # números de orden, de arriba abajo
+        self.ys = []         # borde superior de cada tarjeta, en paralelo
+        self.tarjetas = {}   # número -> {'bebidas', 'alto', 'valor', 'texto', 'barra', 'estado'}
+        self.fin = 0         # alto de todas las tarjetas
+        self.dibujadas = set()
+        self.ancho = 1
+        
+        scrollbar.config(command=self.desplazar)
+        canvas.config(yscrollcommand=scrollbar.set, background=self.COLOR_FONDO)
+        canvas.bind("<Configure>", self.al_configurar)
+        canvas.bind("<MouseWheel>",
+                    lambda e: self.desplazar("scroll", -1 if e.delta > 0 else 1, "units"))
+        canvas.bind("<Button-4>", lambda e: self.desplazar("scroll", -1, "units"))
+        canvas.bind("<Button-5>", lambda e: self.desplazar("scroll", 1, "units"))
+        canvas.tag_bind("boton", "<Button-1>", self.al_pulsar)
+
+    def __contains__(self, order_number):
+        return order_number in self.tarjetas
+
+    def __len__(self):
+        return len(self.ordenes)
+
+    def alto_de(self, lineas):
+        alto = 2 * self.RELLENO + self.alto_titulo + lineas * self.alto_linea
+        if self.al_eliminar:
+            return alto + self.alto_titulo + self.ALTO_BOTON + 2 * self.MARGEN
+        return alto + self.ALTO_BARRA + self.alto_linea + 2 * self.MARGEN
+
+    def agregar(self, order_number, bebidas):
+        """Agrega una tarjeta al final; se dibuja solo si queda a la vista"""
+        textos = [str(b) for b in bebidas]
+        alto = self.alto_de(len(textos))
+        self.tarjetas[order_number] = {'bebidas': "\n".join(textos), 'alto': alto,
+                                       'valor': None, 'texto': None}
+        self.ordenes.append(order_number)
+        self.ys.append(self.fin)
+        self.fin += alto + self.MARGEN
+        self.actualizar_region()
+        self.renderizar()
+
+    def quitar(self, order_number):
+        """Quita una tarjeta y sube las de abajo"""
+        tarjeta = self.tarjetas.pop(order_number, None)
+        if tarjeta is None:
+            return
+        i = self.ordenes.index(order_number)
+        del self.ordenes[i], self.ys[i]
+        delta = tarjeta['alto'] + self.MARGEN
+        for j in range(i, len(self.ys)):
+            self.ys[j] -= delta
+        self.fin -= delta
+        if order_number in self.dibujadas:
+            self.dibujadas.discard(order_number)
+            self.canvas.delete(f"orden{order_number}")
+        # Solo se mueven los elementos existentes: los de las tarjetas a la vista
+        for n in self.ordenes[i:]:
+            if n in self.dibujadas:
+                self.canvas.move(f"orden{n}", 0, -delta)
+        self.actualizar_region()
+        self.renderizar()
+
+    def actualizar_region(self):
+        self.canvas.config(scrollregion=(0, 0, self.ancho, max(self.fin, 1)))
+
+    def visibles(self):
+        """Número de orden -> borde superior de cada tarjeta a la vista"""
+        arriba = self.canvas.canvasy(0)
+        abajo = arriba + self.canvas.winfo_height()
+        i = max(0, bisect.bisect_right(self.ys, arriba) - 1)
+        visibles = {}
+        while i < len(self.ordenes) and self.ys[i] < abajo:
+            visibles[self.ordenes[i]] = self.ys[i]
+            i += 1
+        return visibles
+
+    @medido("tablero.renderizar")
+    def renderizar(self):
+        """Dibuja las tarjetas que entraron a la vista y borra las que salieron"""
+        visibles = self.visibles()
+        for n in self.dibujadas.difference(visibles):
+            self.canvas.delete(f"orden{n}")
+        for n, y in visibles.items():
+            if n not in self.dibujadas:
+                self.dibujar(n, y)
+        self.dibujadas = set(visibles)
+
+    def dibujar(self, n, y):
+        tarjeta = self.tarjetas[n]
+        etiqueta = f"orden{n}"
+        x0 = self.MARGEN
+        x1 = max(x0 + self.ANCHO_BOTON + 2 * self.RELLENO, self.ancho - self.MARGEN)
+        c = self.canvas
+        c.create_rectangle(x0, y, x1, y + tarjeta['alto'], fill=self.COLOR_FONDO,
+                           outline=self.COLOR_BORDE, tags=etiqueta)
+        y += self.RELLENO
+        c.create_text(x0 + self.RELLENO, y, anchor="nw", text=f"Pedido #{n}",
+                      font=self.fuente_titulo, fill=self.COLOR_TEXTO, tags=etiqueta)
+        y += self.alto_titulo
+        c.create_text(x0 + 2 * self.RELLENO, y, anchor="nw", text=tarjeta['bebidas'],
+                      font=self.fuente, fill=self.COLOR_TEXTO, tags=etiqueta)
+        y += tarjeta['bebidas'].count("\n") * self.alto_linea + self.alto_linea + self.MARGEN
+        centro = (x0 + x1) / 2
+        if self.al_eliminar:
+            c.create_text(centro, y, anchor="n", text="¡Pedido Completado!",
+                          font=self.fuente_titulo, fill=self.COLOR_TEXTO, tags=etiqueta)
+            y += self.alto_titulo + self.MARGEN
+            etiquetas = (etiqueta, "boton")
+            c.create_rectangle(centro - self.ANCHO_BOTON / 2, y,
+                               centro + self.ANCHO_BOTON / 2, y + self.ALTO_BOTON,
+                               fill=self.COLOR_BOTON, outline=self.COLOR_BORDE, tags=etiquetas)
+            c.create_text(centro, y + self.ALTO_BOTON / 2, text="Eliminar",
+                          font=self.fuente, fill=self.COLOR_TEXTO, tags=etiquetas)
+            return
+        bx0, bx1 = x0 + self.RELLENO, x1 - self.RELLENO
+        tarjeta['ancho_barra'] = bx1 - bx0
+        c.create_rectangle(bx0, y, bx1, y + self.ALTO_BARRA, fill=self.COLOR_VACIO,
+                           outline="", tags=etiqueta)
+        tarjeta['barra'] = c.create_rectangle(bx0, y, bx0, y + self.ALTO_BARRA,
+                                              fill=self.COLOR_BARRA, outline="",
+                                              tags=etiqueta)
+        tarjeta['estado'] = c.create_text(centro, y + self.ALTO_BARRA + self.MARGEN,
+                                          anchor="n", font=self.fuente,
+                                          fill=self.COLOR_TEXTO, tags=etiqueta)
+        tarjeta['valor'] = tarjeta['texto'] = None
+        self.pintar_progreso(n, tarjeta)
+
+    def pintar_progreso(self, n, tarjeta):
+        """Cambia la barra y el texto de una tarjeta dibujada solo si cambiaron"""
+        valor, texto = self.estado(n)
+        valor = int(valor)
+        if valor != tarjeta['valor']:
+            x0, y0, _, y1 = self.canvas.coords(tarjeta['barra'])
+            self.canvas.coords(tarjeta['barra'], x0, y0,
+                               x0 + tarjeta['ancho_barra'] * valor / 100, y1)
+            tarjeta['valor'] = valor
+        if texto != tarjeta['texto']:
+            self.canvas.itemconfig(tarjeta['estado'], text=texto)
+            tarjeta['texto'] = texto
+
+    @medido("tablero.refrescar")
+    def refrescar(self):
+        """Tick: actualiza el progreso de las tarjetas a la vista"""
+        if self.al_eliminar:
+            return
+        for n in self.dibujadas:
+            self.pintar_progreso(n, self.tarjetas[n])
+
+    def desplazar(self, *args):
+        self.canvas.yview(*args)
+        self.renderizar()
+
+    def al_configurar(self, event):
+        if event.width != self.ancho:
+            # Cambió el ancho: las tarjetas a la vista se vuelven a dibujar
+            self.ancho = event.width
+            self.canvas.delete("all")
+            self.dibujadas = set()
+            self.actualizar_region()
+        self.renderizar()
+
+    def al_pulsar(self, event):
+        for etiqueta in self.canvas.gettags("current"):
+            if etiqueta.startswith("orden"):
+                self.al_eliminar(int(etiqueta[len("orden"):]))
+                return
 
-class BebidaPersonalizada:
-    def __init__(self, tipo, cantidad=1, extras=None):
-        self.tipo = tipo
-        self.cantidad = cantidad
-        self.extras = extras if extras else []
-    
-    def calcular_subtotal(self, precios_bebidas, precios_extras):
-        subtotal = precios_bebidas[self.tipo] * self.cantidad
-        for extra in self.extras:
-            subtotal += precios_extras[extra] * self.cantidad
-        return subtotal
-    
-    def calcular_tiempo(self, tiempo_bebidas, tiempo_extras):
-        tiempo_total = tiempo_bebidas[self.tipo]
-        for extra in self.extras:
-            tiempo_total += tiempo_extras[extra]
-        return tiempo_total * self.cantidad
-    
-    def __str__(self):
-        texto = f"{self.cantidad}x {self.tipo}"
-        if self.extras:
-            texto += f" con {', '.join(self.extras)}"
-        return texto
-    
 class SistemaPedidosCafeteria:
-    def __init__(self):
+    TICKETS_POR_PAGINA = 100
+    MAX_FILAS_HISTORIAL = 500
+    INTERVALO_TICK_MS = 100
+    INTERVALO_CARGA_MS = 50
+    INTERVALO_CATALOGO_MS = 2000
+    UMBRALES_GC_IMPORTACION = (50_000, 20, 100)
+    PERIODOS_REPORTE = {"Hoy": 1, "Últimos 7 días": 7, "Últimos 30 días": 30, "Todo": None}
+
+    def __init__(self, almacen=None):
         self.window = tk.Tk()
         self.window.title("Sistema de Pedidos - Cafetería")
         self.window.geometry("1000x680")
@@ -91,45 +3229,48 @@ class SistemaPedidosCafeteria:
         self.tickets_dir = "tickets"
         if not os.path.exists(self.tickets_dir):
             os.makedirs(self.tickets_dir)
-        self.tickets_file = os.path.join(self.tickets_dir, "tickets.json")
-        self.tickets = self.cargar_tickets()
+        # Almacén seleccionable: "json" (por defecto) o "sqlite"
+        tipo_almacen = almacen or os.environ.get("CAFETERIA_ALMACEN", "json")
+        self.almacen = ALMACENES_TICKETS[tipo_almacen](self.tickets_dir)
+        self.cargar_tickets()
         
         self.conf_estilo()
         
         self.window.grid_columnconfigure(0, weight=1)
         self.window.grid_rowconfigure(1, weight=1)
         
-        # Variables y precios
-        self.contador_orden = 1
-        self.ordenes_activas = {}
-        self.bebidas_en_carrito = []
-        self.bebida_actual = None
-        
-        self.tiempo_bebidas = {
-            "Café Americano": 180,
-            "Cappuccino": 300,
-            "Latte": 240,
-            "Té": 120
-        }
-        
-        self.precio_bebidas = {
-            "Café Americano": 25,
-            "Cappuccino": 35,
-            "Latte": 30,
-            "Té": 20
-        }
-        
-        self.tiempo_extra = {
-            "Leche extra": 60,
-            "Shot extra de café": 120,
-            "Sirope de sabor": 30
-        }
-        
-        self.precio_extra = {
-            "Leche extra": 10,
-            "Shot extra de café": 15,
-            "Sirope de sabor": 8
-        }
+        # Carrito, precios, tiempos y órdenes viven en el motor; la ventana
+        # solo los muestra. Estaciones y política de la cola de cocina:
+        self.motor = MotorPedidos(
+            self.almacen,
+            estaciones=int(os.environ.get("CAFETERIA_ESTACIONES", 2)),
+            politica=os.environ.get("CAFETERIA_POLITICA", "fifo"),
+            catalogo=CatalogoMenu(os.environ.get("CAFETERIA_MENU", "menu.json")))
+        try:
+            self.motor.recargar_catalogo()
+        except (ValueError, OSError) as e:
+            print(f"Error al cargar el menú: {e}")
+        self.tarjetas_ordenes = {}  # número de orden -> TarjetaOrden
+        # Tablero de pedidos activos: "widgets" (por defecto) o "canvas",
+        # dibujado en el canvas para cientos de órdenes a la vez
+        self.tipo_tablero = os.environ.get("CAFETERIA_TABLERO", "widgets")
+        self.tablero_preparacion = None  # PanelCanvas con el tablero "canvas"
+        self.tablero_listos = None
+        self.tick_programado = None
+        self.ventas = None  # InstantaneaVentas, se arma al abrir Reportes
+        self.ventas_pendientes = None
+        self.exportacion = None  # Event para cancelar la exportación en curso
+        self.importacion = None  # Ídem para la importación
+        
+        # Monitor de bloqueos del ciclo de Tk (CAFETERIA_MONITOR=0 lo apaga)
+        self.monitor = None
+        if os.environ.get("CAFETERIA_MONITOR", "1") != "0":
+            self.monitor = MonitorLatencia(
+                self.window, ruta_registro=os.path.join(self.tickets_dir, "bloqueos.log"))
+        # Scrollregion y ancho de los canvas, una vez por cuadro
+        # (CAFETERIA_LAYOUT=inmediato vuelve a una pasada por cada cambio)
+        self.layout = CoordinadorLayout(
+            self.window, inmediato=os.environ.get("CAFETERIA_LAYOUT") == "inmediato")
 
         # Variables de interfaz
         self.preparing_canvas = None
@@ -139,6 +3280,9 @@ class SistemaPedidosCafeteria:
         self.tickets_canvas = None
         self.tickets_lista_frame = None
         self.tickets_list = None  # Para la lista de tickets
+        self.filas_historial = {}  # ticket_id -> iid del Treeview
+        self.historial_llamadas_tk = 0
+        self.historial_llamadas_ahorradas = 0
         
         self.conf_menu()
         self.conf_gui()
@@ -146,31 +3290,77 @@ class SistemaPedidosCafeteria:
         self.setup_info_panel()  # Después el panel de información
         
         self.notebook.bind('<<NotebookTabChanged>>', self.on_tab_change)
+        
+        # El resto del historial se carga con la ventana ya visible
+        self.iniciar_carga_historial()
+        self.window.after(self.INTERVALO_CATALOGO_MS, self.revisar_catalogo)
 
     def cargar_tickets(self):
-        if os.path.exists(self.tickets_file):
+        """Carga solo los tickets de hoy; el resto llega en iniciar_carga_historial"""
+        try:
+            self.almacen.abrir(desde=datetime.combine(datetime.now().date(),
+                                                      datetime.min.time()))
+        except Exception as e:
+            print(f"Error al cargar tickets: {e}")
+            messagebox.showerror("Error", f"Error al cargar tickets: {str(e)}\n\n"
+                                 "Las ventas nuevas se guardan, pero el historial "
+                                 "puede estar incompleto.")
+
+    def iniciar_carga_historial(self):
+        """Lee el historial anterior en un hilo de fondo, por lotes"""
+        self.lotes_historial = queue.Queue(maxsize=4)
+        self.historial_cargado = False
+        
+        def cargar():
             try:
-                with open(self.tickets_file, 'r') as f:
-                    data = json.load(f)
-                    return [Ticket.from_dict(t) for t in data]
+                for lote in self.almacen.cargar_historial():
+                    self.lotes_historial.put(lote)
             except Exception as e:
-                print(f"Error al cargar tickets: {e}")
-                return []
-        return []
+                print(f"Error al cargar historial: {e}")
+            self.lotes_historial.put(None)
+        
+        threading.Thread(target=cargar, daemon=True).start()
+        self.window.after(self.INTERVALO_CARGA_MS, self.revisar_carga_historial)
+
+    def revisar_carga_historial(self):
+        """Fusiona en el hilo de la interfaz los lotes que ya se leyeron"""
+        terminado = False
+        try:
+            while True:
+                lote = self.lotes_historial.get_nowait()
+                if lote is None:
+                    terminado = True
+                    break
+                self.almacen.fusionar(lote)
+        except queue.Empty:
+            pass
+        
+        if terminado:
+            self.almacen.terminar_carga()
+            self.historial_cargado = True
+            self.carga_label.config(text="")
+            if self.historial_filtro is not None:
+                self.filtrar_tickets()
+            else:
+                self.actualizar_lista_tickets()
+            return
+        
+        self.carga_label.config(
+            text=f"Cargando historial... {self.almacen.contar()} tickets")
+        if self.historial_filtro is None:
+            # La primera página (lo más reciente) normalmente no cambia
+            self.historial_total = self.almacen.contar()
+            self.mostrar_pagina()
+        self.window.after(self.INTERVALO_CARGA_MS, self.revisar_carga_historial)
 
+    @medido("compactar_tickets")
     def guardar_tickets(self):
+        """Compacta el almacén; las ventas individuales se agregan en MotorPedidos.crear_orden"""
         try:
-            with open(self.tickets_file, 'w') as f:
-                json.dump([t.to_dict() for t in self.tickets], f, indent=4)
+            self.almacen.compactar()
         except Exception as e:
             print(f"Error al guardar tickets: {e}")
 
-    def generar_ticket(self, orden_id, bebidas, total):
-        ticket = Ticket(orden_id, bebidas, total)
-        self.tickets.append(ticket)
-        self.guardar_tickets()
-        return ticket
-
     def conf_estilo(self):
         style = ttk.Style()
         style.theme_use('clam')
@@ -274,6 +3464,9 @@ class SistemaPedidosCafeteria:
         file_menu = tk.Menu(menubar, tearoff=0)
         menubar.add_cascade(label="Archivo", menu=file_menu)
         file_menu.add_command(label="Exportar Tickets", command=self.exportar_tickets)
+        file_menu.add_command(label="Importar Tickets", command=self.importar_tickets)
+        file_menu.add_command(label="Recargar Menú",
+                              command=lambda: self.recargar_catalogo(avisar=True))
         file_menu.add_separator()
         file_menu.add_command(label="Salir", command=self.salir)
         
@@ -288,6 +3481,8 @@ class SistemaPedidosCafeteria:
         menubar.add_cascade(label="Ayuda", menu=help_menu)
         help_menu.add_command(label="¿Cómo funciona?", command=self.mostrar_ayuda)
         help_menu.add_command(label="Créditos", command=self.mostrar_creditos)
+        help_menu.add_separator()
+        help_menu.add_command(label="Diagnóstico", command=self.mostrar_diagnostico)
 
     def conf_gui(self):
         self.notebook = ttk.Notebook(self.window)
@@ -305,8 +3500,11 @@ class SistemaPedidosCafeteria:
         self.tickets_frame = ttk.Frame(self.notebook)
         self.notebook.add(self.tickets_frame, text="Historial de Tickets")
         self.conf_tickets_tab()
-
-        self.conf_precio_menu()
+        
+        # Pestaña de reportes de ventas
+        self.reportes_frame = ttk.Frame(self.notebook)
+        self.notebook.add(self.reportes_frame, text="Reportes")
+        self.conf_reportes_tab()
 
     def conf_tickets_tab(self):
         self.tickets_frame.grid_columnconfigure(0, weight=1)
@@ -347,6 +3545,10 @@ class SistemaPedidosCafeteria:
         ttk.Button(control_frame, text="Limpiar Filtros", 
                 command=self.limpiar_filtros).pack(side="left", padx=5)
         
+        # Indicador de carga del historial en segundo plano
+        self.carga_label = ttk.Label(control_frame, text="")
+        self.carga_label.pack(side="right", padx=5)
+        
         # Lista de tickets con scroll
         self.tickets_list = ttk.Treeview(self.tickets_frame, 
             columns=("fecha", "total", "estado", "items"),
@@ -361,7 +3563,7 @@ class SistemaPedidosCafeteria:
         
         self.tickets_list.column("fecha", width=150)
         self.tickets_list.column("total", width=100)
-        self.tickets_list.column("estado", width=100)
+        self.tickets_list.column("estado", width=140)
         self.tickets_list.column("items", width=400)
         
         # Scrollbar para la lista
@@ -372,10 +3574,20 @@ class SistemaPedidosCafeteria:
         self.tickets_list.grid(row=1, column=0, sticky="nsew", padx=10, pady=5)
         scrollbar.grid(row=1, column=1, sticky="ns")
         
+        # Navegación por páginas: solo se crean las filas de la página visible
+        nav_frame = ttk.Frame(self.tickets_frame)
+        nav_frame.grid(row=2, column=0, pady=(5, 0))
+        ttk.Button(nav_frame, text="◀ Anterior",
+                command=lambda: self.cambiar_pagina(-1)).pack(side="left", padx=5)
+        self.pagina_label = ttk.Label(nav_frame, text="")
+        self.pagina_label.pack(side="left", padx=10)
+        ttk.Button(nav_frame, text="Siguiente ▶",
+                command=lambda: self.cambiar_pagina(1)).pack(side="left", padx=5)
+        
         # Botón para ver detalle
         ttk.Button(self.tickets_frame, text="Ver Detalle", 
                 command=self.ver_ticket_seleccionado).grid(
-            row=2, column=0, pady=5)
+            row=3, column=0, pady=5)
         
         # Cargar tickets iniciales
         self.actualizar_lista_tickets()
@@ -383,6 +3595,140 @@ class SistemaPedidosCafeteria:
         # Bind doble click
         self.tickets_list.bind("<Double-1>", lambda e: self.ver_ticket_seleccionado())
 
+    def conf_reportes_tab(self):
+        self.reportes_frame.grid_columnconfigure((0, 1, 2), weight=1)
+        self.reportes_frame.grid_rowconfigure(2, weight=1)
+        
+        # Panel superior con el periodo del reporte
+        control_frame = ttk.Frame(self.reportes_frame)
+        control_frame.grid(row=0, column=0, columnspan=3, sticky="ew", padx=10, pady=5)
+        
+        ttk.Label(control_frame, text="Periodo:").pack(side="left", padx=5)
+        self.periodo_var = tk.StringVar(value="Últimos 30 días")
+        periodo_combo = ttk.Combobox(control_frame, textvariable=self.periodo_var,
+                                     values=list(self.PERIODOS_REPORTE), width=18,
+                                     state="readonly")
+        periodo_combo.pack(side="left", padx=5)
+        periodo_combo.bind('<<ComboboxSelected>>', lambda e: self.actualizar_reporte())
+        ttk.Button(control_frame, text="Actualizar",
+                command=self.mostrar_reportes).pack(side="left", padx=5)
+        
+        self.reporte_estado = ttk.Label(control_frame, text="")
+        self.reporte_estado.pack(side="right", padx=5)
+        
+        # Resumen del periodo
+        self.reporte_resumen = ttk.Label(self.reportes_frame, text="",
+                                         style="Bold.TLabelframe.Label")
+        self.reporte_resumen.grid(row=1, column=0, columnspan=3, sticky="w", padx=15, pady=5)
+        
+        # Tablas: ingresos por hora, unidades por bebida y tasa de extras
+        self.reporte_tablas = {}
+        for columna, (clave, titulo, encabezados) in enumerate([
+                ('horas', "Ingresos por Hora", ("Hora", "Ingresos")),
+                ('bebidas', "Unidades por Bebida", ("Bebida", "Unidades", "%")),
+                ('extras', "Extras", ("Extra", "Bebidas con extra"))]):
+            marco = ttk.LabelFrame(self.reportes_frame, text=titulo)
+            marco.grid(row=2, column=columna, sticky="nsew", padx=5, pady=5)
+            marco.grid_columnconfigure(0, weight=1)
+            marco.grid_rowconfigure(0, weight=1)
+            tabla = ttk.Treeview(marco, columns=encabezados, show="headings", height=15)
+            for encabezado in encabezados:
+                tabla.heading(encabezado, text=encabezado)
+                tabla.column(encabezado, width=90, anchor="e" if encabezado != encabezados[0] else "w")
+            tabla.grid(row=0, column=0, sticky="nsew")
+            self.reporte_tablas[clave] = tabla
+
+    def mostrar_reportes(self):
+        """Al abrir la pestaña: construye la instantánea la primera vez"""
+        if self.ventas is None:
+            self.iniciar_instantanea_ventas()
+        else:
+            self.actualizar_reporte()
+
+    def iniciar_instantanea_ventas(self):
+        """Arma las columnas de ventas en un hilo de fondo"""
+        if self.ventas_pendientes is not None:
+            return  # Ya se está construyendo
+        self.ventas_pendientes = []
+        self.reporte_estado.config(text="Preparando reportes...")
+        # El recorrido se fija aquí, junto con ventas_pendientes: lo que se
+        # confirme o importe después llega solo por registrar_venta
+        tickets = self.almacen.iterar()
+        resultado = queue.Queue()
+        
+        def construir():
+            instantanea = InstantaneaVentas()
+            try:
+                instantanea.extender(tickets)
+            except Exception as e:
+                resultado.put(e)
+                return
+            resultado.put(instantanea)
+        
+        def revisar():
+            try:
+                instantanea = resultado.get_nowait()
+            except queue.Empty:
+                self.window.after(self.INTERVALO_CARGA_MS, revisar)
+                return
+            if isinstance(instantanea, Exception):
+                # Una instantánea a medias daría reportes falsos: no se instala
+                # y se vuelve a construir al reabrir la pestaña o con Actualizar
+                print(f"Error al preparar reportes: {instantanea}")
+                self.ventas_pendientes = None
+                self.reporte_estado.config(text=f"Error al preparar reportes: {instantanea}")
+                return
+            instantanea.extender(self.ventas_pendientes)
+            self.ventas = instantanea
+            self.ventas_pendientes = None
+            self.actualizar_reporte()
+        
+        threading.Thread(target=construir, daemon=True).start()
+        self.window.after(self.INTERVALO_CARGA_MS, revisar)
+
+    def registrar_venta(self, ticket):
+        """Agrega un ticket nuevo a la instantánea sin reconstruirla"""
+        if self.ventas is not None:
+            self.ventas.agregar(ticket)
+            if self.notebook.index(self.notebook.select()) == 3:
+                self.actualizar_reporte()
+        elif self.ventas_pendientes is not None:
+            self.ventas_pendientes.append(ticket)
+
+    @medido("actualizar_reporte")
+    def actualizar_reporte(self):
+        if self.ventas is None:
+            return
+        dias = self.PERIODOS_REPORTE.get(self.periodo_var.get())
+        hoy = datetime.now().date()
+        desde = hoy - timedelta(days=dias - 1) if dias else None
+        
+        inicio = time.perf_counter()
+        reporte = self.ventas.reporte(desde, hoy if dias else None)
+        duracion = (time.perf_counter() - inicio) * 1000
+        
+        self.reporte_estado.config(
+            text=f"{len(self.ventas)} tickets en {duracion:.1f} ms "
+                 f"({'NumPy' if np is not None else 'Python'})")
+        self.reporte_resumen.config(
+            text=f"Tickets: {reporte['tickets']}    Ingresos: ${reporte['ingresos']:.2f}    "
+                 f"Ticket promedio: ${reporte['promedio']:.2f}    "
+                 f"Mínimo: ${reporte['minimo']:.2f}    Máximo: ${reporte['maximo']:.2f}")
+        
+        unidades = sum(reporte['por_bebida'].values())
+        filas = {
+            'horas': [(f"{hora:02d}:00", f"${ingresos:.2f}")
+                      for hora, ingresos in enumerate(reporte['por_hora']) if ingresos],
+            'bebidas': [(bebida, cantidad, f"{cantidad / unidades * 100:.1f}")
+                        for bebida, cantidad in sorted(reporte['por_bebida'].items(),
+                                                       key=lambda x: -x[1])],
+            'extras': [(extra, f"{tasa * 100:.1f}%") for extra, tasa in reporte['extras'].items()]
+        }
+        for clave, tabla in self.reporte_tablas.items():
+            tabla.delete(*tabla.get_children())
+            for valores in filas[clave]:
+                tabla.insert("", "end", values=valores)
+
     def after_date_selection(self):
         """Método para manejar la selección de fecha de manera segura"""
         try:
@@ -390,50 +3736,115 @@ class SistemaPedidosCafeteria:
         except Exception as e:
             print(f"Error al filtrar tickets: {e}")
 
-    def limpiar_filtros(self):
-        """Método actualizado para limpiar filtros de manera segura"""
-        try:
-            self.fecha_filtro.set_date(datetime.now())
-            self.busqueda_var.set("")
-            self.actualizar_lista_tickets()
-        except Exception as e:
-            print(f"Error al limpiar filtros: {e}")
+    @medido("actualizar_lista_tickets")
+    def actualizar_lista_tickets(self, tickets_filtrados=None, filtro=None):
+        """Define la fuente del historial y muestra su primera página.
 
-    def filtrar_tickets(self):
-        """Método actualizado para filtrar tickets de manera segura"""
-        try:
-            fecha = self.fecha_filtro.get_date()
-            busqueda = self.busqueda_var.get().lower()
-            
-            tickets_filtrados = [
-                t for t in self.tickets
-                if (t.timestamp.date() == fecha and
-                    (not busqueda or
-                    busqueda in t.ticket_id.lower() or
-                    busqueda in str(t.total).lower() or
-                    any(busqueda in str(b).lower() for b in t.bebidas)))
-            ]
-            
-            self.actualizar_lista_tickets(tickets_filtrados)
-        except Exception as e:
-            print(f"Error al filtrar tickets: {e}")
-            # En caso de error, mostrar todos los tickets
-            self.actualizar_lista_tickets()
-
-    def actualizar_lista_tickets(self, tickets_filtrados=None):
-        # Limpiar lista actual
-        for item in self.tickets_list.get_children():
-            self.tickets_list.delete(item)
-        
-        # Mostrar tickets
-        tickets_a_mostrar = tickets_filtrados if tickets_filtrados is not None else self.tickets
-        for ticket in reversed(tickets_a_mostrar):
-            self.tickets_list.insert("", "end", values=(
-                ticket.timestamp.strftime('%d/%m/%Y %H:%M'),
+        filtro es la pareja (fecha, busqueda) que produjo tickets_filtrados;
+        se usa para decidir si un ticket nuevo pertenece a la vista.
+        """
+        self.historial_filtro = filtro
+        if tickets_filtrados is None:
+            self.historial_lista = None
+            self.historial_total = self.almacen.contar()
+            self.historial_fuente = self.almacen.recientes
+        else:
+            lista = self.historial_lista = list(tickets_filtrados)
+            self.historial_total = len(lista)
+            self.historial_fuente = (
+                lambda desde, limite: recientes_de(lista, desde, limite))
+        self.pagina_actual = 0
+        self.mostrar_pagina()
+        self.tickets_list.yview_moveto(0)
+
+    def cambiar_pagina(self, delta):
+        paginas = max(1, -(-self.historial_total // self.TICKETS_POR_PAGINA))
+        pagina = min(max(0, self.pagina_actual + delta), paginas - 1)
+        if pagina != self.pagina_actual:
+            self.pagina_actual = pagina
+            self.mostrar_pagina()
+            self.tickets_list.yview_moveto(0)
+
+    def valores_fila(self, ticket):
+        return (ticket.timestamp.strftime('%d/%m/%Y %H:%M'),
                 f"${ticket.total:.2f}",
                 ticket.ticket_id,
-                ", ".join(str(b) for b in ticket.bebidas)
-            ))
+                ", ".join(str(b) for b in ticket.bebidas))
+
+    @medido("mostrar_pagina")
+    def mostrar_pagina(self):
+        """Aplica la página actual al Treeview calculando solo las diferencias.
+
+        Las filas que dejan de coincidir se separan (detach) y se conservan en
+        filas_historial para volver a mostrarse sin formatearse de nuevo.
+        """
+        desde = self.pagina_actual * self.TICKETS_POR_PAGINA
+        pagina = self.historial_fuente(desde, self.TICKETS_POR_PAGINA)
+        conjunto = {t.ticket_id for t in pagina}
+        actuales = self.tickets_list.get_children()
+        llamadas = 1
+        
+        sobrantes = [iid for iid in actuales if iid not in conjunto]
+        if sobrantes:
+            self.tickets_list.detach(*sobrantes)
+            llamadas += 1
+        
+        # Insertar o mover solo las filas que no están ya en su posición
+        visibles = [iid for iid in actuales if iid in conjunto]
+        for posicion, ticket in enumerate(pagina):
+            iid = self.filas_historial.get(ticket.ticket_id)
+            if iid is None:
+                iid = self.tickets_list.insert("", posicion, iid=ticket.ticket_id,
+                                               values=self.valores_fila(ticket))
+                self.filas_historial[ticket.ticket_id] = iid
+            elif posicion < len(visibles) and visibles[posicion] == iid:
+                continue
+            else:
+                self.tickets_list.move(iid, "", posicion)
+                if iid in visibles:
+                    visibles.remove(iid)
+            visibles.insert(posicion, iid)
+            llamadas += 1
+        
+        llamadas += self.podar_filas_historial(conjunto)
+        self.contar_llamadas_historial(llamadas, len(actuales) + len(pagina))
+        
+        self.actualizar_etiqueta_pagina()
+
+    def actualizar_etiqueta_pagina(self):
+        paginas = max(1, -(-self.historial_total // self.TICKETS_POR_PAGINA))
+        self.pagina_label.config(
+            text=f"Página {self.pagina_actual + 1} de {paginas} "
+                 f"({self.historial_total} tickets)")
+
+    def podar_filas_historial(self, visibles):
+        """Elimina filas separadas si el caché supera MAX_FILAS_HISTORIAL"""
+        if len(self.filas_historial) <= self.MAX_FILAS_HISTORIAL:
+            return 0
+        separadas = [tid for tid in self.filas_historial if tid not in visibles]
+        self.tickets_list.delete(*(self.filas_historial.pop(tid) for tid in separadas))
+        return 1
+
+    def contar_llamadas_historial(self, llamadas, sin_diff):
+        """Registra las llamadas a Tk frente a las de borrar y reinsertar todo"""
+        self.historial_llamadas_tk += llamadas
+        self.historial_llamadas_ahorradas += max(0, sin_diff - llamadas)
+        METRICAS.contar("historial.llamadas_tk", llamadas)
+        METRICAS.contar("historial.llamadas_ahorradas", max(0, sin_diff - llamadas))
+
+    @medido("agregar_fila_historial")
+    def agregar_fila_historial(self, ticket):
+        """Refleja un ticket recién creado sin reconstruir el historial"""
+        if self.historial_filtro is not None:
+            fecha, busqueda = self.historial_filtro
+            if (ticket.timestamp.date() != fecha or
+                    not coincide_busqueda(ticket, busqueda)):
+                return
+            self.historial_lista.append(ticket)
+        self.historial_total += 1
+        # El diff de la página resulta en una inserción y, si la página
+        # se desborda, en separar la última fila
+        self.mostrar_pagina()
 
     def ver_ticket_seleccionado(self):
         seleccion = self.tickets_list.selection()
@@ -441,8 +3852,8 @@ class SistemaPedidosCafeteria:
             messagebox.showwarning("Advertencia", "Por favor seleccione un ticket")
             return
         
-        ticket_id = self.tickets_list.item(seleccion[0])['values'][2]
-        ticket = next((t for t in self.tickets if t .ticket_id == ticket_id), None)
+        # El iid de cada fila es el ticket_id
+        ticket = self.almacen.obtener(seleccion[0])
         
         if ticket:
             self.mostrar_detalle_ticket(ticket)
@@ -511,20 +3922,14 @@ class SistemaPedidosCafeteria:
         ttk.Button(button_frame, text="Cerrar",
                 command=detalle.destroy).pack(side='left', padx=5)
 
+    @medido("filtrar_tickets")
     def filtrar_tickets(self):
         fecha = self.fecha_filtro.get_date()
         busqueda = self.busqueda_var.get().lower()
         
-        tickets_filtrados = [
-            t for t in self.tickets
-            if (t.timestamp.date() == fecha and
-                (not busqueda or
-                 busqueda in t.ticket_id.lower() or
-                 busqueda in str(t.total).lower() or
-                 any(busqueda in str(b).lower() for b in t.bebidas)))
-        ]
+        tickets_filtrados = self.almacen.filtrar(fecha, busqueda)
         
-        self.actualizar_lista_tickets(tickets_filtrados)
+        self.actualizar_lista_tickets(tickets_filtrados, filtro=(fecha, busqueda))
 
     def setup_ordenes_activas_tab(self):
         self.ordenes_activas_frame.grid_columnconfigure(0, weight=1)
@@ -541,6 +3946,23 @@ class SistemaPedidosCafeteria:
         ttk.Label(preparing_panel, text="Pedidos en Preparación", 
                 style="Header.TLabel").grid(row=0, column=0, pady=5, sticky="w")
         
+        # Configuración de la cocina: estaciones y política de la cola
+        cocina_frame = ttk.Frame(preparing_panel)
+        cocina_frame.grid(row=0, column=0, columnspan=2, pady=5, sticky="e")
+        ttk.Label(cocina_frame, text="Estaciones:").pack(side="left", padx=2)
+        self.estaciones_var = tk.IntVar(value=self.motor.cocina.estaciones)
+        ttk.Spinbox(cocina_frame, from_=1, to=10, width=3, state="readonly",
+                    textvariable=self.estaciones_var,
+                    command=self.cambiar_config_cocina).pack(side="left", padx=2)
+        ttk.Label(cocina_frame, text="Cola:").pack(side="left", padx=2)
+        self.politica_var = tk.StringVar(value=self.motor.cocina.politica)
+        politica_combo = ttk.Combobox(cocina_frame, textvariable=self.politica_var,
+                                      values=PlanificadorCocina.POLITICAS,
+                                      width=5, state="readonly")
+        politica_combo.pack(side="left", padx=2)
+        politica_combo.bind("<<ComboboxSelected>>",
+                            lambda e: self.cambiar_config_cocina())
+        
         # Scrollbar y Canvas para pedidos en preparación
         preparing_scroll = ttk.Scrollbar(preparing_panel)
         preparing_scroll.grid(row=1, column=1, sticky="ns")
@@ -550,15 +3972,16 @@ class SistemaPedidosCafeteria:
                                         highlightthickness=0)
         self.preparing_canvas.grid(row=1, column=0, sticky="nsew")
         
-        self.preparing_frame = ttk.Frame(self.preparing_canvas)
-        self.preparing_frame.grid_columnconfigure(0, weight=1)
-        
-        self.preparing_canvas.create_window((0, 0), 
-                                        window=self.preparing_frame,
-                                        anchor="nw",
-                                        tags="preparing_frame")
-        
-        preparing_scroll.config(command=self.preparing_canvas.yview)
+        if self.tipo_tablero != "canvas":
+            self.preparing_frame = ttk.Frame(self.preparing_canvas)
+            self.preparing_frame.grid_columnconfigure(0, weight=1)
+            
+            self.preparing_canvas.create_window((0, 0), 
+                                            window=self.preparing_frame,
+                                            anchor="nw",
+                                            tags="preparing_frame")
+            
+            preparing_scroll.config(command=self.preparing_canvas.yview)
         
         # Separador vertical
         ttk.Separator(self.ordenes_activas_frame, orient='vertical').grid(
@@ -581,6 +4004,14 @@ class SistemaPedidosCafeteria:
                                         highlightthickness=0)
         self.completed_canvas.grid(row=1, column=0, sticky="nsew")
         
+        if self.tipo_tablero == "canvas":
+            # Las tarjetas se dibujan en los canvas, sin frames interiores
+            self.tablero_preparacion = PanelCanvas(self.preparing_canvas, preparing_scroll,
+                                                   estado=self.estado_progreso)
+            self.tablero_listos = PanelCanvas(self.completed_canvas, completed_scroll,
+                                              al_eliminar=self.remover_orden)
+            return
+        
         self.completed_frame = ttk.Frame(self.completed_canvas)
         self.completed_frame.grid_columnconfigure(0, weight=1)
         
@@ -591,7 +4022,13 @@ class SistemaPedidosCafeteria:
         
         completed_scroll.config(command=self.completed_canvas.yview)
         
+        # Tarjetas reutilizables de cada panel
+        self.pool_preparacion = PoolTarjetas(self.preparing_frame)
+        self.pool_listos = PoolTarjetas(self.completed_frame)
+        
         # Configurar eventos para mantener la responsividad
+        self.layout.registrar(self.preparing_canvas, "preparing_frame")
+        self.layout.registrar(self.completed_canvas, "completed_frame")
         self.preparing_frame.bind('<Configure>', self.conf_on_frame)
         self.completed_frame.bind('<Configure>', self.conf_on_frame)
 
@@ -604,13 +4041,15 @@ class SistemaPedidosCafeteria:
             extra for extra, var in self.extra_vars.items() if var.get()
         ]
         
-        bebida = BebidaPersonalizada(
-            self.drink_var.get(),
-            self.cantidad_var.get(),
-            extras_seleccionados
-        )
-        
-        self.bebidas_en_carrito.append(bebida)
+        try:
+            self.motor.agregar_al_carrito(
+                self.drink_var.get(),
+                self.cantidad_var.get(),
+                extras_seleccionados
+            )
+        except (ValueError, tk.TclError) as e:
+            messagebox.showwarning("Advertencia", str(e))
+            return
         self.actualizar_carrito()
         
         # Limpiar selección
@@ -623,8 +4062,8 @@ class SistemaPedidosCafeteria:
         self.cart_text.delete(1.0, tk.END)
         total = 0
         
-        for i, bebida in enumerate(self.bebidas_en_carrito, 1):
-            subtotal = bebida.calcular_subtotal(self.precio_bebidas, self.precio_extra)
+        for i, bebida in enumerate(self.motor.carrito, 1):
+            subtotal = self.motor.subtotal(bebida)
             total += subtotal
             
             self.cart_text.insert(tk.END, 
@@ -633,178 +4072,138 @@ class SistemaPedidosCafeteria:
         self.total_label.config(text=f"Total: ${total:.2f}")
 
     def vaciar_carrito(self):
-        if self.bebidas_en_carrito and messagebox.askyesno(
+        if self.motor.carrito and messagebox.askyesno(
             "Confirmar", "¿Está seguro de vaciar el carrito?"):
-            self.bebidas_en_carrito = []
+            self.motor.vaciar_carrito()
             self.actualizar_carrito()
 
-    def crear_orden(self):
-        if not self.bebidas_en_carrito:
+    def crear_tarjeta_orden(self, order_number):
+        """Crea la tarjeta de una orden que el motor ya mandó a la cocina"""
+        bebidas = self.motor.ordenes_activas[order_number]['bebidas']
+        if self.tablero_preparacion is not None:
+            self.tablero_preparacion.agregar(order_number, bebidas)
+            self.tarjetas_ordenes[order_number] = self.tablero_preparacion
             return
-                
-        order_number = self.contador_orden
-        self.contador_orden += 1
-        
-        # Crear frame del pedido
-        order_frame = ttk.LabelFrame(self.preparing_frame, text=f"Pedido #{order_number}")
-        order_frame.grid(row=len(self.ordenes_activas), column=0, sticky="ew", padx=5, pady=5)
-        order_frame.grid_columnconfigure(0, weight=1)
-        
-        content_frame = ttk.Frame(order_frame)
-        content_frame.grid(row=0, column=0, sticky="ew", padx=10, pady=5)
-        content_frame.grid_columnconfigure(0, weight=1)
-        
-        # Mostrar bebidas
-        for i, bebida in enumerate(self.bebidas_en_carrito):
-            ttk.Label(content_frame, text=str(bebida)).grid(
-                row=i, column=0, pady=2, sticky="ew")
-        
-        # Barra de progreso y tiempo
-        progress = ttk.Progressbar(content_frame, length=200, mode='determinate')
-        progress.grid(row=len(self.bebidas_en_carrito), column=0, pady=5, sticky="ew")
-        
-        time_label = ttk.Label(content_frame, text="Tiempo restante: --:--")
-        time_label.grid(row=len(self.bebidas_en_carrito)+1, column=0, pady=2)
-        
-        # Calcular tiempo total
-        total_time = sum(bebida.calcular_tiempo(self.tiempo_bebidas, self.tiempo_extra) 
-                        for bebida in self.bebidas_en_carrito)
-        
-        # Guardar información del pedido
-        self.ordenes_activas[order_number] = {
-            'frame': order_frame,
-            'progress': progress,
-            'time_label': time_label,
-            'total_time': total_time,
-            'start_time': time.time(),
-            'bebidas': self.bebidas_en_carrito.copy()
-        }
-        
-        # Iniciar el proceso de preparación
-        thread = threading.Thread(target=self.actualizar_progreso, args=(order_number,))
-        thread.daemon = True
-        thread.start()
+        tarjeta = self.pool_preparacion.tomar()
+        tarjeta.mostrar(order_number, bebidas)
+        self.tarjetas_ordenes[order_number] = tarjeta
 
-    def actualizar_progreso(self, order_number):
-        if order_number not in self.ordenes_activas:
+    def cambiar_config_cocina(self):
+        try:
+            self.motor.configurar_cocina(estaciones=self.estaciones_var.get(),
+                                         politica=self.politica_var.get())
+        except (ValueError, tk.TclError):
             return
-                
-        orden = self.ordenes_activas[order_number]
-        progress = orden['progress']
-        time_label = orden['time_label']
-        total_time = orden['total_time']
-        start_time = orden['start_time']
+        self.programar_tick()
+        self.actualizar_progreso_visible()
+
+    def programar_tick(self):
+        """Agenda el siguiente tick si hay órdenes en preparación"""
+        if self.tick_programado is None and self.motor.plazos_ordenes:
+            self.tick_programado = self.window.after(self.INTERVALO_TICK_MS,
+                                                     self.tick_ordenes)
+
+    @medido("tick_ordenes")
+    def tick_ordenes(self):
+        """Único tick del ciclo principal para todas las órdenes activas.
+
+        Completa las órdenes cuyo plazo venció (montículo de plazos) y, si la
+        pestaña de pedidos activos está visible, actualiza sus barras.
+        """
+        self.tick_programado = None
+        ahora = time.time()
+        for order_number in self.motor.avanzar(ahora):
+            self.completar_orden(order_number)
         
-        while True:
-            if order_number not in self.ordenes_activas:
-                return
-                
-            if not progress.winfo_exists():
-                return
-                    
-            elapsed = time.time() - start_time
-            remaining = max(0, total_time - elapsed)
-            
-            try:
-                self.window.after(0, self.actualizar_progreso_ui, 
-                                progress, time_label, elapsed, remaining, total_time)
-                
-                if elapsed >= total_time:
-                    self.window.after(0, lambda: self.completar_orden(order_number))
-                    break
-                
-                time.sleep(0.1)
-            except tk.TclError:
-                # Widget fue destruido
-                break
+        try:
+            if self.notebook.index(self.notebook.select()) == 1:
+                self.actualizar_progreso_visible(ahora)
+        except tk.TclError:
+            return  # La ventana fue destruida
+        self.programar_tick()
+
+    def actualizar_progreso_visible(self, ahora=None):
+        if self.tablero_preparacion is not None:
+            self.tablero_preparacion.refrescar()
+            return
+        ahora = ahora or time.time()
+        for order_number in self.motor.en_preparacion():
+            tarjeta = self.tarjetas_ordenes.get(order_number)
+            if not tarjeta:
+                continue
+            elapsed, remaining, total_time, en_cola = self.motor.progreso(order_number, ahora)
+            self.actualizar_progreso_ui(tarjeta.progress, tarjeta.time_label,
+                                        elapsed, remaining, total_time,
+                                        eta=self.motor.ordenes_activas[order_number]['fin'],
+                                        en_cola=en_cola)
 
-    def actualizar_progreso_ui(self, progress, time_label, elapsed, remaining, total_time):
+    def actualizar_progreso_ui(self, progress, time_label, elapsed, remaining, total_time,
+                               eta=None, en_cola=False):
         if not progress.winfo_exists() or not time_label.winfo_exists():
             return
             
-        progress_value = min(100, (elapsed / total_time) * 100)
+        progress_value = min(100, (elapsed / total_time) * 100) if total_time else 100
         if abs(progress_value - progress['value']) >= 1:
             progress['value'] = progress_value
         
+        time_text = self.texto_tiempo(remaining, eta, en_cola)
+        if time_label['text'] != time_text:
+            time_label['text'] = time_text
+
+    @staticmethod
+    def texto_tiempo(remaining, eta=None, en_cola=False):
         minutes = int(remaining // 60)
         seconds = int(remaining % 60)
         time_text = f"Tiempo restante: {minutes:02d}:{seconds:02d}"
-        
-        if time_label['text'] != time_text:
-            time_label['text'] = time_text
+        if eta is not None:
+            estado = "En cola" if en_cola else "Listo"
+            time_text += f"  ({estado} aprox. {datetime.fromtimestamp(eta):%H:%M:%S})"
+        return time_text
+
+    def estado_progreso(self, order_number):
+        """(porcentaje, texto) de una orden en preparación, para PanelCanvas"""
+        elapsed, remaining, total_time, en_cola = self.motor.progreso(order_number)
+        porcentaje = min(100, (elapsed / total_time) * 100) if total_time else 100
+        eta = self.motor.ordenes_activas[order_number]['fin']
+        return porcentaje, self.texto_tiempo(remaining, eta, en_cola)
 
     def on_tab_change(self, event):
         current_tab = self.notebook.select()
         tab_index = self.notebook.index(current_tab)
         
         if tab_index == 1:
-            self.window.after(100, self.update_canvases)
+            self.actualizar_progreso_visible()
+            self.update_canvases("pestaña")
+        elif tab_index == 3:
+            self.mostrar_reportes()
 
     def conf_on_frame(self, event):
-        canvas = event.widget.master
-        canvas.configure(scrollregion=canvas.bbox("all"))
-        canvas.itemconfig("preparing_frame", width=canvas.winfo_width())
-        canvas.itemconfig("completed_frame", width=canvas.winfo_width())
+        self.layout.marcar(event.widget.master, "configure")
 
-    def update_canvases(self):
-        try:
-            if self.preparing_canvas and self.preparing_frame:
-                self.preparing_canvas.configure(scrollregion=self.preparing_canvas.bbox("all"))
-                self.preparing_canvas.itemconfig("preparing_frame", 
-                                            width=self.preparing_canvas.winfo_width())
-                
-            if self.completed_canvas and self.completed_frame:
-                self.completed_canvas.configure(scrollregion=self.completed_canvas.bbox("all"))
-                self.completed_canvas.itemconfig("completed_frame", 
-                                            width=self.completed_canvas.winfo_width())
-                
-            # Forzar actualización visual
-            self.window.update_idletasks()
-        except tk.TclError:
-            pass  # Ignorar errores si los widgets fueron destruidos
+    @medido("update_canvases")
+    def update_canvases(self, origen="actualizar"):
+        """Marca los canvas de pedidos para recalcularlos en el próximo cuadro"""
+        self.layout.marcar_todos(origen)
 
+    @medido("mover_acompletados")
     def mover_acompletados(self, order_number):
-        if order_number in self.ordenes_activas:
-            order = self.ordenes_activas[order_number]
-            original_frame = order['frame']
-            
-            # Crear nuevo frame en la sección de completados
-            completed_frame = ttk.LabelFrame(self.completed_frame, text=f"Pedido #{order_number}")
-            completed_frame.grid(sticky="ew", padx=5, pady=5)
-            completed_frame.grid_columnconfigure(0, weight=1)
-            
-            # Frame para el contenido
-            content_frame = ttk.Frame(completed_frame)
-            content_frame.grid(row=0, column=0, sticky="nsew", padx=10, pady=5)
-            content_frame.grid_columnconfigure(0, weight=1)
-            
-            # Mostrar las bebidas
-            for idx, bebida in enumerate(order['bebidas']):
-                bebida_frame = ttk.Frame(content_frame)
-                bebida_frame.grid(row=idx, column=0, sticky="ew")
-                bebida_frame.grid_columnconfigure(0, weight=1)
-                
-                ttk.Label(bebida_frame, text=str(bebida)).grid(
-                    row=0, column=0, sticky="w", pady=2)
-            
-            # Mensaje de completado
-            ttk.Label(content_frame, text="¡Pedido Completado!", 
-                    style="Header.TLabel").grid(
-                        row=len(order['bebidas']), column=0, sticky="ew", pady=5)
-            
-            # Botón eliminar
-            ttk.Button(content_frame, text="Eliminar",
-                    command=lambda num=order_number: self.remover_orden(num)).grid(
-                        row=len(order['bebidas'])+1, column=0, pady=5)
-            
-            # Actualizar la referencia del frame en ordenes_activas
-            order['frame'] = completed_frame
-            
-            # IMPORTANTE: Destruir el frame original DESPUÉS de crear el nuevo
-            original_frame.destroy()
+        if order_number in self.tarjetas_ordenes:
+            order = self.motor.ordenes_activas[order_number]
+            if self.tablero_listos is not None:
+                self.tablero_preparacion.quitar(order_number)
+                self.tablero_listos.agregar(order_number, order['bebidas'])
+                self.tarjetas_ordenes[order_number] = self.tablero_listos
+                return
+            # La tarjeta de Preparación vuelve a su pool; en Listos se
+            # reutiliza una libre
+            self.tarjetas_ordenes[order_number].soltar()
+            tarjeta = self.pool_listos.tomar()
+            tarjeta.mostrar(order_number, order['bebidas'], listo=True,
+                            al_eliminar=lambda num=order_number: self.remover_orden(num))
+            self.tarjetas_ordenes[order_number] = tarjeta
             
             # Actualizar los canvas para reflejar los cambios
-            self.window.after(100, self.update_canvases)
+            self.update_canvases("mover")
 
     def conf_nueva_orden_tab(self):
         # Frame configuration
@@ -814,11 +4213,7 @@ class SistemaPedidosCafeteria:
         # Variables
         self.drink_var = tk.StringVar()
         self.cantidad_var = tk.IntVar(value=1)
-        self.extra_vars = {
-            "Leche extra": tk.BooleanVar(),
-            "Shot extra de café": tk.BooleanVar(),
-            "Sirope de sabor": tk.BooleanVar()
-        }
+        self.extra_vars = {}
         
         # Configurar estilo para los elementos internos
         style = ttk.Style()
@@ -838,13 +4233,13 @@ class SistemaPedidosCafeteria:
         ttk.Label(order_panel, text="Bebida:", width=15, style="NewOrder.TLabel").grid(
             row=0, column=0, pady=5, padx=15)
 
-        drink_combo = ttk.Combobox(order_panel, 
+        self.drink_combo = ttk.Combobox(order_panel, 
                                 textvariable=self.drink_var,
-                                values=list(self.precio_bebidas.keys()),
+                                values=list(self.motor.precio_bebidas.keys()),
                                 width=30,
                                 font=('Segoe UI', 11),
                                 state="readonly")  
-        drink_combo.grid(row=0, column=1, pady=5, padx=15)
+        self.drink_combo.grid(row=0, column=1, pady=5, padx=15)
 
         # Quantity con texto más grande
         ttk.Label(order_panel, text="Cantidad:", width=15, style="NewOrder.TLabel").grid(
@@ -860,18 +4255,11 @@ class SistemaPedidosCafeteria:
         quantity_spin.grid(row=1, column=1, pady=5, padx=15)
         
         # Extras frame con texto 
-        extras_frame = ttk.LabelFrame(order_panel, text="Extras")
-        extras_frame.grid(row=2, column=0, columnspan=2, sticky="ew", pady=5, padx=15)
-        
-        extras_frame.grid_columnconfigure(0, weight=1)
+        self.extras_frame = ttk.LabelFrame(order_panel, text="Extras")
+        self.extras_frame.grid(row=2, column=0, columnspan=2, sticky="ew", pady=5, padx=15)
         
-        # Checkbuttons con texto 
-        for i, (extra, var) in enumerate(self.extra_vars.items()):
-            checkbutton = ttk.Checkbutton(extras_frame, 
-                                        text=extra, 
-                                        variable=var,
-                                        style="NewOrder.TCheckbutton")
-            checkbutton.grid(row=i, column=0, sticky="w", pady=2, padx=20)
+        self.extras_frame.grid_columnconfigure(0, weight=1)
+        self.mostrar_extras()
         
         # Configurar estilo para checkbuttons
         style.configure("NewOrder.TCheckbutton",
@@ -959,8 +4347,18 @@ class SistemaPedidosCafeteria:
         self.right_panel.grid(row=1, column=1, sticky="n", padx=10, pady=5)
         
         # Price menu panel
-        price_frame = ttk.LabelFrame(self.right_panel, text="Menú de Precios y Tiempos")
-        price_frame.grid(row=0, column=0, sticky="n", pady=(0,5))
+        self.price_frame = ttk.LabelFrame(self.right_panel, text="Menú de Precios y Tiempos")
+        self.price_frame.grid(row=0, column=0, sticky="n", pady=(0,5))
+        self.mostrar_menu_precios()
+
+    def mostrar_menu_precios(self):
+        """Llena el panel de precios con la versión actual del catálogo"""
+        price_frame = self.price_frame
+        for widget in price_frame.winfo_children():
+            widget.destroy()
+        catalogo = self.motor.catalogo
+        if catalogo.version:
+            price_frame.config(text=f"Menú de Precios y Tiempos (v{catalogo.version})")
         
         # Encabezados
         ttk.Label(price_frame, text="", style="Bold.TLabelframe.Label").grid(
@@ -975,8 +4373,8 @@ class SistemaPedidosCafeteria:
             row=1, column=2, sticky="e", padx=5)
         
         row = 2
-        for bebida, precio in self.precio_bebidas.items():
-            tiempo = self.tiempo_bebidas[bebida]
+        for bebida in catalogo.precio_bebidas:
+            precio, tiempo = catalogo.unitario(bebida)
             tiempo_str = f"{tiempo//60}:{tiempo%60:02d} min"
             
             ttk.Label(price_frame, text=bebida).grid(
@@ -992,8 +4390,8 @@ class SistemaPedidosCafeteria:
             row=row, column=0, columnspan=3, sticky="w", pady=(10,2))
         
         row += 1 
-        for extra, precio in self.precio_extra.items():
-            tiempo = self.tiempo_extra[extra]
+        for extra, precio in catalogo.precio_extra.items():
+            tiempo = catalogo.tiempo_extra[extra]
             tiempo_str = f"{tiempo//60}:{tiempo%60:02d} min"
             
             ttk.Label(price_frame, text=extra).grid(
@@ -1004,6 +4402,56 @@ class SistemaPedidosCafeteria:
                 row=row, column=2, sticky="e", padx=5)
             row += 1
 
+    def mostrar_extras(self):
+        """Un Checkbutton por extra del catálogo; conserva las selecciones vigentes"""
+        for widget in self.extras_frame.winfo_children():
+            widget.destroy()
+        anteriores = self.extra_vars
+        self.extra_vars = {}
+        for i, extra in enumerate(self.motor.precio_extra):
+            var = anteriores.get(extra) or tk.BooleanVar()
+            self.extra_vars[extra] = var
+            checkbutton = ttk.Checkbutton(self.extras_frame, 
+                                        text=extra, 
+                                        variable=var,
+                                        style="NewOrder.TCheckbutton")
+            checkbutton.grid(row=i, column=0, sticky="w", pady=2, padx=20)
+
+    def recargar_catalogo(self, avisar=False):
+        """Aplica un menú nuevo a los paneles y al carrito"""
+        try:
+            recargado, quitadas = self.motor.recargar_catalogo()
+        except (ValueError, OSError) as e:
+            print(f"Error al cargar el menú: {e}")
+            if avisar:
+                messagebox.showerror("Error", f"Error al cargar el menú: {str(e)}")
+            return
+        if recargado:
+            self.mostrar_menu_precios()
+            self.drink_combo.config(values=list(self.motor.precio_bebidas.keys()))
+            if self.drink_var.get() not in self.motor.precio_bebidas:
+                self.drink_var.set('')
+            self.mostrar_extras()
+            self.actualizar_carrito()
+        if quitadas:
+            messagebox.showwarning(
+                "Menú actualizado",
+                "Se quitaron del carrito productos que ya no están en el menú:\n\n"
+                + "\n".join(str(b) for b in quitadas))
+        elif avisar:
+            messagebox.showinfo("Menú",
+                                f"Menú versión {self.motor.catalogo.version}"
+                                + ("" if recargado else " (sin cambios)"))
+
+    def revisar_catalogo(self):
+        try:
+            self.recargar_catalogo()
+        except Exception as e:
+            print(f"Error al aplicar el menú: {e}")
+        finally:
+            # Un error no debe detener la revisión periódica
+            self.window.after(self.INTERVALO_CATALOGO_MS, self.revisar_catalogo)
+
     def setup_info_panel(self):
         """Configura el panel de información con fecha, hora y ubicación"""
         info_frame = ttk.LabelFrame(self.right_panel, text="Información")
@@ -1032,6 +4480,62 @@ class SistemaPedidosCafeteria:
         direccion_text = "Bv. Adolfo Ruiz Cortines, Mar de Cortes    \n y Costa Dorada, Col: Costa Verde\n CP: 94294"
         ttk.Label(info_frame, text=direccion_text).grid(
             row=5, column=0, columnspan=2, sticky="w", padx=5, pady=2)
+        
+        # Acumulados de venta del día y del turno
+        ttk.Label(info_frame, text="Ventas de hoy:",
+                style="Bold.TLabelframe.Label").grid(
+            row=6, column=0, columnspan=2, sticky="w", padx=5, pady=(10,2))
+        self.ventas_dia_label = ttk.Label(info_frame, text="", justify="left")
+        self.ventas_dia_label.grid(row=7, column=0, columnspan=2, sticky="w", padx=5, pady=2)
+        
+        self.turno_titulo_label = ttk.Label(info_frame, text="",
+                style="Bold.TLabelframe.Label")
+        self.turno_titulo_label.grid(
+            row=8, column=0, columnspan=2, sticky="w", padx=5, pady=(10,2))
+        self.ventas_turno_label = ttk.Label(info_frame, text="", justify="left")
+        self.ventas_turno_label.grid(row=9, column=0, columnspan=2, sticky="w", padx=5, pady=2)
+        
+        ttk.Button(info_frame, text="Cerrar Turno",
+                command=self.cerrar_turno).grid(row=10, column=0, columnspan=2, pady=5)
+        self.actualizar_info_ventas()
+
+    def texto_acumulado(self, acumulado):
+        if not acumulado.ordenes:
+            return "Sin ventas"
+        lineas = [
+            f"{acumulado.ordenes} órdenes · ${acumulado.ingresos:.2f}",
+            f"Promedio ${acumulado.promedio:.2f} "
+            f"(mín ${acumulado.minimo:.2f}, máx ${acumulado.maximo:.2f})"
+        ]
+        lineas += [f"  {tipo}: {unidades}" for tipo, unidades
+                   in sorted(acumulado.por_bebida.items(), key=lambda x: -x[1])]
+        if acumulado.por_extra:
+            lineas.append("Extras: " + ", ".join(
+                f"{extra} {unidades}" for extra, unidades in acumulado.por_extra.items()))
+        return "\n".join(lineas)
+
+    def actualizar_info_ventas(self):
+        acumulados = self.motor.acumulados
+        acumulados.al_dia(datetime.now())
+        self.ventas_dia_label.config(text=self.texto_acumulado(acumulados.dia))
+        self.turno_titulo_label.config(
+            text=f"Turno actual (desde {acumulados.turno.inicio:%H:%M}):")
+        self.ventas_turno_label.config(text=self.texto_acumulado(acumulados.turno))
+
+    def cerrar_turno(self):
+        """Cierre de turno: congela los números del turno y abre uno nuevo"""
+        turno = self.motor.acumulados.turno
+        if not messagebox.askyesno(
+                "Cerrar Turno",
+                f"¿Cerrar el turno iniciado a las {turno.inicio:%H:%M}?\n\n"
+                + self.texto_acumulado(turno)):
+            return
+        cerrado = self.motor.cerrar_turno()
+        self.actualizar_info_ventas()
+        messagebox.showinfo(
+            "Turno cerrado",
+            f"Turno {cerrado.inicio:%d/%m %H:%M} - {cerrado.cierre:%H:%M}\n\n"
+            + self.texto_acumulado(cerrado))
 
     def actualizar_tiempo(self):
         """Actualiza la hora en tiempo real"""
@@ -1042,11 +4546,13 @@ class SistemaPedidosCafeteria:
 
     def remover_orden(self, order_number):
         """Método para remover órdenes"""
-        if order_number in self.ordenes_activas:
-            if self.ordenes_activas[order_number]['frame'].winfo_exists():
-                self.ordenes_activas[order_number]['frame'].destroy()
-            del self.ordenes_activas[order_number]
-            self.update_canvases()
+        self.motor.remover(order_number)
+        tarjeta = self.tarjetas_ordenes.pop(order_number, None)
+        if isinstance(tarjeta, PanelCanvas):
+            tarjeta.quitar(order_number)
+        elif tarjeta:
+            tarjeta.soltar()
+            self.update_canvases("remover")
 
     def limpiar_filtros(self):
         self.fecha_filtro.set_date(datetime.now())
@@ -1057,8 +4563,7 @@ class SistemaPedidosCafeteria:
         ticket_id = tk.simpledialog.askstring("Buscar Ticket", 
                                             "Ingrese el ID del ticket:")
         if ticket_id:
-            ticket = next((t for t in self.tickets if t.ticket_id == ticket_id.upper()), 
-                         None)
+            ticket = self.almacen.obtener(GeneradorIds.normalizar(ticket_id))
             if ticket:
                 self.mostrar_detalle_ticket(ticket)
             else:
@@ -1066,54 +4571,306 @@ class SistemaPedidosCafeteria:
                                      "No se encontró el ticket especificado")
 
     def exportar_tickets(self):
-        filename = filedialog.asksaveasfilename(
-            defaultextension=".json",
-            filetypes=[("JSON files", "*.json")]
-        )
-        if filename:
+        """Ventana de exportación: alcance, formato, progreso y cancelación"""
+        if self.exportacion is not None:
+            messagebox.showinfo("Exportar", "Ya hay una exportación en curso")
+            return
+        ventana = tk.Toplevel(self.window)
+        ventana.title("Exportar Tickets")
+        ventana.resizable(False, False)
+        
+        opciones = ttk.Frame(ventana, padding=10)
+        opciones.pack(fill="x")
+        alcance_var = tk.StringVar(value="todo")
+        ttk.Radiobutton(opciones, text="Todo el historial", value="todo",
+                        variable=alcance_var).grid(row=0, column=0, columnspan=4, sticky="w")
+        ttk.Radiobutton(opciones, text="Filtro actual del historial", value="filtro",
+                        variable=alcance_var).grid(row=1, column=0, columnspan=4, sticky="w")
+        ttk.Radiobutton(opciones, text="Rango de fechas:", value="rango",
+                        variable=alcance_var).grid(row=2, column=0, sticky="w")
+        fechas = []
+        for columna, texto in ((1, "Desde"), (3, "Hasta")):
+            ttk.Label(opciones, text=texto).grid(row=2, column=columna, padx=(10, 2))
+            fecha = tkcalendar.DateEntry(opciones, width=12, date_pattern='dd/mm/yyyy',
+                                         state='readonly', locale='es_MX',
+                                         showweeknumbers=False, firstweekday='monday')
+            fecha.grid(row=2, column=columna + 1)
+            fechas.append(fecha)
+        
+        ttk.Label(opciones, text="Formato:").grid(row=3, column=0, sticky="w", pady=(10, 0))
+        formato_var = tk.StringVar(value=FORMATOS_EXPORTACION["jsonl"])
+        ttk.Combobox(opciones, textvariable=formato_var, state="readonly", width=12,
+                     values=list(FORMATOS_EXPORTACION.values())).grid(
+            row=3, column=1, columnspan=2, sticky="w", pady=(10, 0))
+        gzip_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(opciones, text="Comprimir (gzip)", variable=gzip_var).grid(
+            row=3, column=3, columnspan=2, sticky="w", pady=(10, 0))
+        
+        progreso = ttk.Progressbar(ventana, length=360, mode="determinate")
+        progreso.pack(padx=10, pady=(5, 0))
+        estado = ttk.Label(ventana, text="")
+        estado.pack(padx=10, pady=2)
+        botones = ttk.Frame(ventana, padding=(10, 0, 10, 10))
+        botones.pack(fill="x")
+        
+        def origen():
+            """Iterable de tickets y total estimado para la barra de progreso.
+
+            Se llama en el hilo de la interfaz: iterar fija aquí lo que
+            recorrerá el hilo de exportación, aunque después se sigan
+            confirmando ventas o fusionando días en los índices.
+            """
+            alcance = alcance_var.get()
+            if alcance == "filtro" and self.historial_lista is not None:
+                return list(self.historial_lista), len(self.historial_lista)
+            if alcance == "rango":
+                desde, hasta = (datetime.combine(f.get_date(), datetime.min.time())
+                                for f in fechas)
+                if desde > hasta:
+                    raise ValueError("La fecha inicial es posterior a la final")
+                hasta += timedelta(days=1)
+                return self.almacen.iterar(desde, hasta), self.almacen.contar_rango(desde, hasta)
+            return self.almacen.iterar(), self.almacen.contar()
+        
+        def iniciar():
+            formato = next(clave for clave, nombre in FORMATOS_EXPORTACION.items()
+                           if nombre == formato_var.get())
+            extension = "." + formato + (".gz" if gzip_var.get() else "")
+            ruta = filedialog.asksaveasfilename(
+                parent=ventana, defaultextension=extension,
+                filetypes=[(formato_var.get(), "*" + extension), ("Todos", "*.*")])
+            if not ruta:
+                return
+            try:
+                tickets, total = origen()
+            except ValueError as e:
+                messagebox.showwarning("Exportar", str(e), parent=ventana)
+                return
+            cancelar = self.exportacion = threading.Event()
+            avance = queue.Queue()
+            progreso.config(maximum=max(total, 1), value=0)
+            exportar_boton.config(state="disabled")
+            cancelar_boton.config(state="normal")
+            
+            def exportar():
+                try:
+                    escritos = exportar_flujo(tickets, ruta, formato, cancelar,
+                                              progreso=lambda n: avance.put(('avance', n)))
+                    avance.put(('fin', escritos))
+                except Exception as e:
+                    avance.put(('error', e))
+            
+            def revisar():
+                mensaje = None
+                while True:
+                    try:
+                        mensaje = avance.get_nowait()
+                    except queue.Empty:
+                        break
+                    if mensaje[0] != 'avance':
+                        break
+                    if ventana.winfo_exists():
+                        progreso.config(value=min(mensaje[1], total))
+                        estado.config(text=f"{mensaje[1]} de {total} tickets")
+                if mensaje is None or mensaje[0] == 'avance':
+                    self.window.after(self.INTERVALO_CARGA_MS, revisar)
+                    return
+                self.exportacion = None
+                if not ventana.winfo_exists():
+                    return
+                cancelar_boton.config(state="disabled")
+                exportar_boton.config(state="normal")
+                if mensaje[0] == 'error':
+                    estado.config(text="")
+                    messagebox.showerror("Error", f"Error al exportar tickets: {mensaje[1]}",
+                                         parent=ventana)
+                elif mensaje[1] is None:
+                    estado.config(text="Exportación cancelada")
+                else:
+                    estado.config(text=f"{mensaje[1]} tickets exportados")
+                    messagebox.showinfo("Éxito", "Tickets exportados correctamente",
+                                        parent=ventana)
+            
+            estado.config(text="Exportando...")
+            threading.Thread(target=exportar, daemon=True).start()
+            self.window.after(self.INTERVALO_CARGA_MS, revisar)
+        
+        def cerrar():
+            if self.exportacion is not None:
+                self.exportacion.set()
+            ventana.destroy()
+        
+        exportar_boton = ttk.Button(botones, text="Exportar...", command=iniciar)
+        exportar_boton.pack(side="left", padx=5)
+        cancelar_boton = ttk.Button(botones, text="Cancelar", state="disabled",
+                                    command=lambda: self.exportacion and self.exportacion.set())
+        cancelar_boton.pack(side="left", padx=5)
+        ttk.Button(botones, text="Cerrar", command=cerrar).pack(side="right", padx=5)
+        ventana.protocol("WM_DELETE_WINDOW", cerrar)
+
+    def importar_tickets(self):
+        """Combina archivos exportados (de esta u otras cajas) con el historial.
+
+        Un hilo lee y valida los archivos por lotes; cada lote se combina con
+        el almacén desde el ciclo de Tk, uno por vuelta, para no congelar la
+        ventana. La cola acotada mantiene la memoria fija. Los lotes esperan
+        a que termine la carga del historial, que es la que llena el índice
+        contra el que se buscan los IDs repetidos.
+        
+        Mientras dura, los umbrales del recolector de ciclos se suben a
+        UMBRALES_GC_IMPORTACION: con cientos de miles de tickets en memoria,
+        las pasadas frecuentes congelaban la ventana. Los de antes se
+        restauran al terminar, por cualquier vía.
+        """
+        if self.importacion is not None:
+            messagebox.showinfo("Importar", "Ya hay una importación en curso")
+            return
+        rutas = filedialog.askopenfilenames(
+            filetypes=[("Tickets exportados", "*.json *.jsonl *.json.gz *.jsonl.gz"),
+                       ("Todos", "*.*")])
+        if not rutas:
+            return
+        ventana = tk.Toplevel(self.window)
+        ventana.title("Importar Tickets")
+        ventana.resizable(False, False)
+        ttk.Label(ventana, text=f"{len(rutas)} archivo(s)").pack(padx=10, pady=(10, 2))
+        progreso = ttk.Progressbar(ventana, length=360, mode="indeterminate")
+        progreso.pack(padx=10, pady=5)
+        estado = ttk.Label(ventana, text="Leyendo...")
+        estado.pack(padx=10, pady=2)
+        cancelar = self.importacion = threading.Event()
+        cancelar_boton = ttk.Button(ventana, text="Cancelar", command=cancelar.set)
+        cancelar_boton.pack(pady=(5, 10))
+        ventana.protocol("WM_DELETE_WINDOW", cancelar.set)
+        progreso.start()
+        
+        lotes = queue.Queue(maxsize=4)
+        informe = {'insertados': 0, 'omitidos': 0, 'conflictos': 0, 'invalidos': 0,
+                   'ids_conflicto': []}
+        
+        def leer():
             try:
-                with open(filename, 'w') as f:
-                    json.dump([t.to_dict() for t in self.tickets], f, indent=4)
-                messagebox.showinfo("Éxito", "Tickets exportados correctamente")
+                for tickets, invalidos in lotes_importacion(rutas, lote=1000):
+                    # Lo que no depende del historial se calcula aquí, no en Tk
+                    lote = (tickets, invalidos, self.almacen.preparar_combinar(tickets))
+                    while not cancelar.is_set():
+                        try:
+                            lotes.put(('lote', lote), timeout=0.1)
+                            break
+                        except queue.Full:
+                            pass
+                    if cancelar.is_set():
+                        break
+                lotes.put(('fin', None))
             except Exception as e:
-                messagebox.showerror("Error", f"Error al exportar tickets: {str(e)}")
+                lotes.put(('error', e))
+        
+        def revisar():
+            sigue = False
+            try:
+                sigue = procesar()
+            finally:
+                if not sigue:
+                    gc.set_threshold(*umbrales)
+        
+        def procesar():
+            """Una vuelta del ciclo de Tk; devuelve si la importación sigue"""
+            if not self.historial_cargado and not cancelar.is_set():
+                estado.config(text="Esperando a que termine de cargar el historial...")
+                self.window.after(self.INTERVALO_CARGA_MS, revisar)
+                return True
+            try:
+                tipo, contenido = lotes.get_nowait()
+            except queue.Empty:
+                self.window.after(self.INTERVALO_CARGA_MS, revisar)
+                return True
+            if tipo == 'lote' and not cancelar.is_set():
+                tickets, invalidos, preparado = contenido
+                try:
+                    insertados, omitidos, conflictos = self.motor.importar_lote(tickets,
+                                                                                preparado)
+                except Exception as e:
+                    tipo, contenido = 'error', e
+                else:
+                    sumar_informe(informe, insertados, omitidos, conflictos, invalidos)
+                    if self.ventas is not None:
+                        self.ventas.extender(insertados)
+                    elif self.ventas_pendientes is not None:
+                        self.ventas_pendientes.extend(insertados)
+                    estado.config(text=f"{informe['insertados']} insertados, "
+                                       f"{informe['omitidos']} omitidos, "
+                                       f"{informe['conflictos']} en conflicto")
+            if tipo == 'lote':
+                self.window.after(1, revisar)
+                return True
+            # Terminó, falló o se canceló
+            if tipo == 'error':
+                cancelar.set()  # Detiene al hilo lector si sigue leyendo
+            gc.set_threshold(*umbrales)  # Sin esperar a que se cierren los avisos
+            self.importacion = None
+            ventana.destroy()
+            if self.historial_filtro is None:
+                self.actualizar_lista_tickets()
+            else:
+                self.filtrar_tickets()
+            self.actualizar_info_ventas()
+            if self.ventas is not None and self.notebook.index(self.notebook.select()) == 3:
+                self.actualizar_reporte()
+            resumen = (f"Insertados: {informe['insertados']}\n"
+                       f"Omitidos (ya existían): {informe['omitidos']}\n"
+                       f"En conflicto: {informe['conflictos']}\n"
+                       f"Registros inválidos: {informe['invalidos']}")
+            if informe['ids_conflicto']:
+                resumen += "\n\nIDs en conflicto:\n" + ", ".join(informe['ids_conflicto'][:10])
+            if tipo == 'error':
+                messagebox.showerror("Error", f"Error al importar tickets: {contenido}\n\n"
+                                     + resumen)
+            elif cancelar.is_set():
+                messagebox.showwarning("Importación cancelada", resumen)
+            else:
+                messagebox.showinfo("Importación terminada", resumen)
+            return False
+        
+        umbrales = gc.get_threshold()
+        gc.set_threshold(*(max(actual, importacion) for actual, importacion
+                           in zip(umbrales, self.UMBRALES_GC_IMPORTACION)))
+        try:
+            threading.Thread(target=leer, daemon=True).start()
+            self.window.after(self.INTERVALO_CARGA_MS, revisar)
+        except Exception:
+            gc.set_threshold(*umbrales)
+            raise
 
     def completar_orden(self, order_number):
-        """Método para manejar la completación de órdenes"""
-        if order_number in self.ordenes_activas:
+        """Muestra en Listos una orden que el motor ya completó"""
+        if order_number in self.tarjetas_ordenes:
             # Mover a completados
             self.mover_acompletados(order_number)
             # Reproducir sonido
             self.window.bell()
             # Actualizar los canvas
-            self.update_canvases()
+            self.update_canvases("completar")
 
     def confirmar_orden(self):
-        if not self.bebidas_en_carrito:
+        if not self.motor.carrito:
             messagebox.showwarning("Advertencia", "El carrito está vacío")
             return
         
-        total = sum(bebida.calcular_subtotal(self.precio_bebidas, self.precio_extra) 
-                   for bebida in self.bebidas_en_carrito)
+        subtotales = [(bebida, self.motor.subtotal(bebida)) for bebida in self.motor.carrito]
+        total = sum(subtotal for _, subtotal in subtotales)
         
         confirm_msg = "¿Confirmar pedido?\n\n"
-        for i, bebida in enumerate(self.bebidas_en_carrito, 1):
-            subtotal = bebida.calcular_subtotal(self.precio_bebidas, self.precio_extra)
+        for i, (bebida, subtotal) in enumerate(subtotales, 1):
             confirm_msg += f"{i}. {bebida}\n   Subtotal: ${subtotal:.2f}\n\n"
         confirm_msg += f"\nTotal: ${total:.2f}"
         
         if messagebox.askyesno("Confirmar Pedido", confirm_msg):
-            # Generar ticket antes de crear la orden
-            ticket = self.generar_ticket(self.contador_orden, 
-                                       self.bebidas_en_carrito.copy(), 
-                                       total)
-            
-            # Crear la orden
-            self.crear_orden()
-            
-            # Limpiar carrito
-            self.bebidas_en_carrito = []
-            self.actualizar_carrito()
+            # El motor genera el ticket, crea la orden y vacía el carrito
+            with METRICAS.medir("confirmar_orden"):
+                ticket = self.motor.confirmar()
+                self.crear_tarjeta_orden(ticket.orden_id)
+                self.programar_tick()
+                self.actualizar_carrito()
             
             # Mostrar mensaje de éxito con información del ticket
             success_msg = f"¡Pedido creado exitosamente!\n\nTicket #{ticket.ticket_id}"
@@ -1124,17 +4881,98 @@ class SistemaPedidosCafeteria:
                                  "¿Desea ver el detalle del ticket?"):
                 self.mostrar_detalle_ticket(ticket)
             
-            # Actualizar lista de tickets
-            self.actualizar_lista_tickets()
+            # Agregar solo la fila del nuevo ticket al historial
+            self.agregar_fila_historial(ticket)
+            self.registrar_venta(ticket)
+            self.actualizar_info_ventas()
             
             # Cambiar a la pestaña de pedidos activos
             self.notebook.select(1)
 
     def salir(self):
         # Guardar tickets antes de salir
-        self.guardar_tickets()
+        try:
+            self.almacen.cerrar()
+        except Exception as e:
+            print(f"Error al guardar tickets: {e}")
+        if METRICAS.activa:
+            try:
+                METRICAS.volcar(os.path.join(self.tickets_dir, "metricas.json"))
+            except Exception as e:
+                print(f"Error al guardar métricas: {e}")
+        if self.monitor:
+            self.monitor.detener()
         self.window.quit()
 
+    def mostrar_diagnostico(self):
+        """Ventana con los percentiles de cada tramo y los contadores"""
+        ventana = tk.Toplevel(self.window)
+        ventana.title("Diagnóstico")
+        ventana.geometry("640x420")
+        
+        controles = ttk.Frame(ventana)
+        controles.pack(fill="x", padx=10, pady=5)
+        activa_var = tk.BooleanVar(value=METRICAS.activa)
+        
+        texto = tk.Text(ventana, font=("Courier", 9), wrap="none")
+        texto.pack(expand=True, fill="both", padx=10, pady=(0, 10))
+        
+        def mostrar():
+            resumen = METRICAS.resumen()
+            lineas = [f"{'Tramo':28} {'n':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'máx':>8}  (ms)"]
+            for nombre, datos in resumen['tramos'].items():
+                lineas.append(f"{nombre:28} {datos['n']:>7} {datos['p50_ms']:8.2f} "
+                              f"{datos['p95_ms']:8.2f} {datos['p99_ms']:8.2f} "
+                              f"{datos['max_ms']:8.2f}")
+            lineas.append("")
+            lineas.append("Contadores")
+            for nombre, valor in resumen['contadores'].items():
+                lineas.append(f"{nombre:28} {valor:>10}")
+            if self.monitor:
+                latencia = self.monitor.resumen()
+                lineas.append("")
+                lineas.append(f"Retraso del ciclo de Tk (ms): p50 {latencia['p50_ms']:.1f}  "
+                              f"p95 {latencia['p95_ms']:.1f}  p99 {latencia['p99_ms']:.1f}  "
+                              f"máx {latencia['max_ms']:.1f}")
+                lineas.append(f"Bloqueos de más de {self.monitor.UMBRAL * 1000:.0f} ms: "
+                              f"{len(latencia['bloqueos'])}")
+                for bloqueo in latencia['bloqueos'][-10:]:
+                    lineas.append(f"  {bloqueo['fecha'][11:]} {bloqueo['duracion_ms']:8.1f} ms  "
+                                  f"{bloqueo['manejador'] or '?'} -> {bloqueo['en'] or '?'}")
+            if not METRICAS.activa:
+                lineas.append("")
+                lineas.append("La instrumentación está apagada.")
+            texto.config(state="normal")
+            texto.delete(1.0, tk.END)
+            texto.insert(tk.END, "\n".join(lineas))
+            texto.config(state="disabled")
+        
+        def cambiar_activa():
+            METRICAS.activa = activa_var.get()
+            mostrar()
+        
+        def reiniciar():
+            METRICAS.reiniciar()
+            mostrar()
+        
+        def guardar():
+            ruta = filedialog.asksaveasfilename(
+                parent=ventana, defaultextension=".json",
+                filetypes=[("JSON files", "*.json")])
+            if ruta:
+                try:
+                    METRICAS.volcar(ruta)
+                except Exception as e:
+                    messagebox.showerror("Error", f"Error al guardar métricas: {str(e)}",
+                                         parent=ventana)
+        
+        ttk.Checkbutton(controles, text="Instrumentación activa", variable=activa_var,
+                        command=cambiar_activa).pack(side="left", padx=5)
+        ttk.Button(controles, text="Actualizar", command=mostrar).pack(side="left", padx=5)
+        ttk.Button(controles, text="Reiniciar", command=reiniciar).pack(side="left", padx=5)
+        ttk.Button(controles, text="Guardar...", command=guardar).pack(side="left", padx=5)
+        mostrar()
+
     def mostrar_creditos(self):
         credits_text = """
 SISTEMA DE PEDIDOS PARA CAFETERÍA
@@ -1158,8 +4996,32 @@ Facultad de Ingeniería Eléctrica y Electrónica
 """
         messagebox.showinfo("Créditos", credits_text)
 
+    @staticmethod
+    def texto_duracion(segundos):
+        """Duración legible: 3 minutos, 30 segundos, 1 minuto 30 segundos"""
+        minutos, segundos = divmod(int(round(segundos)), 60)
+        partes = []
+        if minutos:
+            partes.append(f"{minutos} minuto{'s' if minutos != 1 else ''}")
+        if segundos or not minutos:
+            partes.append(f"{segundos} segundo{'s' if segundos != 1 else ''}")
+        return " ".join(partes)
+
+    def texto_menu_ayuda(self):
+        """Precios y tiempos del catálogo cargado, no de una lista fija"""
+        catalogo = self.motor.catalogo
+        lineas = ["   Bebidas:"]
+        for nombre, precio in catalogo.precio_bebidas.items():
+            tiempo = self.texto_duracion(catalogo.tiempo_bebidas[nombre])
+            lineas.append(f"   - {nombre}: ${precio:.2f}, {tiempo}")
+        lineas += ["", "   Extras:"]
+        for nombre, precio in catalogo.precio_extra.items():
+            tiempo = self.texto_duracion(catalogo.tiempo_extra[nombre])
+            lineas.append(f"   - {nombre}: +${precio:.2f}, +{tiempo}")
+        return "\n".join(lineas)
+
     def mostrar_ayuda(self):
-        texto_ayuda = """
+        texto_ayuda = f"""
 SISTEMA DE PEDIDOS PARA CAFETERÍA - GUÍA DE USO
 
 1. REALIZAR UN NUEVO PEDIDO:
@@ -1170,17 +5032,8 @@ SISTEMA DE PEDIDOS PARA CAFETERÍA - GUÍA DE USO
    - Puede agregar más bebidas repitiendo el proceso
    - Cuando termine, presione "Crear Pedido"
 
-2. TIEMPOS DE PREPARACIÓN:
-   Bebidas:
-   - Café Americano: 3 minutos
-   - Cappuccino: 5 minutos
-   - Latte: 4 minutos
-   - Té: 2 minutos
-
-   Extras:
-   - Leche extra: +1 minuto
-   - Shot extra de café: +2 minutos
-   - Sirope de sabor: +30 segundos
+2. PRECIOS Y TIEMPOS DE PREPARACIÓN (por unidad):
+{self.texto_menu_ayuda()}
 
 3. SEGUIMIENTO DE PEDIDOS:
    - Los pedidos en preparación muestran una barra de progreso
@@ -1197,9 +5050,23 @@ SISTEMA DE PEDIDOS PARA CAFETERÍA - GUÍA DE USO
 
     def run(self):
         self.window.protocol("WM_DELETE_WINDOW", self.salir)
+        if self.monitor:
+            self.monitor.iniciar()
         self.window.mainloop()
 
 if __name__ == "__main__":
-    app = SistemaPedidosCafeteria()
-    app.run() 
+    parser = argparse.ArgumentParser(description="Sistema de Pedidos - Cafetería")
+    parser.add_argument("--simular", metavar="ARCHIVO",
+                        help="simula sin interfaz un flujo de pedidos en JSON")
+    parser.add_argument("--estaciones", type=int, default=2)
+    parser.add_argument("--politica", choices=PlanificadorCocina.POLITICAS,
+                        help="política de la cola (por defecto se comparan todas)")
+    args = parser.parse_args()
+    if args.simular:
+        politicas = [args.politica] if args.politica else PlanificadorCocina.POLITICAS
+        for resultado in simular_archivo(args.simular, args.estaciones, politicas):
+            print(json.dumps(resultado, indent=4))
+    else:
+        app = SistemaPedidosCafeteria()
+        app.run()
 
@@ -0,0 +1,199 @@
+"""Benchmarks del historial de tickets.
+
+Genera historiales sintéticos y mide carga, guardado, serialización,
+filtros, búsqueda por ID de cada almacén y la memoria máxima del JSON.
+
+Uso:
+    python benchmark_tickets.py                              # 1k y 100k tickets
+    python benchmark_tickets.py --tamanos 1000 100000 1000000
+    python benchmark_tickets.py --almacen json sqlite --salida base.json
+    python benchmark_tickets.py --comparar base.json --tolerancia 0.2
+"""
+import argparse
+import json
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from Equipo_3_Actividad_15 import (ALMACENES_TICKETS, PRECIO_BEBIDAS, PRECIO_EXTRA,
+                                   BebidaPersonalizada, GeneradorIds,
+                                   SistemaPedidosCafeteria, Ticket)
+
+TAMANOS = (1000, 100000)
+CONSULTAS = 200
+# Términos que aparecen en el menú generado y uno que no coincide con nada
+BUSQUEDAS = ("cappuccino", "leche", "sirope", "shot", "mocha")
+
+def generar_tickets(cantidad, dias=90, semilla=0):
+    """Historial realista: varios días, órdenes de 1 a 4 bebidas con extras"""
+    azar = random.Random(semilla)
+    bebidas = list(PRECIO_BEBIDAS)
+    extras = list(PRECIO_EXTRA)
+    fin = datetime.now()
+    inicio = fin - timedelta(days=dias)
+    paso = (fin - inicio) / cantidad
+    tickets = []
+    orden_id = 0
+    # Los mismos IDs que la aplicación: 32 bits al azar chocan con un
+    # millón de tickets y combinar/agregar los trataría como la misma venta
+    generador = GeneradorIds(caja=semilla)
+    for i in range(cantidad):
+        timestamp = inicio + paso * i
+        orden_id = 1 if i and timestamp.date() != tickets[-1].timestamp.date() else orden_id + 1
+        pedido = [BebidaPersonalizada(azar.choice(bebidas), azar.randint(1, 3),
+                                      azar.sample(extras, azar.randint(0, 2)))
+                  for _ in range(azar.randint(1, 4))]
+        total = sum(b.calcular_subtotal(PRECIO_BEBIDAS, PRECIO_EXTRA) for b in pedido)
+        tickets.append(Ticket(orden_id, pedido, total, timestamp=timestamp,
+                              ticket_id=generador.nuevo(timestamp)))
+    return tickets
+
+def medir(funcion, repeticiones=1):
+    """Segundos por llamada (el mejor de varias repeticiones)"""
+    mejor = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        duracion = time.perf_counter() - inicio
+        mejor = duracion if mejor is None else min(mejor, duracion)
+    return mejor
+
+def memoria_maxima(funcion):
+    tracemalloc.start()
+    try:
+        funcion()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def medir_almacen(tipo, tickets, azar):
+    """Métricas de un almacén con el historial dado; tiempos en segundos"""
+    resultado = {}
+    clase = ALMACENES_TICKETS[tipo]
+    resultado['to_dict_s'] = medir(lambda: [t.to_dict() for t in tickets], 3)
+    diccionarios = [t.to_dict() for t in tickets]
+    resultado['from_dict_s'] = medir(
+        lambda: [Ticket.from_dict(d) for d in diccionarios], 3)
+
+    with tempfile.TemporaryDirectory() as directorio:
+        almacen = clase(directorio)
+        almacen.abrir()
+
+        def guardar():
+            for ticket in tickets:
+                almacen.agregar(ticket)
+            almacen.cerrar()  # Incluye vaciar la cola de escritura pendiente
+        resultado['guardar_s'] = medir(guardar)
+
+        def cargar_todo():
+            otro = clase(directorio)
+            otro.abrir()
+            otro.cerrar()
+        resultado['cargar_s'] = medir(cargar_todo)
+        hoy = datetime.combine(datetime.now().date(), datetime.min.time())
+
+        def cargar_hoy():
+            otro = clase(directorio)
+            otro.abrir(desde=hoy)
+            otro.cerrar()
+        resultado['cargar_hoy_s'] = medir(cargar_hoy, 3)
+        if tipo == "json":
+            # SQLite guarda el historial en su caché de páginas, memoria de C
+            # que tracemalloc no ve: la cifra saldría casi en cero
+            resultado['memoria_carga_bytes'] = memoria_maxima(cargar_todo)
+
+        almacen = clase(directorio)
+        almacen.abrir()
+        muestra = azar.sample(tickets, min(CONSULTAS, len(tickets)))
+        fechas = [t.timestamp.date() for t in muestra]
+        resultado['filtrar_fecha_ms'] = medir(
+            lambda: [almacen.filtrar(f) for f in fechas], 3) * 1000 / len(fechas)
+        resultado['filtrar_texto_ms'] = medir(
+            lambda: [almacen.filtrar(f, BUSQUEDAS[i % len(BUSQUEDAS)])
+                     for i, f in enumerate(fechas)], 3) * 1000 / len(fechas)
+        resultado['filtrar_id_ms'] = medir(
+            lambda: [almacen.filtrar(t.timestamp.date(), t.ticket_id[2:])
+                     for t in muestra], 3) * 1000 / len(muestra)
+        resultado['obtener_us'] = medir(
+            lambda: [almacen.obtener(t.ticket_id) for t in muestra],
+            repeticiones=5) * 1e6 / len(muestra)
+        paginas = max(1, len(tickets) // SistemaPedidosCafeteria.TICKETS_POR_PAGINA)
+        desplazamientos = [azar.randrange(paginas) * SistemaPedidosCafeteria.TICKETS_POR_PAGINA
+                           for _ in range(CONSULTAS)]
+        resultado['pagina_ms'] = medir(
+            lambda: [almacen.recientes(d, SistemaPedidosCafeteria.TICKETS_POR_PAGINA)
+                     for d in desplazamientos], 3) * 1000 / len(desplazamientos)
+        almacen.cerrar()
+    return resultado
+
+def ejecutar(tamanos, almacenes, semilla=0):
+    resultados = {}
+    for cantidad in tamanos:
+        print(f"Generando {cantidad} tickets...", file=sys.stderr)
+        tickets = generar_tickets(cantidad, semilla=semilla)
+        for tipo in almacenes:
+            print(f"  {tipo}...", file=sys.stderr)
+            resultados.setdefault(tipo, {})[str(cantidad)] = medir_almacen(
+                tipo, tickets, random.Random(semilla))
+    return {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'resultados': resultados
+    }
+
+def comparar(actual, base, tolerancia):
+    """Imprime la razón actual/base de cada métrica; devuelve las regresiones"""
+    regresiones = []
+    print(f"{'almacén':8} {'tickets':>8} {'métrica':20} {'base':>12} {'actual':>12} {'razón':>7}")
+    for tipo, por_tamano in actual['resultados'].items():
+        for cantidad, metricas in por_tamano.items():
+            previas = base['resultados'].get(tipo, {}).get(cantidad)
+            if not previas:
+                continue
+            for metrica, valor in metricas.items():
+                anterior = previas.get(metrica)
+                if not anterior:
+                    continue
+                razon = valor / anterior
+                marca = ""
+                if razon > 1 + tolerancia:
+                    marca = "  <- regresión"
+                    regresiones.append((tipo, cantidad, metrica, razon))
+                print(f"{tipo:8} {cantidad:>8} {metrica:20} {anterior:12.4g} "
+                      f"{valor:12.4g} {razon:7.2f}{marca}")
+    return regresiones
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks del historial de tickets")
+    parser.add_argument("--tamanos", type=int, nargs="+", default=list(TAMANOS),
+                        help="cantidades de tickets a generar (p. ej. 1000 100000 1000000)")
+    parser.add_argument("--almacen", nargs="+", default=["json"],
+                        choices=sorted(ALMACENES_TICKETS))
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--salida", metavar="ARCHIVO",
+                        help="guarda los resultados en JSON (para usarlos como base)")
+    parser.add_argument("--comparar", metavar="BASE",
+                        help="compara contra resultados guardados con --salida")
+    parser.add_argument("--tolerancia", type=float, default=0.2,
+                        help="aumento relativo permitido antes de marcar regresión")
+    args = parser.parse_args()
+
+    resultados = ejecutar(args.tamanos, args.almacen, args.semilla)
+    if args.salida:
+        with open(args.salida, 'w') as f:
+            json.dump(resultados, f, indent=4)
+    if args.comparar:
+        with open(args.comparar, 'r') as f:
+            base = json.load(f)
+        if comparar(resultados, base, args.tolerancia):
+            sys.exit(1)
+    elif not args.salida:
+        print(json.dumps(resultados, indent=4))
+
+if __name__ == "__main__":
+    main()
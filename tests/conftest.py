@@ -0,0 +1,33 @@
+import os
+import sys
+import types
+from datetime import datetime, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import tkcalendar  # noqa: F401
+except ImportError:
+    # Solo la ventana usa DateEntry; las pruebas no abren ninguna
+    sys.modules['tkcalendar'] = types.ModuleType('tkcalendar')
+
+import Equipo_3_Actividad_15 as app  # noqa: E402
+
+
+def hacer_ticket(minuto, ticket_id=None, tipo="Latte", cantidad=1, extras=(), total=None,
+                 orden_id=1):
+    """Ticket del 2024-03-01 a las 10:00 + minuto"""
+    bebida = app.BebidaPersonalizada(tipo, cantidad, list(extras))
+    ticket = app.Ticket(orden_id, [bebida],
+                        total if total is not None else 30.0 * cantidad,
+                        timestamp=datetime(2024, 3, 1, 10, 0) + timedelta(minutes=minuto))
+    if ticket_id is not None:
+        ticket.ticket_id = ticket_id
+    return ticket
+
+
+@pytest.fixture
+def ticket():
+    return hacer_ticket
@@ -0,0 +1,214 @@
+import json
+import os
+from datetime import date, datetime
+
+import pytest
+
+import Equipo_3_Actividad_15 as app
+
+
+@pytest.fixture(params=sorted(app.ALMACENES_TICKETS))
+def almacen(request, tmp_path):
+    almacen = app.ALMACENES_TICKETS[request.param](str(tmp_path))
+    almacen.abrir()
+    yield almacen
+    almacen.cerrar()
+
+
+def reabrir(almacen, desde=None):
+    almacen.cerrar()
+    otro = type(almacen)(almacen.directorio)
+    otro.abrir(desde=desde)
+    return otro
+
+
+def test_historial_en_segundo_plano(tmp_path, ticket):
+    almacen = app.AlmacenTicketsJSON(str(tmp_path))
+    almacen.abrir()
+    for m in range(0, 3 * 1440, 60):
+        almacen.agregar(ticket(m, f"T{m:04d}"))
+    almacen.cerrar()
+    # Solo se carga el último día; los anteriores llegan por lotes
+    almacen = app.AlmacenTicketsJSON(str(tmp_path))
+    almacen.abrir(desde=datetime(2024, 3, 4))
+    try:
+        assert len(almacen.indice) == 10
+        for lote in almacen.cargar_historial():
+            almacen.fusionar(lote)
+        almacen.terminar_carga()
+
+        assert len(almacen.indice) == almacen.contar() == 72
+        assert [t.ticket_id for t in almacen.iterar()] == [f"T{m:04d}"
+                                                           for m in range(0, 3 * 1440, 60)]
+        assert len(almacen.filtrar(date(2024, 3, 2), "latte")) == 24
+    finally:
+        almacen.cerrar()
+
+
+def test_iterar_no_ve_lo_agregado_despues(almacen, ticket):
+    for m in range(0, 3 * 1440, 60):
+        almacen.agregar(ticket(m, f"T{m:04d}"))
+    # En JSON, los dos primeros días quedan solo en disco
+    almacen = reabrir(almacen, desde=datetime(2024, 3, 3))
+    try:
+        recorrido = almacen.iterar()
+        almacen.agregar(ticket(30, "NUEVO"))
+        almacen.combinar([ticket(1500, "IMPORTADO")])
+        if isinstance(almacen, app.AlmacenTicketsJSON):
+            almacen.escritor.detener()  # Que lo nuevo ya esté en disco
+
+        assert [t.ticket_id for t in recorrido] == [f"T{m:04d}"
+                                                    for m in range(0, 3 * 1440, 60)]
+    finally:
+        almacen.cerrar()
+
+
+def test_iterar_rango_mientras_se_fusionan_dias(tmp_path, ticket):
+    almacen = app.AlmacenTicketsJSON(str(tmp_path))
+    almacen.abrir()
+    for m in range(0, 4 * 1440, 60):
+        almacen.agregar(ticket(m, f"T{m:04d}"))
+    almacen = reabrir(almacen, desde=datetime(2024, 3, 4))
+    try:
+        # Del mediodía del 2 al mediodía del 4: cruza días en disco y cargados
+        recorrido = almacen.iterar(datetime(2024, 3, 2, 12), datetime(2024, 3, 4, 12))
+        for lote in almacen.cargar_historial():
+            almacen.fusionar(lote)
+        almacen.terminar_carga()
+        almacen.agregar(ticket(3 * 1440 + 1, "NUEVO"))
+        almacen.escritor.detener()
+
+        assert [t.ticket_id for t in recorrido] == [f"T{m:04d}"
+                                                    for m in range(1560, 3 * 1440 + 120, 60)]
+    finally:
+        almacen.cerrar()
+
+
+def test_combinar_inserta_omite_y_reporta_conflictos(almacen, ticket):
+    almacen.agregar(ticket(0, "EXISTE"))
+    almacen.agregar(ticket(1, "DIFIERE"))
+    lote = [
+        ticket(0, "EXISTE"),                # idéntico: se omite
+        ticket(1, "DIFIERE", total=99.0),   # mismo ID, otra venta: conflicto
+        ticket(2, "NUEVO1"),
+        ticket(3, "NUEVO2", tipo="Té", total=20.0),
+        ticket(2, "NUEVO1"),                # repetido dentro del lote
+        ticket(3, "NUEVO2", tipo="Latte"),  # repetido con otra bebida
+    ]
+    insertados, omitidos, conflictos = almacen.combinar(lote)
+
+    assert sorted(t.ticket_id for t in insertados) == ["NUEVO1", "NUEVO2"]
+    assert omitidos == 2
+    assert sorted(conflictos) == ["DIFIERE", "NUEVO2"]
+    assert almacen.contar() == 4
+    # El conflicto no reemplaza lo guardado
+    assert almacen.obtener("DIFIERE").total == 30.0
+    assert almacen.obtener("NUEVO2").bebidas[0].tipo == "Té"
+
+
+def test_combinar_de_nuevo_lo_mismo_solo_omite(almacen, ticket):
+    lote = [ticket(m, f"T{m:03d}") for m in range(20)]
+    assert len(almacen.combinar(lote)[0]) == 20
+    insertados, omitidos, conflictos = almacen.combinar(
+        [ticket(m, f"T{m:03d}") for m in range(20)])
+    assert (insertados, omitidos, conflictos) == ([], 20, [])
+    assert almacen.contar() == 20
+
+
+def test_combinar_persiste(almacen, ticket):
+    almacen.combinar([ticket(m, f"T{m:03d}") for m in range(0, 3000, 100)])
+    almacen = reabrir(almacen)
+    try:
+        assert almacen.contar() == 30
+        assert almacen.obtener("T2900").timestamp == ticket(2900).timestamp
+        assert [t.ticket_id for t in almacen.iterar()] == [f"T{m:03d}"
+                                                           for m in range(0, 3000, 100)]
+    finally:
+        almacen.cerrar()
+
+
+def test_combinar_revisa_dias_sin_cargar(tmp_path, ticket):
+    almacen = app.AlmacenTicketsJSON(str(tmp_path))
+    almacen.abrir()
+    almacen.agregar(ticket(0, "VIEJO"))
+    # Solo se cargan los días desde hoy: el 2024-03-01 queda en disco
+    almacen = reabrir(almacen, desde=datetime.combine(datetime.now().date(),
+                                                      datetime.min.time()))
+    try:
+        assert almacen.indice.obtener("VIEJO") is None
+        insertados, omitidos, conflictos = almacen.combinar(
+            [ticket(0, "VIEJO"), ticket(5, "NUEVO")])
+        assert [t.ticket_id for t in insertados] == ["NUEVO"]
+        assert (omitidos, conflictos) == (1, [])
+    finally:
+        almacen.cerrar()
+
+
+def test_combinar_usa_el_indice_preparado(tmp_path, ticket):
+    almacen = app.AlmacenTicketsJSON(str(tmp_path))
+    almacen.abrir()
+    try:
+        lote = [ticket(m, f"T{m:03d}", tipo="Cappuccino", extras=["Leche extra"])
+                for m in range(5)]
+        preparado = almacen.preparar_combinar(lote)
+        almacen.combinar(lote, preparado)
+        encontrados = almacen.filtrar(lote[0].timestamp.date(), "leche extra")
+        assert len(encontrados) == 5
+    finally:
+        almacen.cerrar()
+
+
+def test_agregar_tras_una_linea_cortada(tmp_path, ticket):
+    ruta = str(tmp_path / "2024-03-01.jsonl")
+    app.DiarioTickets(ruta).agregar_lote([ticket(0, "A"), ticket(1, "B")])
+    with open(ruta, 'rb+') as f:
+        f.truncate(os.path.getsize(ruta) - 10)
+    # Una instancia que nunca leyó el archivo no sabe que quedó cortado
+    app.DiarioTickets(ruta).agregar(ticket(2, "C"))
+
+    diario = app.DiarioTickets(ruta)
+    assert [t.ticket_id for t in diario.cargar()] == ["A", "C"]
+    assert diario.lineas_invalidas == 1
+
+
+def test_dia_cortado_leido_en_segundo_plano_se_compacta(tmp_path, ticket):
+    almacen = app.AlmacenTicketsJSON(str(tmp_path))
+    almacen.abrir()
+    for m in range(3):
+        almacen.agregar(ticket(m, f"T{m}"))
+    almacen.cerrar()
+    ruta = tmp_path / "2024-03-01.jsonl"
+    ruta.write_bytes(ruta.read_bytes()[:-10])
+
+    almacen = app.AlmacenTicketsJSON(str(tmp_path))
+    almacen.abrir(desde=datetime(2024, 3, 2))
+    for lote in almacen.cargar_historial():
+        almacen.fusionar(lote)
+    almacen.terminar_carga()
+    almacen.agregar(ticket(5, "T5"))
+    almacen = reabrir(almacen)
+    try:
+        assert [t.ticket_id for t in almacen.iterar()] == ["T0", "T1", "T5"]
+        assert almacen.diario.diarios["2024-03-01"].lineas_invalidas == 0
+    finally:
+        almacen.cerrar()
+
+
+def test_perfiles_danados_no_detienen_la_carga(tmp_path, monkeypatch, ticket):
+    registro = ticket(0, "A").to_dict()
+    registro['perfil'] = 7
+    (tmp_path / "2024-03-01.jsonl").write_text(json.dumps(registro) + "\n")
+    (tmp_path / "perfiles.json").write_text("[{dañado")
+    monkeypatch.setattr(app, "PERFILES", app.RegistroPerfiles())
+
+    almacen = app.AlmacenTicketsJSON(str(tmp_path))
+    with pytest.raises(ValueError):
+        almacen.abrir()
+    try:
+        assert almacen.obtener("A") is not None
+        assert almacen.diario.fragmentos["2024-03-01"]['tickets'] == 1
+        assert (tmp_path / "perfiles.json.danado").exists()
+        # El perfil 7 se perdió, pero su ID no se reutiliza
+        assert app.PERFILES.actual().perfil_id == 8
+    finally:
+        almacen.cerrar()
@@ -0,0 +1,143 @@
+import Equipo_3_Actividad_15 as app
+
+
+class TreeviewFalso:
+    """Lo que mostrar_pagina usa de ttk.Treeview, contando las llamadas"""
+    def __init__(self):
+        self.visibles = []
+        self.filas = {}
+        self.llamadas = []
+
+    def get_children(self):
+        return tuple(self.visibles)
+
+    def insert(self, padre, posicion, iid=None, values=()):
+        if iid is None:
+            iid = f"I{len(self.filas)}"
+        assert iid not in self.filas
+        self.llamadas.append('insert')
+        self.filas[iid] = values
+        self.visibles.insert(len(self.visibles) if posicion == "end" else posicion, iid)
+        return iid
+
+    def move(self, iid, padre, posicion):
+        self.llamadas.append('move')
+        if iid in self.visibles:
+            self.visibles.remove(iid)
+        self.visibles.insert(posicion, iid)
+
+    def detach(self, *iids):
+        self.llamadas.append('detach')
+        for iid in iids:
+            self.visibles.remove(iid)
+
+    def delete(self, *iids):
+        self.llamadas.append('delete')
+        for iid in iids:
+            if iid in self.visibles:
+                self.visibles.remove(iid)
+            del self.filas[iid]
+
+    def yview_moveto(self, fraccion):
+        pass
+
+
+class EtiquetaFalsa:
+    def config(self, **opciones):
+        self.opciones = opciones
+
+
+def vista(tickets, por_pagina=5):
+    """La vista del historial sin ventana: solo lo que usa mostrar_pagina"""
+    vista = app.SistemaPedidosCafeteria.__new__(app.SistemaPedidosCafeteria)
+    vista.TICKETS_POR_PAGINA = por_pagina
+    vista.tickets_list = TreeviewFalso()
+    vista.pagina_label = EtiquetaFalsa()
+    vista.filas_historial = {}
+    vista.pagina_actual = 0
+    vista.historial_total = len(tickets)
+    vista.historial_llamadas_tk = 0
+    vista.historial_llamadas_ahorradas = 0
+    vista.historial_filtro = None
+    # Más reciente primero, como el historial real
+    vista.historial_fuente = lambda desde, limite: app.recientes_de(tickets, desde, limite)
+    return vista
+
+
+def ids(vista):
+    """IDs de los tickets visibles, leídos de la columna ID"""
+    return [vista.tickets_list.filas[iid][2] for iid in vista.tickets_list.visibles]
+
+
+def test_paginas_mas_reciente_primero(ticket):
+    v = vista([ticket(m, f"T{m}") for m in range(12)])
+    v.mostrar_pagina()
+    assert ids(v) == ["T11", "T10", "T9", "T8", "T7"]
+    assert v.pagina_label.opciones['text'] == "Página 1 de 3 (12 tickets)"
+
+    v.pagina_actual = 2
+    v.mostrar_pagina()
+    assert ids(v) == ["T1", "T0"]
+    assert v.pagina_label.opciones['text'] == "Página 3 de 3 (12 tickets)"
+
+
+def test_recientes_de_respeta_los_limites():
+    datos = list(range(10))
+    assert app.recientes_de(datos, 0, 3) == [9, 8, 7]
+    assert app.recientes_de(datos, 8, 5) == [1, 0]
+    assert app.recientes_de(datos, 20, 5) == []
+
+
+def test_primera_pagina_inserta_todo(ticket):
+    v = vista([ticket(m, f"T{m}") for m in range(12)])
+    v.mostrar_pagina()
+    assert v.tickets_list.llamadas == ['insert'] * 5
+
+
+def test_sin_cambios_no_toca_el_treeview(ticket):
+    v = vista([ticket(m, f"T{m}") for m in range(12)])
+    v.mostrar_pagina()
+    v.tickets_list.llamadas.clear()
+    v.mostrar_pagina()
+    assert v.tickets_list.llamadas == []
+
+
+def test_ticket_nuevo_inserta_uno_y_separa_el_ultimo(ticket):
+    tickets = [ticket(m, f"T{m}") for m in range(12)]
+    v = vista(tickets)
+    v.mostrar_pagina()
+    v.tickets_list.llamadas.clear()
+
+    tickets.append(ticket(12, "T12"))
+    v.agregar_fila_historial(tickets[-1])
+    assert ids(v) == ["T12", "T11", "T10", "T9", "T8"]
+    assert sorted(v.tickets_list.llamadas) == ['detach', 'insert']
+    assert v.historial_total == 13
+
+
+def test_volver_a_una_pagina_reutiliza_filas(ticket):
+    v = vista([ticket(m, f"T{m}") for m in range(12)])
+    v.mostrar_pagina()
+    v.pagina_actual = 1
+    v.mostrar_pagina()
+    assert ids(v) == ["T6", "T5", "T4", "T3", "T2"]
+
+    v.tickets_list.llamadas.clear()
+    v.pagina_actual = 0
+    v.mostrar_pagina()
+    assert ids(v) == ["T11", "T10", "T9", "T8", "T7"]
+    # Las filas separadas se vuelven a colocar sin insertarse ni formatearse
+    assert 'insert' not in v.tickets_list.llamadas
+    assert v.tickets_list.llamadas.count('move') == 5
+
+
+def test_poda_filas_separadas(ticket):
+    v = vista([ticket(m, f"T{m}") for m in range(40)])
+    v.MAX_FILAS_HISTORIAL = 12
+    for pagina in range(8):
+        v.pagina_actual = pagina
+        v.mostrar_pagina()
+        assert len(v.filas_historial) <= v.MAX_FILAS_HISTORIAL
+        assert set(v.tickets_list.visibles) <= set(v.filas_historial.values())
+    assert ids(v) == ["T4", "T3", "T2", "T1", "T0"]
+    assert set(v.tickets_list.filas) == set(v.filas_historial.values())
@@ -0,0 +1,67 @@
+from datetime import datetime
+
+import Equipo_3_Actividad_15 as app
+
+
+def test_ids_crecen_en_orden_de_creacion():
+    generador = app.GeneradorIds(caja=7)
+    instante = datetime(2024, 3, 1, 10, 0)
+    # Mismo milisegundo repetido y un reloj que retrocede
+    ids = [generador.nuevo(instante) for _ in range(1000)]
+    ids.append(generador.nuevo(datetime(2024, 3, 1, 9, 59)))
+    ids.append(generador.nuevo(datetime(2024, 3, 1, 10, 1)))
+
+    assert len(set(ids)) == len(ids)
+    assert ids == sorted(ids)
+    assert all(len(i) == app.GeneradorIds.LARGO for i in ids)
+
+
+def test_orden_de_ids_sigue_al_tiempo():
+    generador = app.GeneradorIds()
+    instantes = [datetime(2024, 3, d, h) for d in (1, 2, 15) for h in (8, 13, 20)]
+    ids = [generador.nuevo(i) for i in instantes]
+    assert ids == sorted(ids)
+    assert app.GeneradorIds.minimo(instantes[3]) <= ids[3]
+    assert app.GeneradorIds.minimo(instantes[3]) > ids[2]
+
+
+def test_cajas_distintas_no_chocan():
+    instante = datetime(2024, 3, 1, 10, 0)
+    a = app.GeneradorIds(caja=1).nuevo(instante)
+    b = app.GeneradorIds(caja=2).nuevo(instante)
+    assert a != b
+    assert a[:10] == b[:10]  # mismo milisegundo
+
+
+def test_instante_decodifica_el_milisegundo():
+    instante = datetime(2024, 3, 1, 10, 30, 15, 250000)
+    ticket_id = app.GeneradorIds(caja=3).nuevo(instante)
+    assert app.GeneradorIds.instante(ticket_id) == instante
+
+
+def test_instante_de_ids_antiguos():
+    assert app.GeneradorIds.instante("A1B2C3D4") is None
+    assert app.GeneradorIds.instante("U" * app.GeneradorIds.LARGO) is None
+
+
+def test_normalizar_corrige_lo_tecleado():
+    ticket_id = app.GeneradorIds(caja=5).nuevo(datetime(2024, 3, 1, 10, 0))
+    tecleado = " " + ticket_id.lower().replace("0", "o").replace("1", "l") + " "
+    tecleado = tecleado[:6] + "-" + tecleado[6:]
+    assert app.GeneradorIds.normalizar(tecleado) == ticket_id
+
+
+def test_normalizar_respeta_ids_hexadecimales():
+    assert app.GeneradorIds.normalizar("a1b2c3d4") == "A1B2C3D4"
+
+
+def test_caja_de_la_variable_de_entorno(monkeypatch):
+    monkeypatch.setenv("CAFETERIA_CAJA", "12")
+    assert app.caja_por_defecto() == 12
+
+
+def test_caja_invalida_usa_la_mac(monkeypatch, capsys):
+    monkeypatch.setattr(app.uuid, "getnode", lambda: 0xABCDEF)
+    monkeypatch.setenv("CAFETERIA_CAJA", "caja-1")
+    assert app.caja_por_defecto() == 0xABCDEF
+    assert "CAFETERIA_CAJA inválida" in capsys.readouterr().out
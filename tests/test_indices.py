@@ -0,0 +1,104 @@
+from datetime import date
+
+import Equipo_3_Actividad_15 as app
+
+
+def comprobar(indice):
+    marcas = [t.timestamp for t in indice.ordenados]
+    assert indice.marcas == marcas
+    assert marcas == sorted(marcas)
+    assert set(indice.por_id) == {t.ticket_id for t in indice.ordenados}
+
+
+def test_agregar_fuera_de_orden(ticket):
+    indice = app.IndiceTickets([ticket(m, f"T{m:03d}") for m in (30, 0, 20)])
+    indice.agregar(ticket(40, "T040"))
+    indice.agregar(ticket(10, "T010"))
+    comprobar(indice)
+    assert [t.ticket_id for t in indice.ordenados] == [
+        "T000", "T010", "T020", "T030", "T040"]
+    assert indice.obtener("T010").timestamp == ticket(10).timestamp
+    assert indice.obtener("NOEXISTE") is None
+
+
+def test_rango_y_dia(ticket):
+    indice = app.IndiceTickets([ticket(m, f"T{m}") for m in (0, 10, 20, 1440, 1445)])
+    desde, hasta = ticket(10).timestamp, ticket(1440).timestamp
+    assert [t.ticket_id for t in indice.rango(desde, hasta)] == ["T10", "T20"]
+    assert len(indice.del_dia(date(2024, 3, 1))) == 3
+    assert [t.ticket_id for t in indice.del_dia(date(2024, 3, 2))] == ["T1440", "T1445"]
+    assert indice.del_dia(date(2024, 3, 3)) == []
+
+
+def buscar(indice, busqueda):
+    listas = indice.listas(busqueda)
+    candidatos = set.intersection(*listas) if listas else set()
+    return sorted(tid for tid in candidatos if indice.coincide(tid, busqueda))
+
+
+def test_trigramas_verifican_la_subcadena(ticket):
+    indice = app.IndiceTexto([
+        ticket(0, "A1", tipo="Cappuccino", extras=["Leche extra"]),
+        ticket(1, "A2", tipo="Latte", extras=["Shot extra"]),
+        ticket(2, "A3", tipo="Mocha"),
+    ])
+    assert buscar(indice, "extra") == ["A1", "A2"]
+    assert buscar(indice, "leche extra") == ["A1"]
+    # Todos los trigramas aparecen, pero no la subcadena completa
+    assert buscar(indice, "latte leche") == []
+    assert buscar(indice, "frappé") == []
+
+
+def test_busqueda_corta_no_usa_el_indice(ticket):
+    indice = app.IndiceTexto([ticket(0, "A1")])
+    assert indice.listas("la") is None
+    assert indice.listas("xyz") == []
+
+
+def test_fusionar_lote_en_un_hueco(ticket):
+    indice = app.IndiceTickets([ticket(m, f"T{m:03d}") for m in (0, 1, 50, 51)])
+    assert indice.fusionar([ticket(m, f"T{m:03d}") for m in (10, 20, 30)]) == 3
+    comprobar(indice)
+    assert [t.ticket_id for t in indice.ordenados] == [
+        "T000", "T001", "T010", "T020", "T030", "T050", "T051"]
+
+
+def test_fusionar_lotes_intercalados(ticket):
+    indice = app.IndiceTickets([ticket(m, f"A{m:03d}") for m in range(0, 100, 10)])
+    # Dos lotes desordenados que se intercalan con todo lo anterior
+    assert indice.fusionar([ticket(m, f"B{m:03d}") for m in (95, 5, 45, 25, 65)]) == 5
+    assert indice.fusionar([ticket(m, f"C{m:03d}") for m in (-5, 33, 110, 66, 7)]) == 5
+    comprobar(indice)
+    assert len(indice) == 20
+    assert indice.ordenados[0].ticket_id == "C-05"
+    assert indice.ordenados[-1].ticket_id == "C110"
+
+
+def test_fusionar_omite_ids_repetidos(ticket):
+    indice = app.IndiceTickets([ticket(0, "X"), ticket(10, "Y")])
+    assert indice.fusionar([ticket(5, "X"), ticket(5, "Z"), ticket(20, "Y")]) == 1
+    comprobar(indice)
+    assert [t.ticket_id for t in indice.ordenados] == ["X", "Z", "Y"]
+    assert indice.obtener("X").timestamp.minute == 0
+
+
+def test_fusionar_con_marcas_iguales(ticket):
+    indice = app.IndiceTickets([ticket(10, "A"), ticket(10, "B")])
+    indice.fusionar([ticket(10, "C"), ticket(0, "D")])
+    comprobar(indice)
+    assert indice.ordenados[0].ticket_id == "D"
+    assert {t.ticket_id for t in indice.ordenados[1:]} == {"A", "B", "C"}
+
+
+def test_fusionar_coincide_con_agregar_uno_por_uno(ticket):
+    existentes = [ticket(m * 7 % 200, f"E{m:03d}") for m in range(60)]
+    lotes = [[ticket(m * 13 % 200, f"L{i}{m:03d}") for m in range(i, 60, 4)] for i in range(4)]
+    por_lotes = app.IndiceTickets(existentes)
+    uno_a_uno = app.IndiceTickets(existentes)
+    for lote in lotes:
+        por_lotes.fusionar(lote)
+        for t in lote:
+            uno_a_uno.agregar(t)
+    comprobar(por_lotes)
+    assert por_lotes.marcas == uno_a_uno.marcas
+    assert set(por_lotes.por_id) == set(uno_a_uno.por_id)
@@ -0,0 +1,117 @@
+import copy
+import random
+
+import pytest
+
+import Equipo_3_Actividad_15 as app
+
+
+def test_confirmar_crea_ticket_y_orden():
+    motor = app.MotorPedidos(estaciones=1)
+    motor.agregar_al_carrito("Cappuccino", 2, ["Leche extra"])
+    motor.agregar_al_carrito("Té")
+    ticket = motor.confirmar(ahora=0)
+
+    assert ticket.orden_id == 1
+    assert ticket.total == 2 * (35 + 10) + 20
+    assert motor.carrito == []
+    assert motor.contador_orden == 2
+    orden = motor.ordenes_activas[1]
+    assert orden['estado'] == 'preparando'
+    assert orden['ticket_id'] == ticket.ticket_id
+    # Una estación: 2 cappuccinos con leche (360 s c/u) y un té (120 s)
+    assert (orden['inicio'], orden['fin']) == (0, 2 * 360 + 120)
+
+
+def test_confirmar_carrito_vacio():
+    with pytest.raises(ValueError):
+        app.MotorPedidos().confirmar()
+
+
+def test_enviar_pedidos_planifica_una_vez():
+    motor = app.MotorPedidos(estaciones=2)
+    tickets = motor.enviar_pedidos([[("Cappuccino", 1, ())],
+                                    [("Té", 1, ())],
+                                    [("Latte", 1, ())]], ahora=0)
+
+    assert [t.orden_id for t in tickets] == [1, 2, 3]
+    plazos = {n: (o['inicio'], o['fin']) for n, o in motor.ordenes_activas.items()}
+    # FIFO en dos estaciones: el latte espera a que se libere la del té
+    assert plazos == {1: (0, 300), 2: (0, 120), 3: (120, 360)}
+    assert sorted(motor.plazos_ordenes) == [(120, 2), (300, 1), (360, 3)]
+
+
+def test_enviar_pedidos_acepta_bebidas_armadas():
+    motor = app.MotorPedidos()
+    bebida = motor.crear_bebida("Latte", 2)
+    ticket, = motor.enviar_pedidos([[bebida]], ahora=0)
+    assert ticket.bebidas == [bebida]
+    assert ticket.total == 60
+
+
+def test_avanzar_completa_en_orden_de_plazo():
+    motor = app.MotorPedidos(estaciones=1)
+    motor.enviar_pedidos([[("Té", 1, ())], [("Té", 1, ())]], ahora=0)
+
+    assert motor.avanzar(119) == []
+    assert motor.avanzar(120) == [1]
+    assert motor.ordenes_activas[1]['estado'] == 'listo'
+    assert motor.avanzar(240) == [2]
+    assert motor.plazos_ordenes == []
+
+
+def test_vencidas_ignora_plazo_viejo_adelantado():
+    motor = app.MotorPedidos(estaciones=1)
+    motor.enviar_pedidos([[("Cappuccino", 1, ())], [("Té", 1, ())]], ahora=0)
+    assert motor.ordenes_activas[2]['fin'] == 420
+
+    # Al quitar la primera, el té se adelanta; su plazo de 420 queda viejo
+    motor.remover(1)
+    assert motor.replanificar(10) == [2]
+    assert (420, 2) in motor.plazos_ordenes
+
+    assert motor.avanzar(130) == [2]
+    assert motor.avanzar(420) == []
+    assert motor.plazos_ordenes == []
+
+
+def test_vencidas_ignora_plazo_viejo_atrasado():
+    motor = app.MotorPedidos(estaciones=1, politica="sjf")
+    motor.enviar_pedidos([[("Cappuccino", 1, ())], [("Cappuccino", 1, ())]], ahora=0)
+    assert motor.ordenes_activas[2]['fin'] == 600
+
+    # Un té más corto se adelanta al segundo cappuccino en la cola
+    motor.enviar_pedidos([[("Té", 1, ())]], ahora=1)
+    assert motor.ordenes_activas[2]['fin'] == 720
+    assert (600, 2) in motor.plazos_ordenes
+
+    assert motor.vencidas(600) == [1, 3]
+    assert motor.ordenes_activas[2]['estado'] == 'preparando'
+    assert motor.vencidas(720) == [2]
+
+
+def test_proximo_plazo_es_el_menor():
+    motor = app.MotorPedidos(estaciones=2)
+    motor.enviar_pedidos([[("Cappuccino", 1, ())], [("Té", 1, ())]], ahora=0)
+    assert motor.proximo_plazo() == 120
+    motor.avanzar(120)
+    assert motor.proximo_plazo() == 300
+
+
+@pytest.mark.parametrize("politica", app.PlanificadorCocina.POLITICAS)
+def test_orden_nueva_coincide_con_el_plan_completo(politica):
+    azar = random.Random(3)
+    motor = app.MotorPedidos(estaciones=3, politica=politica)
+    tipos = sorted(motor.precio_bebidas)
+    ahora = 0
+    for _ in range(120):
+        ahora += azar.choice((0, 5, 30, 120))
+        motor.avanzar(ahora)
+        bebidas = [motor.crear_bebida(azar.choice(tipos), azar.randint(1, 2))
+                   for _ in range(azar.randint(1, 3))]
+        motor.crear_orden(bebidas, ahora)
+
+        esperado = copy.deepcopy(motor.cocina).planificar(ahora)
+        actual = {n: (o['inicio'], o['fin']) for n, o in motor.ordenes_activas.items()
+                  if o['estado'] == 'preparando'}
+        assert actual == esperado